@@ -1,22 +1,82 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
+import cProfile
+import hashlib
+import io
+import json
 import sys
 import os
+import time
 from datetime import datetime
 
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from inventory_parser import parse_weee_text
-from dish_manager import DishManager
-from recipe_planner import RecipePlanner
-from inventory_manager import InventoryManager
+import instrumentation
+from inventory_parser import iter_inventory_items, parse_weee_text
+from meal_history import format_cursor, parse_cursor
+from plan_format import format_plan_text
+from app_context import AppContext
 
 app = Flask(__name__)
 
-# Initialize managers
-dish_manager = DishManager("data/dishes.json")
-recipe_planner = RecipePlanner("data/dishes.json", "data/past_meals.csv")
-inventory_manager = InventoryManager("data/inventory.json")
+# Storage backend: "json" (data/*.json and data/past_meals.csv, the default)
+# or "sqlite" (a single WAL-mode database, imported from the files on first run)
+STORAGE_BACKEND = os.environ.get('WEEKLY_RECIPES_BACKEND', 'json')
+
+# Dish scoring engine: "python" (default) or "numpy" (vectorized, for large libraries)
+SCORING_ENGINE = os.environ.get('WEEKLY_RECIPES_SCORING', 'python')
+
+# Planning engine: "greedy" (default) or "optimal" (whole-week search with a
+# time budget, falling back to the greedy plan)
+PLANNING_ENGINE = os.environ.get('WEEKLY_RECIPES_PLANNER', 'greedy')
+
+# Initialize managers: one shared instance per data source (see src/app_context.py)
+context = AppContext(backend=STORAGE_BACKEND,
+                     db_path=os.environ.get('WEEKLY_RECIPES_DB', 'data/weekly_recipes.db'),
+                     scoring_engine=SCORING_ENGINE, planning_engine=PLANNING_ENGINE)
+dish_manager = context.dish_manager
+recipe_planner = context.recipe_planner
+inventory_manager = context.inventory_manager
+meal_plan_manager = context.meal_plan_manager
+event_stream = context.event_stream
+
+# Seconds between keep-alive comments on idle /api/events streams
+EVENT_STREAM_HEARTBEAT = 15
+
+# Profiling: with WEEKLY_RECIPES_PROFILING=1, a request with ?profile=1 runs
+# under cProfile and its stats are dumped to data/profiles/ (see X-Profile-File)
+PROFILING_ENABLED = os.environ.get('WEEKLY_RECIPES_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'profiles')
+
+
+@app.before_request
+def start_request_metrics():
+    """Start the request timer and I/O counters (and the profiler if requested)."""
+    g.request_start = time.perf_counter()
+    instrumentation.start_request()
+    if PROFILING_ENABLED and request.args.get('profile', '').lower() in ('1', 'true', 'yes'):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    """
+    Record the request's latency and storage I/O under its route.
+    Streamed bodies are produced after this runs and are not included.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        filename = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint or 'unmatched'}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+        response.headers['X-Profile-File'] = f"data/profiles/{filename}"
+    
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed = time.perf_counter() - g.get('request_start', time.perf_counter())
+    instrumentation.finish_request(request.method, endpoint, response.status_code, elapsed)
+    return response
 
 
 @app.route('/')
@@ -27,8 +87,23 @@ def index():
 
 @app.route('/api/parse-inventory', methods=['POST'])
 def parse_inventory():
-    """Parse Weee purchase text into structured inventory and save to inventory."""
+    """
+    Parse Weee purchase text into structured inventory and save to inventory.
+    
+    Accepts JSON {"text": ..., "save": ...}, or the raw text as a text/plain
+    body (save with ?save=0/1), which is parsed line by line as it streams in.
+    """
     try:
+        if request.mimetype == 'text/plain':
+            save_to_inventory = request.args.get('save', '1') not in ('0', 'false')
+            lines = io.TextIOWrapper(request.stream, encoding=request.mimetype_params.get('charset', 'utf-8'))
+            inventory = list(iter_inventory_items(lines))
+            
+            if save_to_inventory:
+                inventory_manager.add_items(inventory)
+            
+            return jsonify({"inventory": inventory}), 200
+        
         data = request.get_json()
         weee_text = data.get('text', '')
         save_to_inventory = data.get('save', True)  # Default to saving
@@ -40,8 +115,7 @@ def parse_inventory():
         
         # Save to inventory if requested
         if save_to_inventory:
-            for item in inventory:
-                inventory_manager.add_item(item)
+            inventory_manager.add_items(inventory)
         
         return jsonify({"inventory": inventory}), 200
     except Exception as e:
@@ -54,6 +128,9 @@ def generate_plan():
     try:
         data = request.get_json()
         start_day = data.get('start_day', 0)  # 0 = Sunday
+        engine = data.get('engine')  # "greedy" / "optimal"; default from WEEKLY_RECIPES_PLANNER
+        if engine is not None and engine not in recipe_planner.PLANNING_ENGINES:
+            return jsonify({"error": f"engine must be one of: {', '.join(recipe_planner.PLANNING_ENGINES)}"}), 400
         
         # Get current inventory from storage
         inventory_items = inventory_manager.get_all_items()
@@ -64,19 +141,163 @@ def generate_plan():
         # Extract item names from inventory list
         item_names = [item.get('item', '') for item in inventory_items if item.get('item')]
         
-        meal_plan = recipe_planner.generate_meal_plan(item_names, start_day)
+        # track_quantities: plan against item quantities, drawing them down as dishes are assigned
+        stock = inventory_items if data.get('track_quantities') else None
+        plan = recipe_planner.generate_plan(item_names, start_day, engine, stock=stock)
+        
+        return jsonify({"plan": plan, "meal_plan": format_plan_text(plan)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/generate-plans', methods=['POST'])
+def generate_plans():
+    """
+    Generate plans for many jobs in one request, e.g. several kitchens and weeks.
+    
+    Body: {"jobs": [{"inventory": [...], "start_day": 0, "weeks": 1,
+                     "engine": "greedy", "track_quantities": false}, ...],
+           "concurrency": optional number of jobs planned at a time}
+    A job without "inventory" uses the stored inventory. Results are
+    returned in job order; a failing job carries an "error" instead.
+    """
+    try:
+        data = request.get_json() or {}
+        jobs = data.get('jobs')
+        if not isinstance(jobs, list) or not jobs:
+            return jsonify({"error": "jobs must be a non-empty list"}), 400
+        if len(jobs) > recipe_planner.MAX_BATCH_JOBS:
+            return jsonify({"error": f"At most {recipe_planner.MAX_BATCH_JOBS} jobs per batch"}), 400
+        concurrency = data.get('concurrency')
+        if concurrency is not None and (not isinstance(concurrency, int) or concurrency < 1):
+            return jsonify({"error": "concurrency must be a positive integer"}), 400
+        
+        # Read the stored inventory once for every job that does not bring its own
+        stored_inventory = None
+        if any(isinstance(job, dict) and 'inventory' not in job for job in jobs):
+            stored_inventory = inventory_manager.get_all_items()
+        jobs = [dict(job, inventory=stored_inventory) if isinstance(job, dict) and 'inventory' not in job else job
+                for job in jobs]
+        
+        results = recipe_planner.generate_meal_plans(jobs, concurrency)
+        return jsonify({"results": results}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def conditional_json(collection: str, version, build):
+    """
+    Answer a GET for a versioned collection with a strong ETag derived from
+    the collection's version token and the query string. If the client's
+    If-None-Match matches, return 304 without building or encoding the body;
+    otherwise jsonify(build()).
+    """
+    token = repr((context.backend, collection, version, sorted(request.args.items(multi=True))))
+    etag = hashlib.sha1(token.encode('utf-8')).hexdigest()
+    if version is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    if version is not None:
+        response.set_etag(etag)
+        # Let browsers cache the body but revalidate it on every request
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of data changes. Each event's name is its
+    topic ("dishes", "inventory", "meal_plans", "past_meals") and its data
+    the JSON event (version, upserted/deleted keys, ...). A "resync" event
+    means this client fell behind and events were dropped; reload everything.
+    """
+    try:
+        subscription = event_stream.subscribe()
+        if subscription is None:
+            return jsonify({"error": "Too many event stream subscribers"}), 503
+        
+        def generate():
+            try:
+                yield "retry: 3000\n\n"
+                while not subscription.closed:
+                    items = subscription.get(timeout=EVENT_STREAM_HEARTBEAT)
+                    if not items:
+                        yield ": keep-alive\n\n"
+                    for event_id, topic, data in items:
+                        event_line = f"id: {event_id}\n" if event_id is not None else ""
+                        yield f"{event_line}event: {topic}\ndata: {data}\n\n"
+            finally:
+                # Runs when the client disconnects and the server closes the generator
+                event_stream.unsubscribe(subscription)
         
-        return jsonify({"meal_plan": meal_plan}), 200
+        return Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Request latency, storage I/O, operation timings and open event stream
+    subscriptions in the Prometheus text format.
+    """
+    try:
+        instrumentation.metrics.set("event_stream_subscribers", event_stream.subscriber_count())
+        return Response(instrumentation.metrics.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/plan-cache/stats', methods=['GET'])
+def get_plan_cache_stats():
+    """Get meal plan cache hit/miss statistics."""
+    try:
+        return jsonify({"stats": recipe_planner.plan_cache.stats()}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/dishes', methods=['GET'])
 def get_dishes():
-    """Get all dishes."""
+    """
+    Get all dishes. "version" is the change-log version to pass as since
+    to /api/dishes/changes.
+    """
+    try:
+        # Versions first: a body newer than its ETag is harmless, the reverse is not
+        change_version = dish_manager.get_change_version()
+        version = (dish_manager.get_version(), change_version)
+        return conditional_json('dishes', version, lambda: {"dishes": dish_manager.get_all_dishes(),
+                                                             "version": change_version})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def changes_response(manager):
+    """
+    Answer GET .../changes?since=<version> from a manager's change log:
+    {"version", "changes": [{"version", "op", "key", "dish"/"item"}]}, or
+    {"version", "reset": true} when the client must reload everything.
+    """
+    try:
+        since = int(request.args['since'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "since must be a version number"}), 400
+    
+    changes, version = manager.get_changes(since)
+    if changes is None:
+        return jsonify({"version": version, "reset": True}), 200
+    return jsonify({"version": version, "changes": changes}), 200
+
+
+@app.route('/api/dishes/changes', methods=['GET'])
+def get_dish_changes():
+    """Dishes added, updated or deleted since a change-log version."""
     try:
-        dishes = dish_manager.get_all_dishes()
-        return jsonify({"dishes": dishes}), 200
+        return changes_response(dish_manager)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -127,69 +348,41 @@ def delete_dish(dish_id):
 
 @app.route('/api/past-meals', methods=['POST'])
 def record_meal():
-    """Record a meal prep and consume ingredients."""
+    """
+    Record a meal prep and consume ingredients.
+    
+    With "dry_run": true nothing is recorded or consumed; the response shows
+    the matched inventory items with their projected quantities.
+    """
     try:
         data = request.get_json()
         date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
         dish_name = data.get('dish_name', '')
         consume_ingredients = data.get('consume_ingredients', True)  # Default to consuming
         ingredient_amounts = data.get('ingredient_amounts', {})  # Custom amounts per ingredient
+        dry_run = data.get('dry_run', False)
         
         if not dish_name:
             return jsonify({"error": "Dish name required"}), 400
         
         # Record the meal
-        recipe_planner.record_meal(date, dish_name)
+        if not dry_run:
+            recipe_planner.record_meal(date, dish_name)
         
         # Consume ingredients if requested
         consumption_results = {}
-        if consume_ingredients:
+        if consume_ingredients or dry_run:
             # Find the dish to get its ingredients
-            dishes = dish_manager.get_all_dishes()
-            dish = None
-            for d in dishes:
-                if d.get("name") == dish_name:
-                    dish = d
-                    break
+            dish = dish_manager.get_dish_by_name(dish_name)
             
             if dish:
-                ingredients = dish.get("ingredients", [])
-                
-                # If custom amounts provided, use them; otherwise use default
-                if ingredient_amounts:
-                    # Consume with custom amounts
-                    inventory = inventory_manager.get_all_items()
-                    for ingredient in ingredients:
-                        # Find matching inventory item
-                        matched_item = None
-                        for item in inventory:
-                            item_name = item.get("item", "").lower()
-                            ingredient_lower = ingredient.lower()
-                            
-                            if item_name == ingredient_lower or \
-                               ingredient_lower in item_name or \
-                               item_name in ingredient_lower:
-                                matched_item = item
-                                break
-                        
-                        if matched_item:
-                            # Get custom amount for this item, or default to 1.0
-                            item_name = matched_item.get("item")
-                            amount = ingredient_amounts.get(item_name, 1.0)
-                            
-                            success, error, updated_item = inventory_manager.decrease_item_quantity(
-                                item_name, amount
-                            )
-                            consumption_results[ingredient] = (success, error, updated_item)
-                        else:
-                            consumption_results[ingredient] = (
-                                False, 
-                                f"'{ingredient}' not found in inventory", 
-                                None
-                            )
-                else:
-                    # Use default consumption
-                    consumption_results = inventory_manager.consume_ingredients(ingredients, amount=1.0)
+                # Custom amounts are keyed by inventory item name; others default to 1.0
+                consumption_results = inventory_manager.consume_ingredients(
+                    dish.get("ingredients", []), amount=1.0,
+                    amounts=ingredient_amounts or None, dry_run=dry_run)
+        
+        if dry_run:
+            return jsonify({"dry_run": True, "ingredients_consumed": consumption_results}), 200
         
         return jsonify({
             "message": "Meal recorded successfully",
@@ -201,18 +394,53 @@ def record_meal():
 
 @app.route('/api/past-meals', methods=['GET'])
 def get_past_meals():
-    """Get past meals."""
+    """
+    Get past meals.
+    
+    Without query parameters returns every row in file order. With any of
+    limit/cursor/since/until/stream, returns dated meals newest first:
+    - since, until: YYYY-MM-DD bounds (inclusive)
+    - limit: page size (default 50, max 500)
+    - cursor: next_cursor from the previous page
+    - stream=1: newline-delimited JSON, one meal per line, no page limit
+    Non-streamed responses carry an ETag and honor If-None-Match.
+    """
     try:
-        import csv
-        past_meals = []
+        history = recipe_planner.history
+        version = history.get_version()
+        paging_params = ('limit', 'cursor', 'since', 'until', 'stream')
+        if not any(param in request.args for param in paging_params):
+            return conditional_json('past_meals', version, lambda: {"past_meals": history.get_all_meals()})
+        
+        try:
+            since = request.args.get('since')
+            until = request.args.get('until')
+            since = datetime.strptime(since, history.DATE_FORMAT) if since else None
+            until = datetime.strptime(until, history.DATE_FORMAT) if until else None
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+            cursor = request.args.get('cursor')
+            before = parse_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameter: {e}"}), 400
         
-        past_meals_path = os.path.join(os.path.dirname(__file__), "data/past_meals.csv")
-        if os.path.exists(past_meals_path):
-            with open(past_meals_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                past_meals = list(reader)
+        if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            def generate(before, chunk_size=200):
+                # Page through the index so memory stays bounded by chunk_size
+                while True:
+                    meals, before = history.get_dated_page(since, until, before, chunk_size)
+                    for meal in meals:
+                        yield json.dumps(meal, ensure_ascii=False) + "\n"
+                    if before is None:
+                        break
+            
+            return Response(generate(before), mimetype='application/x-ndjson')
         
-        return jsonify({"past_meals": past_meals}), 200
+        def page():
+            meals, next_key = history.get_dated_page(since, until, before, limit)
+            return {"past_meals": meals,
+                    "next_cursor": format_cursor(next_key) if next_key is not None else None}
+        
+        return conditional_json('past_meals', version, page)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -220,10 +448,24 @@ def get_past_meals():
 # Inventory Management API
 @app.route('/api/inventory', methods=['GET'])
 def get_inventory():
-    """Get all inventory items."""
+    """
+    Get all inventory items. "version" is the change-log version to pass as
+    since to /api/inventory/changes.
+    """
     try:
-        inventory = inventory_manager.get_all_items()
-        return jsonify({"inventory": inventory}), 200
+        change_version = inventory_manager.get_change_version()
+        version = (inventory_manager.get_version(), change_version)
+        return conditional_json('inventory', version, lambda: {"inventory": inventory_manager.get_all_items(),
+                                                                "version": change_version})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/inventory/changes', methods=['GET'])
+def get_inventory_changes():
+    """Inventory items added, updated or deleted since a change-log version."""
+    try:
+        return changes_response(inventory_manager)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -243,6 +485,28 @@ def add_inventory_item():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/inventory/batch', methods=['POST'])
+def batch_inventory():
+    """Apply a list of add/update/delete inventory operations in one save."""
+    try:
+        data = request.get_json()
+        operations = data.get('operations', [])
+        
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"error": "No operations provided"}), 400
+        
+        results = inventory_manager.apply_batch(operations)
+        
+        return jsonify({
+            "results": [
+                {"success": success, "error": error, "item": item}
+                for success, error, item in results
+            ]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/inventory/<item_name>', methods=['PUT'])
 def update_inventory_item(item_name):
     """Update an inventory item."""
@@ -272,6 +536,79 @@ def delete_inventory_item(item_name):
         return jsonify({"error": str(e)}), 500
 
 
+# Saved Meal Plans API
+@app.route('/api/meal-plans', methods=['GET'])
+def get_meal_plans():
+    """
+    List saved meal plans, most recently saved first.
+    Returns summaries only (name, dates, start_day, dish_count); fetch a
+    plan by name for its text and days.
+    - offset: number of plans to skip (default 0)
+    - limit: page size (default 50, max 500)
+    """
+    try:
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameter: {e}"}), 400
+        
+        meal_plans, total = meal_plan_manager.list_meal_plans(offset, limit)
+        return jsonify({
+            "meal_plans": meal_plans,
+            "total": total,
+            "next_offset": offset + limit if offset + limit < total else None
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/meal-plans/<plan_name>', methods=['GET'])
+def get_meal_plan(plan_name):
+    """Get a saved meal plan with its text and days."""
+    try:
+        meal_plan = meal_plan_manager.get_meal_plan_by_name(plan_name)
+        
+        if meal_plan:
+            return jsonify({"meal_plan": meal_plan}), 200
+        else:
+            return jsonify({"error": f"Meal plan '{plan_name}' not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/meal-plans', methods=['POST'])
+def save_meal_plan():
+    """
+    Save a meal plan, replacing any plan with the same name (case-insensitive).
+    Body: {"name": "...", "plan": structured plan or plan text}
+    """
+    try:
+        data = request.get_json()
+        success, error, meal_plan = meal_plan_manager.save_meal_plan(data.get('name', ''), data.get('plan'))
+        
+        if success:
+            return jsonify({"meal_plan": meal_plan}), 201
+        else:
+            return jsonify({"error": error}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/meal-plans/<plan_name>', methods=['DELETE'])
+def delete_meal_plan(plan_name):
+    """Delete a saved meal plan."""
+    try:
+        success, error = meal_plan_manager.delete_meal_plan(plan_name)
+        
+        if success:
+            return jsonify({"message": "Meal plan deleted successfully"}), 200
+        else:
+            return jsonify({"error": error}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
 
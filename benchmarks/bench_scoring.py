@@ -0,0 +1,88 @@
+"""
+Compare the dish scoring engines of RecipePlanner on synthetic libraries.
+
+Usage:
+    python benchmarks/bench_scoring.py [--sizes 10000 50000] [--inventory 500]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'src'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from generators import make_dishes, make_vocabulary, make_word
+from recipe_planner import RecipePlanner
+
+
+def time_call(func, repeat: int) -> float:
+    """Best wall time of repeat calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--inventory", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    results = []
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        past_meals_file = os.path.join(tmp, "past_meals.csv")
+        for size in args.sizes:
+            dishes_file = os.path.join(tmp, f"dishes_{size}.json")
+            with open(dishes_file, "w", encoding="utf-8") as f:
+                json.dump(make_dishes(size, make_vocabulary(args.vocabulary, rng), rng), f, ensure_ascii=False)
+            inventory = [make_word(rng) for _ in range(args.inventory)]
+            
+            timings = {}
+            feasible = {}
+            for engine in RecipePlanner.SCORING_ENGINES:
+                planner = RecipePlanner(dishes_file, past_meals_file, scoring_engine=engine)
+                planner.get_feasible_dishes(inventory)  # build index / matrix once
+                timings[engine] = time_call(lambda: planner.get_feasible_dishes(inventory), args.repeat)
+                feasible[engine] = planner.get_feasible_dishes(inventory)
+            
+            # Scoring step alone, without loading the library from disk
+            dishes = planner.dish_manager.get_all_dishes()
+            vector_engine = planner.get_vector_engine(dishes, planner.dish_manager.get_version())
+            matched = vector_engine.index.match_inventory(inventory)
+            scoring = {
+                "python": time_call(lambda: [planner.score_dish(d, inventory, matched) for d in dishes],
+                                    args.repeat),
+                "numpy": time_call(lambda: vector_engine.score_all(matched), args.repeat),
+            }
+            
+            result = {
+                "dishes": size,
+                "inventory": args.inventory,
+                "feasible_seconds": timings,
+                "scoring_seconds": scoring,
+                "identical": feasible["python"] == feasible["numpy"],
+            }
+            results.append(result)
+            print(f"{size:>7} dishes: get_feasible_dishes python {timings['python'] * 1000:8.1f} ms, "
+                  f"numpy {timings['numpy'] * 1000:8.1f} ms; "
+                  f"scoring only python {scoring['python'] * 1000:8.1f} ms, "
+                  f"numpy {scoring['numpy'] * 1000:8.1f} ms; identical={result['identical']}")
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
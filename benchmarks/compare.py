@@ -0,0 +1,55 @@
+"""
+Compare two run_benchmarks.py result files.
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json [--threshold 1.2]
+
+Prints the candidate/baseline ratio of median times for every benchmark and
+size present in both files. Exits with status 1 if any ratio exceeds the
+threshold, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report.get("meta", {}), {(r["name"], r["size"]): r for r in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="flag benchmarks whose median got slower by more than this factor")
+    args = parser.parse_args()
+    
+    baseline_meta, baseline = load_results(args.baseline)
+    candidate_meta, candidate = load_results(args.candidate)
+    print(f"baseline {baseline_meta.get('commit')}  vs  candidate {candidate_meta.get('commit')}")
+    
+    regressions = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        name, size = key
+        before = baseline[key]["median_s"]
+        after = candidate[key]["median_s"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+        print(f"{name:<40} {size:>7}  {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  "
+              f"x{ratio:5.2f}{flag}")
+    
+    if regressions:
+        print(f"{len(regressions)} regression(s) above x{args.threshold}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
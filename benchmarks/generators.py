@@ -0,0 +1,89 @@
+"""
+Synthetic data generators for the benchmarks.
+
+Every generator takes a random.Random so runs are reproducible for a seed.
+"""
+import csv
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+
+CATEGORIES = ["肉类", "海鲜", "蔬菜", "豆类", "蛋类", "主食"]
+INVENTORY_CATEGORIES = ["肉类", "海鲜", "蔬菜", "豆制品", "蛋类", "主食", "调料", "其他"]
+SYLLABLES = "鸡鸭鱼虾蟹牛羊猪肉排骨翅腿菜白青韭芹萝卜土豆香菇葱蒜姜椒茄瓜豆腐干米面粉"
+BRANDS = ["牧民人家", "中华", "台湾", "老干妈", "思念", "湾仔码头", "海天", "李锦记"]
+UNITS = ["克", "磅", "盎司", "个", "包", "盒", "瓶"]
+
+
+def make_word(rng: random.Random, min_len: int = 2, max_len: int = 4) -> str:
+    """Random Chinese-looking ingredient name."""
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Distinct ingredient names."""
+    vocabulary = set()
+    while len(vocabulary) < size:
+        vocabulary.add(make_word(rng))
+    return sorted(vocabulary)
+
+
+def make_dishes(count: int, vocabulary: List[str], rng: random.Random) -> List[Dict]:
+    """Dish library with 1-5 ingredients per dish drawn from vocabulary."""
+    return [
+        {
+            "id": i + 1,
+            "name": f"菜{i + 1}",
+            "category": rng.choice(CATEGORIES),
+            "ingredients": rng.sample(vocabulary, min(len(vocabulary), rng.randint(1, 5))),
+        }
+        for i in range(count)
+    ]
+
+
+def make_inventory(count: int, vocabulary: List[str], rng: random.Random) -> List[Dict]:
+    """Inventory items; names are vocabulary words, some with a brand prefix."""
+    items = {}
+    while len(items) < count:
+        name = rng.choice(vocabulary)
+        if rng.random() < 0.3 or name in items:
+            name = rng.choice(BRANDS) + name + str(len(items))
+        items[name] = {
+            "item": name,
+            "quantity": rng.randint(1, 5),
+            "unit": rng.choice(UNITS),
+            "category": rng.choice(INVENTORY_CATEGORIES),
+        }
+    return list(items.values())
+
+
+def make_weee_receipt(count: int, vocabulary: List[str], rng: random.Random) -> str:
+    """Weee order text with count items (two lines per item)."""
+    lines = []
+    for _ in range(count):
+        weight = f" {rng.randint(100, 1000)} {rng.choice(['克', 'g', 'lb', 'oz'])}" if rng.random() < 0.7 else ""
+        lines.append(f"weee_{rng.choice(BRANDS)} {rng.choice(vocabulary)} 原味{weight}")
+        lines.append(f"单价: ${rng.randint(1, 30)}.{rng.randint(0, 99):02d} |数量: {rng.randint(1, 4)}")
+    return "\n".join(lines)
+
+
+def make_table_receipt(count: int, vocabulary: List[str], rng: random.Random) -> str:
+    """Tab-separated inventory table with a header row."""
+    lines = ["Ingredient Name\tQuantity\tUnit\tCategory"]
+    for _ in range(count):
+        lines.append(f"{rng.choice(vocabulary)}\t{rng.randint(1, 5)}\t{rng.choice(UNITS)}\t"
+                     f"{rng.choice(INVENTORY_CATEGORIES)}")
+    return "\n".join(lines)
+
+
+def write_meal_history(path: str, count: int, dish_names: List[str], rng: random.Random,
+                       days: int = 3650):
+    """Write a past_meals.csv with count meals spread over the last `days` days."""
+    today = datetime.now()
+    dates = sorted(today - timedelta(days=rng.randint(0, days)) for _ in range(count))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "dish_name"])
+        for date in dates:
+            writer.writerow([date.strftime("%Y-%m-%d"), rng.choice(dish_names)])
@@ -0,0 +1,213 @@
+"""
+Benchmark the hot paths of the planner, parser, managers and Flask endpoints.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 10 100 1000 10000] [--repeat 5]
+                                        [--only NAME ...] [--output results.json]
+
+Each benchmark runs once per size on synthetic data in a temporary
+directory and reports min/median wall time. The JSON output can be compared
+between commits with benchmarks/compare.py.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from generators import (make_dishes, make_inventory, make_table_receipt, make_vocabulary,
+                        make_weee_receipt, write_meal_history)
+from dish_manager import DishManager
+from inventory_manager import InventoryManager
+from inventory_parser import parse_weee_text
+from recipe_planner import RecipePlanner
+
+
+class Fixture:
+    """Synthetic data files and managers for one benchmark size."""
+    
+    def __init__(self, size: int, directory: str, seed: int):
+        rng = random.Random(seed)
+        self.size = size
+        self.vocabulary = make_vocabulary(max(20, size // 3), rng)
+        self.dishes = make_dishes(size, self.vocabulary, rng)
+        self.inventory = make_inventory(size, self.vocabulary, rng)
+        self.inventory_names = [item["item"] for item in self.inventory]
+        self.weee_text = make_weee_receipt(size, self.vocabulary, rng)
+        self.table_text = make_table_receipt(size, self.vocabulary, rng)
+        
+        self.dishes_file = os.path.join(directory, "dishes.json")
+        self.inventory_file = os.path.join(directory, "inventory.json")
+        self.past_meals_file = os.path.join(directory, "past_meals.csv")
+        with open(self.dishes_file, "w", encoding="utf-8") as f:
+            json.dump(self.dishes, f, ensure_ascii=False, indent=2)
+        with open(self.inventory_file, "w", encoding="utf-8") as f:
+            json.dump(self.inventory, f, ensure_ascii=False, indent=2)
+        write_meal_history(self.past_meals_file, size, [d["name"] for d in self.dishes], rng)
+        
+        self.dish_manager = DishManager(self.dishes_file)
+        self.inventory_manager = InventoryManager(self.inventory_file)
+        self.recipe_planner = RecipePlanner(self.dishes_file, self.past_meals_file)
+        self.consumed_ingredients = self.dishes[0]["ingredients"]
+
+
+def bench_parse_weee(fixture):
+    return lambda: parse_weee_text(fixture.weee_text)
+
+
+def bench_parse_table(fixture):
+    return lambda: parse_weee_text(fixture.table_text)
+
+
+def bench_get_feasible_dishes(fixture):
+    return lambda: fixture.recipe_planner.get_feasible_dishes(fixture.inventory_names)
+
+
+def bench_generate_meal_plan(fixture):
+    def run():
+        # Measure plan construction, not the plan cache
+        fixture.recipe_planner.plan_cache.clear()
+        fixture.recipe_planner.generate_meal_plan(fixture.inventory_names, 0)
+    return run
+
+
+def bench_generate_plan_with_stock(fixture):
+    def run():
+        # Measure plan construction, not the plan cache
+        fixture.recipe_planner.plan_cache.clear()
+        fixture.recipe_planner.generate_plan(fixture.inventory_names, 0, stock=fixture.inventory)
+    return run
+
+
+def bench_consume_ingredients(fixture):
+    return lambda: fixture.inventory_manager.consume_ingredients(fixture.consumed_ingredients, amount=0)
+
+
+class EndpointBenchmarks:
+    """Flask endpoint benchmarks through the test client, with app managers swapped for the fixture's."""
+    
+    def __init__(self):
+        import app as app_module
+        self.app_module = app_module
+        self.client = app_module.app.test_client()
+    
+    def use(self, fixture):
+        self.app_module.dish_manager = fixture.dish_manager
+        self.app_module.inventory_manager = fixture.inventory_manager
+        self.app_module.recipe_planner = fixture.recipe_planner
+    
+    def request(self, fixture, method: str, path: str, before=None, **kwargs):
+        """before: optional callable run ahead of each request, e.g. to clear a cache."""
+        def run():
+            self.use(fixture)
+            if before is not None:
+                before()
+            response = self.client.open(path, method=method, **kwargs)
+            assert response.status_code < 400, response.get_data(as_text=True)[:200]
+        return run
+
+
+def build_benchmarks():
+    """Return {name: factory(fixture) -> zero-argument callable}."""
+    endpoints = EndpointBenchmarks()
+    return {
+        "parse_weee_text.weee": bench_parse_weee,
+        "parse_weee_text.table": bench_parse_table,
+        "RecipePlanner.get_feasible_dishes": bench_get_feasible_dishes,
+        "RecipePlanner.generate_meal_plan": bench_generate_meal_plan,
+        "RecipePlanner.generate_plan.stock": bench_generate_plan_with_stock,
+        "InventoryManager.consume_ingredients": bench_consume_ingredients,
+        "GET /api/dishes": lambda f: endpoints.request(f, "GET", "/api/dishes"),
+        "GET /api/inventory": lambda f: endpoints.request(f, "GET", "/api/inventory"),
+        "GET /api/past-meals": lambda f: endpoints.request(f, "GET", "/api/past-meals"),
+        # Measure plan construction, not the plan cache
+        "POST /api/generate-plan": lambda f: endpoints.request(
+            f, "POST", "/api/generate-plan", before=f.recipe_planner.plan_cache.clear, json={"start_day": 0}),
+        "POST /api/parse-inventory": lambda f: endpoints.request(
+            f, "POST", "/api/parse-inventory", json={"text": f.weee_text, "save": False}),
+    }
+
+
+def time_callable(func, repeat: int) -> dict:
+    """Run func repeat times (after one warm-up call) and summarize wall times."""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "max_s": max(samples),
+        "repeat": repeat,
+    }
+
+
+def git_commit() -> str:
+    """Short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose name contains one of these")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args()
+    
+    benchmarks = build_benchmarks()
+    if args.only:
+        benchmarks = {name: factory for name, factory in benchmarks.items()
+                      if any(pattern in name for pattern in args.only)}
+    
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = Fixture(size, directory, args.seed)
+            for name, factory in benchmarks.items():
+                timing = time_callable(factory(fixture), args.repeat)
+                results.append({"name": name, "size": size, **timing})
+                print(f"{name:<40} {size:>7}  min {timing['min_s'] * 1000:10.2f} ms  "
+                      f"median {timing['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+    
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+
+from dish_manager import DishManager
+from event_stream import EventBroadcaster
+from events import EventBus
+from inventory_manager import InventoryManager
+from meal_history import MealHistory
+from meal_plan_manager import MealPlanManager
+from recipe_planner import RecipePlanner
+
+
+class AppContext:
+    """
+    The application's shared state: one manager per data source, wired to a
+    single EventBus, and the RecipePlanner built on the same DishManager and
+    meal history the routes use. Every file or table is therefore loaded
+    once, and one resident copy backs both the API and the planner's caches.
+    """
+    
+    BACKENDS = ["json", "sqlite"]
+    
+    def __init__(self, backend: str = "json", data_dir: str = "data",
+                 db_path: str = "data/weekly_recipes.db", scoring_engine: str = "python",
+                 planning_engine: str = "greedy"):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"backend must be one of: {', '.join(self.BACKENDS)}")
+        
+        self.backend = backend
+        self.data_dir = data_dir
+        self.events = EventBus()
+        self.database = None
+        
+        if backend == "sqlite":
+            from sqlite_store import SqliteDatabase, SqliteMealHistory, migrate_from_files
+            
+            self.database = SqliteDatabase(db_path)
+            migrate_from_files(self.database, data_dir)
+            
+            self.dish_manager = DishManager(store=self.database.collection(
+                'dishes', DishManager.record_key, DishManager.record_name), events=self.events)
+            self.inventory_manager = InventoryManager(store=self.database.collection(
+                'inventory', InventoryManager.record_key), events=self.events)
+            self.meal_plan_manager = MealPlanManager(
+                store=self.database.collection('meal_plans', MealPlanManager.record_key),
+                body_store=self.database.collection('meal_plan_bodies', MealPlanManager.record_key),
+                events=self.events)
+            self.history = SqliteMealHistory(self.database)
+        else:
+            self.dish_manager = DishManager(os.path.join(data_dir, "dishes.json"), events=self.events)
+            self.inventory_manager = InventoryManager(os.path.join(data_dir, "inventory.json"),
+                                                      events=self.events)
+            self.meal_plan_manager = MealPlanManager(os.path.join(data_dir, "meal_plans.json"),
+                                                     events=self.events)
+            self.history = MealHistory(self._data_path("past_meals.csv"))
+        
+        # Pushes every change event to /api/events subscribers
+        self.event_stream = EventBroadcaster(self.events)
+        
+        self.recipe_planner = RecipePlanner(dish_manager=self.dish_manager, history=self.history,
+                                            scoring_engine=scoring_engine, events=self.events,
+                                            planning_engine=planning_engine)
+    
+    def _data_path(self, filename: str) -> str:
+        """Absolute path of a data file; relative data dirs are under the project root."""
+        if os.path.isabs(self.data_dir):
+            return os.path.join(self.data_dir, filename)
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(project_root, self.data_dir, filename)
@@ -0,0 +1,184 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+from app_context import AppContext
+from inventory_parser import parse_weee_text
+from inventory_manager import InventoryManager
+
+# Items can only be folded together when both carry these fields; anything
+# else is kept as-is and merged by InventoryManager one by one
+FOLD_FIELDS = ("item", "quantity", "unit")
+
+
+def _foldable(first: Dict, second: Dict) -> bool:
+    return all(field in first and field in second for field in FOLD_FIELDS)
+
+
+class ItemReducer:
+    """
+    Quantity-aware reducer for parsed inventory items.
+    
+    Compacts a stream of items so that InventoryManager.add_items(reducer.items())
+    leaves the inventory exactly as adding every original item in order
+    would (up to float rounding of summed quantities):
+    - consecutive items for the same name and unit are folded into one item
+      whose quantity is the sum, like add_item merging same-unit quantities
+    - an item between two items of other units is dropped when the next
+      item overrides all of its fields: both of them replace the entry, so
+      only the later one shows. The first item for a name is always kept,
+      since whether it merges or replaces depends on the existing inventory
+    
+    Reducers over consecutive slices of the input can be combined with
+    update(), in order, so receipts can be parsed and reduced in parallel.
+    """
+    
+    def __init__(self):
+        self._sequences: Dict[str, List[Dict]] = {}
+        self.item_count = 0
+        self.skipped = 0
+    
+    def add(self, item_data: Dict):
+        """Fold one parsed item into the reducer."""
+        if not isinstance(item_data, dict) or not item_data.get("item"):
+            self.skipped += 1
+            return
+        self.item_count += 1
+        
+        sequence = self._sequences.setdefault(item_data["item"].lower(), [])
+        sequence.append(dict(item_data))
+        while len(sequence) > 1:
+            previous, current = sequence[-2], sequence[-1]
+            if not _foldable(previous, current):
+                break
+            if previous["unit"] == current["unit"]:
+                previous["quantity"] = previous["quantity"] + current["quantity"]
+                sequence.pop()
+            elif (len(sequence) > 2 and _foldable(sequence[-3], current)
+                  and sequence[-3]["unit"] != current["unit"] and set(previous) <= set(current)):
+                sequence.pop(-2)
+            else:
+                break
+    
+    def update(self, items: Iterable[Dict]):
+        """Fold many items, in order."""
+        for item_data in items:
+            self.add(item_data)
+    
+    def items(self) -> List[Dict]:
+        """Compacted items, names in order of first appearance."""
+        return [item for sequence in self._sequences.values() for item in sequence]
+
+
+def find_receipts(patterns: List[str]) -> List[str]:
+    """Expand directories (all non-hidden files, recursively) and globs into a sorted file list."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                paths.extend(os.path.join(root, f) for f in files if not f.startswith('.'))
+        else:
+            paths.extend(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(set(paths))
+
+
+def parse_receipt(path: str) -> Tuple[int, int, List[Dict]]:
+    """
+    Parse one receipt file (runs in a worker process).
+    Returns (line_count, item_count, compacted_items).
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    
+    reducer = ItemReducer()
+    reducer.update(parse_weee_text(text))
+    return text.count('\n') + 1 if text else 0, reducer.item_count, reducer.items()
+
+
+def import_receipts(paths: List[str], workers: int = None, progress=None) -> Tuple[ItemReducer, Dict]:
+    """
+    Parse receipt files across a process pool and reduce the items in file
+    order. progress(done, total, lines, elapsed), if given, is called after
+    each file. Returns (reducer, stats).
+    """
+    reducer = ItemReducer()
+    lines = 0
+    parsed_items = 0
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields results in input order, which the reducer relies on
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        for done, (line_count, item_count, items) in enumerate(
+                executor.map(parse_receipt, paths, chunksize=chunksize), 1):
+            lines += line_count
+            parsed_items += item_count
+            reducer.update(items)
+            if progress:
+                progress(done, len(paths), lines, time.perf_counter() - start)
+    
+    elapsed = time.perf_counter() - start
+    stats = {
+        "files": len(paths),
+        "lines": lines,
+        # Items as parsed; the workers hand over already compacted ones
+        "items": parsed_items,
+        "seconds": elapsed,
+        "lines_per_second": lines / elapsed if elapsed > 0 else 0.0,
+    }
+    return reducer, stats
+
+
+def create_inventory_manager(backend: str, data_dir: str, db_path: str) -> InventoryManager:
+    """InventoryManager on the same storage backend the app uses."""
+    return AppContext(backend=backend, data_dir=data_dir, db_path=db_path).inventory_manager
+
+
+def print_progress(done: int, total: int, lines: int, elapsed: float):
+    rate = lines / elapsed if elapsed > 0 else 0.0
+    print(f"\r[{done}/{total}] {lines} lines, {rate:,.0f} lines/sec", end="", file=sys.stderr, flush=True)
+    if done == total:
+        print(file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import archived Weee receipts into the inventory.")
+    parser.add_argument("paths", nargs="+", help="receipt files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--backend", choices=["json", "sqlite"],
+                        default=os.environ.get('WEEKLY_RECIPES_BACKEND', 'json'))
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--db", default=os.environ.get('WEEKLY_RECIPES_DB', 'data/weekly_recipes.db'))
+    parser.add_argument("--dry-run", action="store_true", help="parse and report without saving")
+    args = parser.parse_args()
+    
+    paths = find_receipts(args.paths)
+    if not paths:
+        print("No receipt files found", file=sys.stderr)
+        sys.exit(1)
+    
+    reducer, stats = import_receipts(paths, args.workers, progress=print_progress)
+    items = reducer.items()
+    print(f"Parsed {stats['items']} items from {stats['files']} files ({stats['lines']} lines) "
+          f"in {stats['seconds']:.2f}s, {stats['lines_per_second']:,.0f} lines/sec; "
+          f"{len(items)} after merging")
+    
+    if args.dry_run:
+        return
+    
+    # One save for the whole import
+    inventory_manager = create_inventory_manager(args.backend, args.data_dir, args.db)
+    results = inventory_manager.add_items(items)
+    failed = [error for success, error, _ in results if not success]
+    print(f"Saved {len(results) - len(failed)} inventory entries"
+          + (f", {len(failed)} failed" if failed else ""))
+
+
+if __name__ == "__main__":
+    # Usage: python src/bulk_import.py RECEIPTS... [--workers N] [--dry-run]
+    main()
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class ChangeLog:
+    """
+    Monotonic log of record changes kept by a manager, for delta sync.
+    
+    Every save appends one (version, op, key) entry per changed record,
+    op being "upsert" or "delete". Versions are integers that only grow;
+    they start from the current time in microseconds, so versions handed
+    out by an earlier process are always older than this log. Only the
+    latest max_entries are kept. When changes cannot be listed (a save
+    without change hints, or the data changed outside this process),
+    reset() moves the log past every version handed out so far and callers
+    asking for older versions must fetch the full collection again.
+    """
+    
+    def __init__(self, max_entries: int = 1000):
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=max_entries)
+        self._version = time.time_ns() // 1000
+        # Oldest version whose later changes are all still in the log
+        self._oldest = self._version
+    
+    @property
+    def version(self) -> int:
+        """Version of the latest change."""
+        return self._version
+    
+    def record(self, upserted_keys: Iterable[str] = (), deleted_keys: Iterable[str] = ()) -> int:
+        """Append changes and return the new version."""
+        with self._lock:
+            for op, keys in (("upsert", upserted_keys), ("delete", deleted_keys)):
+                for key in keys:
+                    if len(self._entries) == self._entries.maxlen:
+                        self._oldest = self._entries[0]["version"]
+                    self._version += 1
+                    self._entries.append({"version": self._version, "op": op, "key": key})
+            return self._version
+    
+    def reset(self) -> int:
+        """Drop the log; every earlier version now needs a full resync."""
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+            self._oldest = self._version
+            return self._version
+    
+    def since(self, version: int) -> Optional[List[Dict]]:
+        """
+        Changes after version, oldest first, with only the latest entry per
+        key. Returns None if they are no longer (or were never) in the log.
+        """
+        with self._lock:
+            if version < self._oldest or version > self._version:
+                return None
+            latest: Dict[str, Dict] = {}
+            for entry in self._entries:
+                if entry["version"] > version:
+                    latest.pop(entry["key"], None)
+                    latest[entry["key"]] = entry
+            return [dict(entry) for entry in latest.values()]
@@ -1,42 +1,144 @@
-import json
 import os
 from typing import List, Dict, Optional
 
+from change_log import ChangeLog
+from events import EventBus
+from instrumentation import timed
+from json_store import JsonCollection
+
 
 class DishManager:
     """Manage dish library with CRUD operations."""
     
     VALID_CATEGORIES = ["肉类", "海鲜", "蔬菜", "豆类", "蛋类", "主食"]
     
-    def __init__(self, dishes_file: str = "data/dishes.json"):
+    def __init__(self, dishes_file: str = "data/dishes.json", store=None,
+                 events: Optional[EventBus] = None):
+        """
+        store: optional storage backend (e.g. sqlite_store.SqliteCollection);
+        defaults to a JsonCollection on dishes_file.
+        events: optional shared EventBus; a "dishes" event is published
+        after every save.
+        """
         # Make path relative to project root
         if not os.path.isabs(dishes_file):
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.dishes_file = os.path.join(project_root, dishes_file)
         else:
             self.dishes_file = dishes_file
+        self.store = store if store is not None else JsonCollection(self.dishes_file, self.record_key)
+        self.events = events if events is not None else EventBus()
         self._ensure_file_exists()
+        
+        # Resident copy of the library plus id and name indexes (each maps to
+        # the dishes with that key, in library order). Reloaded only when the
+        # store's version changes.
+        self._dishes: List[Dict] = []
+        self._by_key: Dict[str, List[Dict]] = {}
+        self._by_name: Dict[str, List[Dict]] = {}
+        self._version = None
+        # Per-dish changes for delta sync (see get_changes)
+        self.change_log = ChangeLog()
+    
+    @staticmethod
+    def record_key(dish: Dict) -> str:
+        """Storage key of a dish: its ID."""
+        return str(dish.get("id"))
+    
+    @staticmethod
+    def record_name(dish: Dict) -> str:
+        """Indexed name of a dish."""
+        return dish.get("name", "")
     
     def _ensure_file_exists(self):
         """Ensure dishes.json file exists, create if not."""
-        if not os.path.exists(self.dishes_file):
-            os.makedirs(os.path.dirname(self.dishes_file), exist_ok=True)
-            with open(self.dishes_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
+        self.store.ensure_exists()
     
+    @timed
     def load_dishes(self) -> List[Dict]:
         """Load all dishes from JSON file."""
+        dishes, _ = self.store.load()
+        return dishes
+    
+    def get_version(self) -> Optional[tuple]:
+        """
+        Return a version token for the dish library.
+        Changes whenever the library is saved.
+        """
+        return self.store.get_version()
+    
+    @timed
+    def save_dishes(self, dishes: List[Dict], upserted: Optional[List[Dict]] = None,
+                    deleted_keys: Optional[List[str]] = None):
+        """
+        Atomically save dishes and refresh the in-memory library.
+        upserted/deleted_keys describe what changed, so row-based backends
+        can write only those dishes.
+        """
         try:
-            with open(self.dishes_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            version = self.store.save(dishes, expected_version=self._version,
+                                      upserted=upserted, deleted_keys=deleted_keys)
+        except Exception:
+            # The resident copy may hold unsaved changes; force a reload
+            self._version = None
+            raise
+        self._set_dishes(dishes, version)
+        if upserted is None and deleted_keys is None:
+            self.change_log.reset()
+        else:
+            self.change_log.record([self.record_key(d) for d in upserted or []], deleted_keys or [])
+        self.events.publish("dishes", version=version, change_version=self.change_log.version,
+                            upserted=[self.record_key(d) for d in upserted] if upserted is not None else None,
+                            deleted=deleted_keys)
     
-    def save_dishes(self, dishes: List[Dict]):
-        """Save dishes to JSON file."""
-        os.makedirs(os.path.dirname(self.dishes_file), exist_ok=True)
-        with open(self.dishes_file, 'w', encoding='utf-8') as f:
-            json.dump(dishes, f, ensure_ascii=False, indent=2)
+    def _set_dishes(self, dishes: List[Dict], version: Optional[tuple]):
+        """Replace the in-memory library and rebuild the indexes."""
+        self._dishes = dishes
+        self._by_key = {}
+        self._by_name = {}
+        for dish in dishes:
+            self._by_key.setdefault(self.record_key(dish), []).append(dish)
+            self._by_name.setdefault(dish.get("name"), []).append(dish)
+        self._version = version
+    
+    def _ensure_loaded(self) -> List[Dict]:
+        """Return the resident library, reloading only if the store changed."""
+        if self._version is None or self.store.get_version() != self._version:
+            dishes, version = self.store.load()
+            self._set_dishes(dishes, version)
+            # Changed outside this manager: the log cannot say what changed
+            self.change_log.reset()
+        return self._dishes
+    
+    def get_change_version(self) -> int:
+        """Change-log version matching the current library (for get_changes)."""
+        self._ensure_loaded()
+        return self.change_log.version
+    
+    def get_changes(self, since: int) -> tuple:
+        """
+        Dishes changed after change-log version since.
+        Returns (changes, version): changes holds {"version", "op", "key"}
+        entries, upserts with the current "dish"; it is None if the changes
+        are no longer known and the client must reload the whole library.
+        """
+        self._ensure_loaded()
+        version = self.change_log.version
+        changes = self.change_log.since(since)
+        for change in changes or []:
+            dishes = self._by_key.get(change["key"])
+            if change["op"] == "upsert" and dishes:
+                change["dish"] = dict(dishes[0])
+            else:
+                change["op"] = "delete"
+        return changes, version
+    
+    def _find_by_id(self, dish_id: int) -> Optional[Dict]:
+        """First resident dish whose id equals dish_id."""
+        for dish in self._by_key.get(self.record_key({"id": dish_id}), []):
+            if dish.get("id") == dish_id:
+                return dish
+        return None
     
     def validate_dish(self, dish: Dict) -> tuple:
         """Validate dish structure. Returns (is_valid, error_message)."""
@@ -59,86 +161,100 @@ class DishManager:
     
     def get_all_dishes(self) -> List[Dict]:
         """Get all dishes."""
-        return self.load_dishes()
+        return [dict(dish) for dish in self._ensure_loaded()]
+    
+    def _use_point_lookups(self) -> bool:
+        """
+        True if single dishes should be fetched from the store: it has
+        indexed lookups and the resident library is out of date, so a
+        lookup need not reload the whole library.
+        """
+        return getattr(self.store, "POINT_LOOKUPS", False) and (
+            self._version is None or self.store.get_version() != self._version)
     
     def get_dish_by_id(self, dish_id: int) -> Optional[Dict]:
         """Get a dish by ID."""
-        dishes = self.load_dishes()
-        for dish in dishes:
-            if dish.get("id") == dish_id:
-                return dish
-        return None
+        if self._use_point_lookups():
+            dish = self.store.get(self.record_key({"id": dish_id}))
+            return dish if dish is not None and dish.get("id") == dish_id else None
+        self._ensure_loaded()
+        dishes = self._by_key.get(self.record_key({"id": dish_id}))
+        return dict(dishes[0]) if dishes else None
+    
+    def get_dish_by_name(self, name: str) -> Optional[Dict]:
+        """Get a dish by its exact name."""
+        if self._use_point_lookups():
+            return self.store.get_by_name(name)
+        self._ensure_loaded()
+        dishes = self._by_name.get(name)
+        return dict(dishes[0]) if dishes else None
     
     def add_dish(self, dish: Dict) -> tuple:
         """
         Add a new dish. Returns (success, error_message, dish_with_id).
         """
-        is_valid, error = self.validate_dish(dish)
-        if not is_valid:
-            return False, error, None
-        
-        dishes = self.load_dishes()
-        
-        # Check for duplicate name
-        if any(d.get("name") == dish["name"] for d in dishes):
-            return False, f"Dish '{dish['name']}' already exists", None
-        
-        # Generate new ID
-        max_id = max([d.get("id", 0) for d in dishes], default=0)
-        dish["id"] = max_id + 1
-        
-        dishes.append(dish)
-        self.save_dishes(dishes)
-        
-        return True, None, dish
+        with self.store.lock():
+            is_valid, error = self.validate_dish(dish)
+            if not is_valid:
+                return False, error, None
+            
+            dishes = self._ensure_loaded()
+            
+            # Check for duplicate name
+            if dish["name"] in self._by_name:
+                return False, f"Dish '{dish['name']}' already exists", None
+            
+            # Generate new ID
+            max_id = max([d.get("id", 0) for d in dishes], default=0)
+            dish["id"] = max_id + 1
+            
+            new_dish = dict(dish)
+            dishes.append(new_dish)
+            self.save_dishes(dishes, upserted=[new_dish])
+            
+            return True, None, dish
     
     def update_dish(self, dish_id: int, dish_data: Dict) -> tuple:
         """
         Update an existing dish. Returns (success, error_message, updated_dish).
         """
-        dishes = self.load_dishes()
-        
-        # Find dish
-        dish_index = None
-        for i, dish in enumerate(dishes):
-            if dish.get("id") == dish_id:
-                dish_index = i
-                break
-        
-        if dish_index is None:
-            return False, f"Dish with ID {dish_id} not found", None
-        
-        # Merge updates
-        updated_dish = {**dishes[dish_index], **dish_data}
-        updated_dish["id"] = dish_id  # Ensure ID doesn't change
-        
-        # Validate
-        is_valid, error = self.validate_dish(updated_dish)
-        if not is_valid:
-            return False, error, None
-        
-        # Check for duplicate name (excluding current dish)
-        if any(d.get("id") != dish_id and d.get("name") == updated_dish["name"] 
-               for d in dishes):
-            return False, f"Dish '{updated_dish['name']}' already exists", None
-        
-        dishes[dish_index] = updated_dish
-        self.save_dishes(dishes)
-        
-        return True, None, updated_dish
+        with self.store.lock():
+            dishes = self._ensure_loaded()
+            
+            # Find dish
+            dish = self._find_by_id(dish_id)
+            if dish is None:
+                return False, f"Dish with ID {dish_id} not found", None
+            
+            # Merge updates
+            updated_dish = {**dish, **dish_data}
+            updated_dish["id"] = dish_id  # Ensure ID doesn't change
+            
+            # Validate
+            is_valid, error = self.validate_dish(updated_dish)
+            if not is_valid:
+                return False, error, None
+            
+            # Check for duplicate name (excluding current dish)
+            if any(d.get("id") != dish_id for d in self._by_name.get(updated_dish["name"], [])):
+                return False, f"Dish '{updated_dish['name']}' already exists", None
+            
+            dish.clear()
+            dish.update(updated_dish)
+            self.save_dishes(dishes, upserted=[dish])
+            
+            return True, None, dict(dish)
     
     def delete_dish(self, dish_id: int) -> tuple:
         """
         Delete a dish. Returns (success, error_message).
         """
-        dishes = self.load_dishes()
-        
-        original_count = len(dishes)
-        dishes = [d for d in dishes if d.get("id") != dish_id]
-        
-        if len(dishes) == original_count:
-            return False, f"Dish with ID {dish_id} not found"
-        
-        self.save_dishes(dishes)
-        return True, None
-
+        with self.store.lock():
+            dishes = self._ensure_loaded()
+            
+            if self._find_by_id(dish_id) is None:
+                return False, f"Dish with ID {dish_id} not found"
+            
+            dishes = [d for d in dishes if d.get("id") != dish_id]
+            self.save_dishes(dishes, deleted_keys=[self.record_key({"id": dish_id})])
+            return True, None
@@ -0,0 +1,104 @@
+import json
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from events import EventBus
+
+
+class Subscription:
+    """
+    One stream subscriber's bounded queue of (id, topic, data) events,
+    data being the event serialized as JSON.
+    
+    The publishing side never blocks: when the queue is full the oldest
+    event is dropped and counted, and the reader gets a "resync" event
+    (data {"missed": n}) before the remaining ones, telling the client to
+    reload everything instead of relying on the events it missed.
+    """
+    
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self.missed = 0
+        self.closed = False
+    
+    def offer(self, item: Tuple[int, str, str]):
+        """Queue an event, dropping the oldest one if the queue is full."""
+        with self._condition:
+            if self.closed:
+                return
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.missed += 1
+            self._queue.append(item)
+            self._condition.notify()
+    
+    def get(self, timeout: Optional[float] = None) -> List[Tuple[Optional[int], str, str]]:
+        """Wait up to timeout for events; returns the queued events ([] on timeout or close)."""
+        with self._condition:
+            if not self._queue and not self.closed:
+                self._condition.wait(timeout)
+            items = list(self._queue)
+            self._queue.clear()
+            if self.missed and items:
+                items.insert(0, (None, "resync", json.dumps({"missed": self.missed})))
+                self.missed = 0
+            return items
+    
+    def close(self):
+        """Stop receiving events and wake a waiting reader."""
+        with self._condition:
+            self.closed = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+
+class EventBroadcaster:
+    """
+    Fans EventBus events (dishes, inventory, meal_plans, past_meals, ...)
+    out to stream subscribers such as the /api/events Server-Sent Events
+    endpoint. Each event is serialized once and gets an increasing id.
+    """
+    
+    def __init__(self, events: EventBus, max_queue: int = 256, max_subscribers: int = 100):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._next_id = 1
+        self._unsubscribe = events.subscribe(None, self._on_event)
+    
+    def _on_event(self, event: Dict):
+        with self._lock:
+            if not self._subscribers:
+                return
+            event_id = self._next_id
+            self._next_id += 1
+            subscribers = list(self._subscribers)
+        data = {key: value for key, value in event.items() if key != "topic"}
+        item = (event_id, event["topic"], json.dumps(data, ensure_ascii=False, default=str))
+        for subscription in subscribers:
+            subscription.offer(item)
+    
+    def subscribe(self) -> Optional[Subscription]:
+        """Start a subscription, or return None if there are already max_subscribers."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self.max_queue)
+            self._subscribers.append(subscription)
+            return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        """End a subscription."""
+        subscription.close()
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+    
+    def subscriber_count(self) -> int:
+        """Number of open subscriptions."""
+        with self._lock:
+            return len(self._subscribers)
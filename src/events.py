@@ -0,0 +1,49 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for data change events.
+    
+    Managers publish an event after every successful save, e.g.
+        {"topic": "dishes", "version": ..., "upserted": ["3"], "deleted": []}
+    and derived caches (ingredient index, plan cache, ...) subscribe to drop
+    their state. Handlers run synchronously in the publishing thread; a
+    failing handler is logged and does not affect the others or the save.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers: List[Tuple[Optional[str], Callable[[Dict], None]]] = []
+    
+    def subscribe(self, topic: Optional[str], handler: Callable[[Dict], None]) -> Callable[[], None]:
+        """
+        Call handler(event) for every event on topic (None: every topic).
+        Returns a function that removes the subscription.
+        """
+        entry = (topic, handler)
+        with self._lock:
+            self._handlers.append(entry)
+        
+        def unsubscribe():
+            with self._lock:
+                if entry in self._handlers:
+                    self._handlers.remove(entry)
+        return unsubscribe
+    
+    def publish(self, topic: str, **data) -> Dict:
+        """Deliver an event to the topic's handlers. Returns the event."""
+        event = {"topic": topic, **data}
+        with self._lock:
+            handlers = [handler for subscribed, handler in self._handlers
+                        if subscribed is None or subscribed == topic]
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Event handler failed for %s", topic)
+        return event
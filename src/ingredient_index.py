@@ -0,0 +1,180 @@
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed set of keywords: finds every keyword
+    occurring in a text in a single pass over the text. Matching is
+    case-sensitive; callers lowercase keywords and text if they need to.
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        
+        for word in sorted(set(keywords)):
+            if not word:
+                continue
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(word)
+        
+        # Breadth-first pass to fill failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def find_all(self, text: str) -> Set[str]:
+        """Return every non-empty keyword that occurs as a substring of text."""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._output[state])
+        return found
+
+
+class IngredientMatchIndex:
+    """
+    Precomputed index over the dish ingredient vocabulary.
+    
+    Answers "which dish ingredients does this inventory match?" with the same
+    semantics as RecipePlanner.match_ingredient, without comparing every
+    (ingredient, inventory item) pair:
+    - exact / inventory-in-ingredient: lookup in a substring -> ingredients map
+    - ingredient-in-inventory: KeywordAutomaton scan of the inventory name
+    - shared 2-char prefix: lookup in a prefix -> ingredients bucket map
+    
+    All keys are lowercased, matching match_ingredient.
+    """
+    
+    def __init__(self, ingredients: Iterable[str]):
+        self.vocabulary: List[str] = sorted({ingredient.lower() for ingredient in ingredients})
+        
+        # 2-char prefix -> ingredients of length >= 2 with that prefix
+        self._prefix_buckets: Dict[str, Set[str]] = {}
+        # every substring of every ingredient -> ingredients containing it
+        self._containing: Dict[str, Set[str]] = {}
+        
+        for word in self.vocabulary:
+            if len(word) >= 2:
+                self._prefix_buckets.setdefault(word[:2], set()).add(word)
+            for start in range(len(word)):
+                for end in range(start + 1, len(word) + 1):
+                    self._containing.setdefault(word[start:end], set()).add(word)
+        
+        self._automaton = KeywordAutomaton(self.vocabulary)
+    
+    def _find_contained(self, text: str) -> Set[str]:
+        """Return every vocabulary ingredient that occurs as a substring of text."""
+        return self._automaton.find_all(text)
+    
+    def match_inventory(self, inventory_items: Iterable[str]) -> Set[str]:
+        """
+        Return the set of lowercased vocabulary ingredients matched by at
+        least one inventory item.
+        """
+        matched: Set[str] = set()
+        has_items = False
+        
+        for inv_item in inventory_items:
+            has_items = True
+            inventory_lower = inv_item.lower()
+            
+            # An empty name is a substring of every ingredient
+            if not inventory_lower:
+                return set(self.vocabulary)
+            
+            # Exact match, or inventory item contained in ingredient
+            matched.update(self._containing.get(inventory_lower, ()))
+            # Ingredient contained in inventory item
+            matched.update(self._find_contained(inventory_lower))
+            # Shared 2-char prefix
+            if len(inventory_lower) >= 2:
+                matched.update(self._prefix_buckets.get(inventory_lower[:2], ()))
+        
+        # An empty ingredient is a substring of any inventory item
+        if has_items and self.vocabulary and self.vocabulary[0] == "":
+            matched.add("")
+        
+        return matched
+
+
+class ItemNameIndex:
+    """
+    Index over a list of inventory item names answering "which item does
+    this dish ingredient draw from?" the way InventoryManager.consume_ingredients
+    does: the first item, in list order, whose name equals, contains or is
+    contained in the ingredient (case-insensitive, no prefix matching).
+    
+    Building it is linear in the total length of the names: a map of each
+    lowercase name to its first position, and the names joined into one
+    text, so the first name containing an ingredient is a single str.find.
+    """
+    
+    SEPARATOR = "\x00"
+    
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = [name.lower() for name in names]
+        # lowercase name -> first position
+        self._name_positions: Dict[str, int] = {}
+        for position, name in enumerate(self.names):
+            self._name_positions.setdefault(name, position)
+        # Start offset of each name in the joined text
+        self._text = self.SEPARATOR.join(self.names)
+        self._offsets: List[int] = []
+        offset = 0
+        for name in self.names:
+            self._offsets.append(offset)
+            offset += len(name) + 1
+    
+    def _first_containing(self, word: str) -> Optional[int]:
+        """Position of the first name containing word, or None."""
+        if not self.names:
+            return None
+        if self.SEPARATOR in word:
+            return next((position for position, name in enumerate(self.names) if word in name), None)
+        found = self._text.find(word)
+        return bisect_right(self._offsets, found) - 1 if found != -1 else None
+    
+    def match(self, ingredient: str) -> Optional[int]:
+        """
+        Position of the item the ingredient draws from, or None.
+        Costs one str.find over the names plus O(len(ingredient)^2) lookups.
+        """
+        word = ingredient.lower()
+        # Items whose name contains the ingredient (including an exact match)
+        best = self._first_containing(word)
+        # Items whose name is contained in the ingredient
+        candidates = [self._name_positions.get("")]
+        for start in range(len(word)):
+            for end in range(start + 1, len(word) + 1):
+                candidates.append(self._name_positions.get(word[start:end]))
+        for position in candidates:
+            if position is not None and (best is None or position < best):
+                best = position
+        return best
+    
+    def match_all(self, ingredients: Iterable[str]) -> Dict[str, Optional[int]]:
+        """Position of the item each ingredient draws from, keyed by lowercased ingredient."""
+        return {ingredient.lower(): self.match(ingredient) for ingredient in ingredients}
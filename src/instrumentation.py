@@ -0,0 +1,189 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    In-process metrics registry rendered in the Prometheus text format.
+    
+    Holds counters, gauges and histograms keyed by name and label set. Updates take
+    one lock and a dict lookup, so they are cheap enough to leave on for
+    every request and storage call.
+    """
+    
+    # Histogram upper bounds in seconds
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self, prefix: str = "weekly_recipes"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._gauges: Dict[str, Dict[LabelSet, float]] = {}
+        # name -> labels -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[LabelSet, list]] = {}
+    
+    def describe(self, name: str, kind: str, help_text: str):
+        """Register a metric's type ("counter", "gauge" or "histogram") and help text."""
+        self._help[name] = (kind, help_text)
+    
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+    
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add value to a counter."""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+    
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge to value."""
+        key = self._labels(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram."""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.BUCKETS) + [0.0, 0]
+            position = bisect_left(self.BUCKETS, value)
+            if position < len(self.BUCKETS):
+                state[position] += 1
+            state[-2] += value
+            state[-1] += 1
+    
+    def reset(self):
+        """Drop every recorded value."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+    
+    @staticmethod
+    def _format_labels(labels: LabelSet, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+                   for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+            histograms = {name: {labels: list(state) for labels, state in series.items()}
+                          for name, series in self._histograms.items()}
+        
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted(values):
+                full_name = f"{self.prefix}_{name}"
+                _, help_text = self._help.get(name, (kind, ""))
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for labels, value in sorted(values[name].items()):
+                    lines.append(f"{full_name}{self._format_labels(labels)} {value:g}")
+        
+        for name in sorted(histograms):
+            full_name = f"{self.prefix}_{name}"
+            _, help_text = self._help.get(name, ("histogram", ""))
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} histogram")
+            for labels, state in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS, state):
+                    cumulative += count
+                    lines.append(f"{full_name}_bucket{self._format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{full_name}_bucket{self._format_labels(labels, ('le', '+Inf'))} {state[-1]}")
+                lines.append(f"{full_name}_sum{self._format_labels(labels)} {state[-2]:.6f}")
+                lines.append(f"{full_name}_count{self._format_labels(labels)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide registry used by the timers and I/O hooks below
+metrics = Metrics()
+metrics.describe("http_request_duration_seconds", "histogram", "Request latency by endpoint.")
+metrics.describe("http_requests_total", "counter", "Requests by endpoint and status code.")
+metrics.describe("http_request_bytes_read_total", "counter", "Storage bytes read while serving requests.")
+metrics.describe("http_request_bytes_written_total", "counter", "Storage bytes written while serving requests.")
+metrics.describe("http_request_file_opens_total", "counter", "Files opened while serving requests.")
+metrics.describe("operation_duration_seconds", "histogram", "Time spent in storage, parsing and planning calls.")
+metrics.describe("storage_bytes_read_total", "counter", "Bytes read by data source.")
+metrics.describe("storage_bytes_written_total", "counter", "Bytes written by data source.")
+metrics.describe("storage_file_opens_total", "counter", "Files opened by data source.")
+metrics.describe("event_stream_subscribers", "gauge", "Open /api/events subscriptions.")
+
+# I/O totals of the request being served by the current thread, if any
+_request_io = threading.local()
+
+
+def record_io(source: str, bytes_read: int = 0, bytes_written: int = 0, opens: int = 0):
+    """Count storage I/O against a data source (and the current request)."""
+    if bytes_read:
+        metrics.inc("storage_bytes_read_total", bytes_read, source=source)
+    if bytes_written:
+        metrics.inc("storage_bytes_written_total", bytes_written, source=source)
+    if opens:
+        metrics.inc("storage_file_opens_total", opens, source=source)
+    
+    totals = getattr(_request_io, "totals", None)
+    if totals is not None:
+        totals["bytes_read"] += bytes_read
+        totals["bytes_written"] += bytes_written
+        totals["file_opens"] += opens
+
+
+def start_request():
+    """Start counting I/O for a request served by the current thread."""
+    _request_io.totals = {"bytes_read": 0, "bytes_written": 0, "file_opens": 0}
+
+
+def finish_request(method: str, endpoint: str, status: int, seconds: float) -> Dict[str, int]:
+    """Record a finished request; returns the I/O it performed."""
+    totals = getattr(_request_io, "totals", None) or {"bytes_read": 0, "bytes_written": 0, "file_opens": 0}
+    _request_io.totals = None
+    
+    metrics.observe("http_request_duration_seconds", seconds, method=method, endpoint=endpoint)
+    metrics.inc("http_requests_total", method=method, endpoint=endpoint, status=status)
+    if totals["bytes_read"]:
+        metrics.inc("http_request_bytes_read_total", totals["bytes_read"], endpoint=endpoint)
+    if totals["bytes_written"]:
+        metrics.inc("http_request_bytes_written_total", totals["bytes_written"], endpoint=endpoint)
+    if totals["file_opens"]:
+        metrics.inc("http_request_file_opens_total", totals["file_opens"], endpoint=endpoint)
+    return totals
+
+
+@contextmanager
+def timer(operation: str):
+    """Record the duration of the enclosed block under operation."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe("operation_duration_seconds", time.perf_counter() - start, operation=operation)
+
+
+def timed(func: Callable) -> Callable:
+    """Decorator: record each call's duration under the function's qualified name."""
+    operation = func.__qualname__
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timer(operation):
+            return func(*args, **kwargs)
+    return wrapper
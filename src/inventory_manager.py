@@ -1,72 +1,214 @@
-import json
 import os
 from typing import List, Dict, Optional
 
+from change_log import ChangeLog
+from events import EventBus
+from ingredient_index import ItemNameIndex
+from instrumentation import timed
+from json_store import JsonCollection
+
 
 class InventoryManager:
     """Manage inventory with CRUD operations."""
     
-    def __init__(self, inventory_file: str = "data/inventory.json"):
+    def __init__(self, inventory_file: str = "data/inventory.json", store=None,
+                 events: Optional[EventBus] = None):
+        """
+        store: optional storage backend (e.g. sqlite_store.SqliteCollection);
+        defaults to a JsonCollection on inventory_file.
+        events: optional shared EventBus; an "inventory" event is published
+        after every save.
+        """
         # Make path relative to project root
         if not os.path.isabs(inventory_file):
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.inventory_file = os.path.join(project_root, inventory_file)
         else:
             self.inventory_file = inventory_file
+        self.store = store if store is not None else JsonCollection(self.inventory_file, self.record_key)
+        self.events = events if events is not None else EventBus()
         self._ensure_file_exists()
+        
+        # Resident copy of the inventory plus a lowercase name -> item index.
+        # Reloaded only when the store's version changes.
+        self._items: List[Dict] = []
+        self._index: Dict[str, Dict] = {}
+        self._version = None
+        # Per-item changes for delta sync (see get_changes)
+        self.change_log = ChangeLog()
+        # Lowercased ingredient -> lowercase name of the item it draws from
+        # (None if none), filled on demand. Saves that add or delete items
+        # only drop the entries those names can affect.
+        self._matches: Dict[str, Optional[str]] = {}
+        self._match_names: Optional[List[str]] = None
+    
+    @staticmethod
+    def record_key(item: Dict) -> str:
+        """Storage key of an item: its lowercased name."""
+        return item.get("item", "").lower()
     
     def _ensure_file_exists(self):
         """Ensure inventory.json file exists, create if not."""
-        if not os.path.exists(self.inventory_file):
-            os.makedirs(os.path.dirname(self.inventory_file), exist_ok=True)
-            with open(self.inventory_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
+        self.store.ensure_exists()
     
+    @timed
     def load_inventory(self) -> List[Dict]:
         """Load all inventory items from JSON file."""
+        inventory, _ = self.store.load()
+        return inventory
+    
+    def get_version(self) -> Optional[tuple]:
+        """
+        Return a version token for the inventory.
+        Changes whenever the inventory is saved.
+        """
+        return self.store.get_version()
+    
+    @timed
+    def save_inventory(self, inventory: List[Dict], upserted: Optional[List[Dict]] = None,
+                       deleted_keys: Optional[List[str]] = None):
+        """
+        Atomically save inventory and refresh the in-memory store.
+        upserted/deleted_keys describe what changed, so row-based backends
+        can write only those items.
+        Raises StaleVersionError if the file changed since the resident copy
+        was loaded; mutations hold the store lock so this cannot happen to them.
+        """
         try:
-            with open(self.inventory_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            version = self.store.save(inventory, expected_version=self._version,
+                                      upserted=upserted, deleted_keys=deleted_keys)
+        except Exception:
+            # The resident copy may hold unsaved changes; force a reload
+            self._version = None
+            raise
+        self._set_items(inventory, version)
+        if upserted is None and deleted_keys is None:
+            self.change_log.reset()
+        else:
+            self.change_log.record([self.record_key(item) for item in upserted or []], deleted_keys or [])
+        self.events.publish("inventory", version=version, change_version=self.change_log.version,
+                            upserted=[self.record_key(item) for item in upserted] if upserted is not None else None,
+                            deleted=deleted_keys)
+    
+    def _set_items(self, inventory: List[Dict], version: Optional[tuple]):
+        """Replace the in-memory store and rebuild the name index."""
+        self._items = inventory
+        self._index = {}
+        for item in inventory:
+            # Keep the first occurrence, matching the old linear-scan behavior
+            self._index.setdefault(item.get("item", "").lower(), item)
+        self._version = version
+        self._update_matches([item.get("item", "").lower() for item in inventory])
     
-    def save_inventory(self, inventory: List[Dict]):
-        """Save inventory to JSON file."""
-        os.makedirs(os.path.dirname(self.inventory_file), exist_ok=True)
-        with open(self.inventory_file, 'w', encoding='utf-8') as f:
-            json.dump(inventory, f, ensure_ascii=False, indent=2)
+    def _update_matches(self, names: List[str]):
+        """
+        Keep the ingredient matches that are still right for the new item
+        names. Replaces self._matches rather than changing it, so a match
+        computed against the old names cannot land in the new dict.
+        """
+        old_names = self._match_names
+        self._match_names = names
+        if names == old_names:
+            return
+        if old_names is None:
+            self._matches = {}
+            return
+        
+        old_set, new_set = set(old_names), set(names)
+        # A match is the first related item in list order, so it only holds
+        # while the names present before and after keep their order
+        if [name for name in old_names if name in new_set] != [name for name in names if name in old_set]:
+            self._matches = {}
+            return
+        removed = old_set - new_set
+        added = new_set - old_set
+        self._matches = {ingredient: name for ingredient, name in self._matches.items()
+                         if name not in removed
+                         and not any(new in ingredient or ingredient in new for new in added)}
+    
+    def _ensure_loaded(self) -> List[Dict]:
+        """Return the resident inventory, reloading only if the file changed on disk."""
+        if self._version is None or self.store.get_version() != self._version:
+            inventory, version = self.store.load()
+            self._set_items(inventory, version)
+            # Changed outside this manager: the log cannot say what changed
+            self.change_log.reset()
+        return self._items
+    
+    def get_change_version(self) -> int:
+        """Change-log version matching the current inventory (for get_changes)."""
+        self._ensure_loaded()
+        return self.change_log.version
+    
+    def get_changes(self, since: int) -> tuple:
+        """
+        Items changed after change-log version since.
+        Returns (changes, version): changes holds {"version", "op", "key"}
+        entries, upserts with the current "item"; it is None if the changes
+        are no longer known and the client must reload the whole inventory.
+        """
+        self._ensure_loaded()
+        version = self.change_log.version
+        changes = self.change_log.since(since)
+        for change in changes or []:
+            item = self._index.get(change["key"])
+            if change["op"] == "upsert" and item is not None:
+                change["item"] = dict(item)
+            else:
+                change["op"] = "delete"
+        return changes, version
     
     def get_all_items(self) -> List[Dict]:
         """Get all inventory items."""
-        return self.load_inventory()
+        return [dict(item) for item in self._ensure_loaded()]
     
     def get_item_by_name(self, item_name: str) -> Optional[Dict]:
         """Get an inventory item by name."""
-        inventory = self.load_inventory()
-        for item in inventory:
-            if item.get("item", "").lower() == item_name.lower():
-                return item
-        return None
+        if getattr(self.store, "POINT_LOOKUPS", False) and (
+                self._version is None or self.store.get_version() != self._version):
+            # Indexed single-row lookup instead of reloading the whole inventory
+            return self.store.get(item_name.lower())
+        self._ensure_loaded()
+        item = self._index.get(item_name.lower())
+        return dict(item) if item is not None else None
     
-    def add_item(self, item_data: Dict) -> tuple:
+    def _match_items(self, ingredients: List[str]) -> List[Optional[Dict]]:
         """
-        Add a new inventory item or update existing one.
+        For each ingredient, the first resident item, in inventory order,
+        whose name equals, contains or is contained in it (case-insensitive).
+        Remembered matches cost a lookup; the rest are resolved together in
+        a fresh ItemNameIndex over the item names.
+        """
+        matches, names = self._matches, self._match_names
+        missing = {ingredient.lower() for ingredient in ingredients} - matches.keys()
+        if missing:
+            for word, position in ItemNameIndex(names).match_all(missing).items():
+                matches[word] = names[position] if position is not None else None
+        # The first item with the matched lowercase name is the first match
+        return [self._index.get(matches[ingredient.lower()]) if matches[ingredient.lower()] is not None else None
+                for ingredient in ingredients]
+    
+    def find_item_for_ingredient(self, ingredient: str) -> Optional[Dict]:
+        """
+        Find the inventory item a dish ingredient draws from: the first item
+        whose name equals, contains or is contained in the ingredient.
+        """
+        self._ensure_loaded()
+        item, = self._match_items([ingredient])
+        return dict(item) if item is not None else None
+    
+    def _merge_item(self, inventory: List[Dict], item_data: Dict) -> tuple:
+        """
+        Merge one item into the resident inventory without saving.
         Returns (success, error_message, item).
         """
-        if "item" not in item_data or not item_data["item"]:
+        if not isinstance(item_data, dict) or not item_data.get("item"):
             return False, "Item name is required", None
         
-        inventory = self.load_inventory()
         item_name = item_data["item"]
         
         # Check if item already exists
-        existing_item = None
-        existing_index = None
-        for i, item in enumerate(inventory):
-            if item.get("item", "").lower() == item_name.lower():
-                existing_item = item
-                existing_index = i
-                break
+        existing_item = self._index.get(item_name.lower())
         
         if existing_item:
             # Update existing item (merge quantities if same unit, otherwise replace)
@@ -76,108 +218,226 @@ class InventoryManager:
             else:
                 # Replace with new data
                 existing_item.update(item_data)
-            inventory[existing_index] = existing_item
-            self.save_inventory(inventory)
             return True, None, existing_item
-        else:
-            # Add new item
-            new_item = {
-                "item": item_data.get("item"),
-                "quantity": item_data.get("quantity", 0),
-                "unit": item_data.get("unit", "包"),
-                "category": item_data.get("category", "其他")
-            }
-            if "weight" in item_data:
-                new_item["weight"] = item_data["weight"]
+        
+        # Add new item
+        new_item = {
+            "item": item_data.get("item"),
+            "quantity": item_data.get("quantity", 0),
+            "unit": item_data.get("unit", "包"),
+            "category": item_data.get("category", "其他")
+        }
+        if "weight" in item_data:
+            new_item["weight"] = item_data["weight"]
+        
+        inventory.append(new_item)
+        self._index[item_name.lower()] = new_item
+        return True, None, new_item
+    
+    def _update_item(self, item_name: str, updates: Dict) -> tuple:
+        """
+        Apply updates to one resident item without saving.
+        Returns (success, error_message, updated_item).
+        """
+        item = self._index.get(item_name.lower())
+        if item is None:
+            return False, f"Item '{item_name}' not found", None
+        
+        item.update(updates)
+        # Ensure item name doesn't change
+        item["item"] = item_name
+        return True, None, item
+    
+    def add_item(self, item_data: Dict) -> tuple:
+        """
+        Add a new inventory item or update existing one.
+        Returns (success, error_message, item).
+        """
+        with self.store.lock():
+            inventory = self._ensure_loaded()
+            success, error, item = self._merge_item(inventory, item_data)
+            if not success:
+                return False, error, None
+            
+            self.save_inventory(inventory, upserted=[item])
+            return True, None, dict(item)
+    
+    def add_items(self, items: List[Dict]) -> List[tuple]:
+        """
+        Add or merge many inventory items with a single save.
+        Uses the same merge rules as add_item.
+        Returns list of (success, error_message, item), one per input item.
+        """
+        return self.apply_batch([{"op": "add", "item": item} for item in items])
+    
+    def apply_batch(self, operations: List[Dict]) -> List[tuple]:
+        """
+        Apply a list of add/update/delete operations with a single save.
+        
+        Each operation is one of:
+            {"op": "add", "item": {...}}
+            {"op": "update", "name": "...", "updates": {...}}
+            {"op": "delete", "name": "..."}
+        
+        Operations are applied in order; a failing operation does not stop
+        the rest. Returns list of (success, error_message, item), one per
+        operation (item is None for deletes and failures).
+        """
+        with self.store.lock():
+            inventory = self._ensure_loaded()
+            try:
+                return self._apply_operations(inventory, operations)
+            except Exception:
+                # Operations change the resident items in place; reload them on the next read
+                self._version = None
+                raise
+    
+    def _apply_operations(self, inventory: List[Dict], operations: List[Dict]) -> List[tuple]:
+        """Apply batch operations and save once; caller holds the store lock."""
+        results = []
+        removed = set()  # id() of deleted item dicts
+        touched = {}  # id() -> item dict, for added/updated items
+        deleted_keys = []
+        changed = False
+        
+        # Items whose name matches an earlier item's apart from case; a delete removes them too
+        shadowed: Dict[str, List[Dict]] = {}
+        for item in inventory:
+            key = self.record_key(item)
+            if self._index.get(key) is not item:
+                shadowed.setdefault(key, []).append(item)
+        
+        for operation in operations:
+            if not isinstance(operation, dict):
+                results.append((False, "Operation must be a dictionary", None))
+                continue
+            
+            op = operation.get("op")
+            if op == "add":
+                success, error, item = self._merge_item(inventory, operation.get("item"))
+            elif op == "update":
+                success, error, item = self._update_item(operation.get("name", ""),
+                                                         operation.get("updates") or {})
+            elif op == "delete":
+                item_name = operation.get("name", "")
+                item = self._index.pop(item_name.lower(), None)
+                if item is None:
+                    success, error = False, f"Item '{item_name}' not found"
+                else:
+                    success, error = True, None
+                    removed.add(id(item))
+                    removed.update(id(other) for other in shadowed.pop(item_name.lower(), []))
+                    deleted_keys.append(item_name.lower())
+                item = None
+            else:
+                success, error, item = False, f"Unknown operation '{op}'", None
             
-            inventory.append(new_item)
-            self.save_inventory(inventory)
-            return True, None, new_item
+            if success and item is not None:
+                touched[id(item)] = item
+            changed = changed or success
+            results.append((success, error, dict(item) if item is not None else None))
+        
+        if changed:
+            if removed:
+                inventory = [item for item in inventory if id(item) not in removed]
+            upserted = [item for key, item in touched.items() if key not in removed]
+            self.save_inventory(inventory, upserted=upserted, deleted_keys=deleted_keys)
+        
+        return results
     
     def update_item(self, item_name: str, updates: Dict) -> tuple:
         """
         Update an inventory item.
         Returns (success, error_message, updated_item).
         """
-        inventory = self.load_inventory()
-        
-        for i, item in enumerate(inventory):
-            if item.get("item", "").lower() == item_name.lower():
-                item.update(updates)
-                # Ensure item name doesn't change
-                item["item"] = item_name
-                inventory[i] = item
-                self.save_inventory(inventory)
-                return True, None, item
-        
-        return False, f"Item '{item_name}' not found", None
+        with self.store.lock():
+            inventory = self._ensure_loaded()
+            success, error, item = self._update_item(item_name, updates)
+            if not success:
+                return False, error, None
+            
+            self.save_inventory(inventory, upserted=[item])
+            return True, None, dict(item)
     
     def delete_item(self, item_name: str) -> tuple:
         """
         Delete an inventory item.
         Returns (success, error_message).
         """
-        inventory = self.load_inventory()
-        original_count = len(inventory)
-        
-        inventory = [item for item in inventory 
-                    if item.get("item", "").lower() != item_name.lower()]
-        
-        if len(inventory) == original_count:
-            return False, f"Item '{item_name}' not found"
-        
-        self.save_inventory(inventory)
-        return True, None
+        with self.store.lock():
+            inventory = self._ensure_loaded()
+            
+            if item_name.lower() not in self._index:
+                return False, f"Item '{item_name}' not found"
+            
+            inventory = [item for item in inventory 
+                        if item.get("item", "").lower() != item_name.lower()]
+            
+            self.save_inventory(inventory, deleted_keys=[item_name.lower()])
+            return True, None
     
     def decrease_item_quantity(self, item_name: str, amount: float) -> tuple:
         """
         Decrease item quantity by amount.
         Returns (success, error_message, updated_item).
         """
-        inventory = self.load_inventory()
-        
-        for i, item in enumerate(inventory):
-            if item.get("item", "").lower() == item_name.lower():
-                current_qty = item.get("quantity", 0)
-                new_qty = max(0, current_qty - amount)  # Don't go below 0
-                item["quantity"] = new_qty
-                inventory[i] = item
-                self.save_inventory(inventory)
-                return True, None, item
-        
-        return False, f"Item '{item_name}' not found", None
+        with self.store.lock():
+            inventory = self._ensure_loaded()
+            
+            item = self._index.get(item_name.lower())
+            if item is None:
+                return False, f"Item '{item_name}' not found", None
+            
+            current_qty = item.get("quantity", 0)
+            new_qty = max(0, current_qty - amount)  # Don't go below 0
+            item["quantity"] = new_qty
+            self.save_inventory(inventory, upserted=[item])
+            return True, None, dict(item)
     
-    def consume_ingredients(self, ingredients: List[str], amount: float = 1.0) -> Dict[str, tuple]:
+    def consume_ingredients(self, ingredients: List[str], amount: float = 1.0,
+                            amounts: Optional[Dict[str, float]] = None, dry_run: bool = False,
+                            require_all: bool = False) -> Dict[str, tuple]:
         """
         Consume ingredients (decrease quantity) when a dish is cooked.
         Uses partial matching to find inventory items.
+        
+        amounts optionally maps inventory item names to the amount taken from
+        them (default: amount). All decreases are saved in one write or not
+        at all; with require_all, nothing is consumed unless every ingredient
+        matches an item. With dry_run nothing is saved and the returned items
+        carry the projected quantities.
         Returns dict mapping ingredient_name -> (success, error_message, updated_item).
         """
-        results = {}
-        inventory = self.load_inventory()
-        
-        for ingredient in ingredients:
-            # Try exact match first
-            matched_item = None
-            for item in inventory:
-                item_name = item.get("item", "").lower()
-                ingredient_lower = ingredient.lower()
-                
-                # Exact match
-                if item_name == ingredient_lower:
-                    matched_item = item
-                    break
+        with self.store.lock():
+            inventory = self._ensure_loaded()
+            
+            # Match everything up front: decreasing quantities never changes names
+            matches = list(zip(ingredients, self._match_items(ingredients)))
+            
+            missing = [ingredient for ingredient, item in matches if not item]
+            if require_all and missing:
+                error = f"Nothing consumed: '{missing[0]}' not found in inventory"
+                return {ingredient: (False, f"'{ingredient}' not found in inventory" if not item else error, None)
+                        for ingredient, item in matches}
+            
+            results = {}
+            quantities = {}  # id(item) -> quantity after the decreases so far
+            touched = {}
+            for ingredient, item in matches:
+                if not item:
+                    results[ingredient] = (False, f"'{ingredient}' not found in inventory", None)
+                    continue
                 
-                # Partial match: ingredient contains item name or vice versa
-                if ingredient_lower in item_name or item_name in ingredient_lower:
-                    matched_item = item
-                    break
+                take = amount if amounts is None else amounts.get(item.get("item"), amount)
+                current_qty = quantities.get(id(item), item.get("quantity", 0))
+                quantities[id(item)] = max(0, current_qty - take)  # Don't go below 0
+                touched[id(item)] = item
+                results[ingredient] = (True, None, dict(item, quantity=quantities[id(item)]))
             
-            if matched_item:
-                success, error, updated_item = self.decrease_item_quantity(matched_item.get("item"), amount)
-                results[ingredient] = (success, error, updated_item)
-            else:
-                results[ingredient] = (False, f"'{ingredient}' not found in inventory", None)
-        
-        return results
-
+            if touched and not dry_run:
+                for key, item in touched.items():
+                    item["quantity"] = quantities[key]
+                # On failure save_inventory drops the resident copy, discarding every decrease
+                self.save_inventory(inventory, upserted=list(touched.values()))
+            
+            return results
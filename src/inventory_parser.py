@@ -1,5 +1,10 @@
 import re
-from typing import List, Dict, Optional
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ingredient_index import KeywordAutomaton
+from instrumentation import timed
 
 
 # Category mapping based on ingredient keywords
@@ -13,24 +18,75 @@ CATEGORY_KEYWORDS = {
     "调料": ["油", "盐", "酱", "醋", "糖", "淀粉", "蚝油", "生抽", "老抽", "料酒", "调料", "酸菜"]
 }
 
+# Number of leading lines inspected when sniffing the format of a line stream
+SNIFF_LINES = 3
+
+TABLE_HEADER_MARKERS = ('Ingredient Name', '食材名称', 'Item')
+TABLE_SPLIT_PATTERN = re.compile(r'\t+|\s{2,}')
+WEIGHT_UNIT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(克|斤|两|磅|盎司|kg|g|oz|lb)')
+QUANTITY_PATTERN = re.compile(r'数量:\s*(\d+(?:\.\d+)?)')
+INGREDIENT_PATTERNS = (
+    re.compile(r'(排骨|鸡胸肉|鸡翅|牛肉|咸肉|青江菜|菠菜|莴笋|白菜|香菇|毛豆|大白菜|青葱|韭菜|空心菜|面筋|百叶|蚝油|酸菜|淀粉|地瓜粉|红薯淀粉)'),
+    re.compile(r'([^\\s]+(?:肉|菜|豆|菇|葱|蒜|姜|鱼|虾|蟹|贝|蛋|米|面|粉|油|盐|酱|醋|糖|调料))'),
+)
+
+# Explicit unit mentions in an item line, checked in priority order: (keyword, unit)
+UNIT_KEYWORDS = (
+    ('个', '个'),
+    ('把', '把'),
+    ('包', '包'),
+    ('袋', '包'),
+    ('盒', '盒'),
+    ('瓶', '瓶'),
+    ('磅', '磅'),
+    ('盎司', '盎司'),
+    ('克', '克'),
+    ('斤', '斤'),
+)
+NAME_SPECIFIERS = frozenset(['原味', '日式', '台湾', '新鲜', '嫩', '大', '小', '1', '2', '3', '4', '5'])
+
+# Names containing one of these are never categorized as 肉类
+SEAFOOD_MARKERS = frozenset(["鱼", "虾", "蟹", "贝"])
+CATEGORY_CACHE_SIZE = 4096
+
+# keyword -> ranks (positions in CATEGORY_KEYWORDS) of the categories listing it, ascending
+_CATEGORIES = list(CATEGORY_KEYWORDS)
+_MEAT_RANK = _CATEGORIES.index("肉类")
+_KEYWORD_RANKS: Dict[str, List[int]] = {}
+for _rank, _keywords in enumerate(CATEGORY_KEYWORDS.values()):
+    for _keyword in _keywords:
+        _ranks = _KEYWORD_RANKS.setdefault(_keyword, [])
+        if _rank not in _ranks:
+            _ranks.append(_rank)
+_CATEGORY_AUTOMATON = KeywordAutomaton(list(_KEYWORD_RANKS) + list(SEAFOOD_MARKERS))
 
+
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
 def categorize_ingredient(ingredient_name: str) -> str:
-    """Categorize ingredient based on name keywords."""
-    ingredient_lower = ingredient_name.lower()
+    """
+    Categorize ingredient based on name keywords.
     
-    # Check each category
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in ingredient_name:
-                # Special handling: if it contains both meat and seafood keywords, prioritize seafood
-                if category == "肉类" and any(k in ingredient_name for k in ["鱼", "虾", "蟹", "贝"]):
-                    continue
-                return category
+    The first category in CATEGORY_KEYWORDS with a keyword in the name wins,
+    except that 肉类 is skipped for names that also contain a seafood marker.
+    Matching is one automaton pass; results are memoized per name.
+    """
+    matched = _CATEGORY_AUTOMATON.find_all(ingredient_name)
+    skip_meat = not matched.isdisjoint(SEAFOOD_MARKERS)
+    
+    best = None
+    for keyword in matched:
+        for rank in _KEYWORD_RANKS.get(keyword, ()):
+            if skip_meat and rank == _MEAT_RANK:
+                continue
+            if best is None or rank < best:
+                best = rank
+            break
     
     # Default to "其他" if no match
-    return "其他"
+    return _CATEGORIES[best] if best is not None else "其他"
 
 
+@timed
 def parse_weee_text(text: str) -> List[Dict[str, any]]:
     """
     Parse unstructured Weee purchase text into structured inventory.
@@ -47,32 +103,63 @@ def parse_weee_text(text: str) -> List[Dict[str, any]]:
     Returns list of inventory items with item, quantity, unit, category.
     """
     text = text.strip()
+    lines = text.split('\n')
     
-    # Check if it's tab-separated table format
-    if '\t' in text or (text.count('\t') > 0 or any(line.count('\t') >= 2 for line in text.split('\n')[:3])):
-        return parse_table_format(text)
+    # Any tab in the text means tab-separated table format
+    if '\t' in text:
+        return list(iter_table_items(lines))
     
     # Otherwise parse as Weee format
-    return parse_weee_format(text)
+    return list(iter_weee_items(lines))
 
 
-def parse_table_format(text: str) -> List[Dict[str, any]]:
-    """Parse tab-separated table format."""
-    inventory = []
-    lines = text.strip().split('\n')
+def iter_inventory_items(lines: Iterable[str]) -> Iterator[Dict[str, any]]:
+    """
+    Parse inventory items incrementally from any iterable of lines (a list,
+    an open file, a decoded request stream).
     
-    # Skip header if present
-    start_idx = 0
-    if lines and ('Ingredient Name' in lines[0] or '食材名称' in lines[0] or 'Item' in lines[0]):
-        start_idx = 1
+    The format is sniffed from the first SNIFF_LINES non-blank lines: a tab
+    in any of them selects the table format, otherwise the Weee format.
+    Items are yielded as soon as they are complete, so arbitrarily long
+    inputs parse in constant memory.
+    """
+    lines = iter(lines)
+    head = []
+    sniffed = 0
+    for line in lines:
+        head.append(line)
+        if line.strip():
+            sniffed += 1
+            if sniffed == SNIFF_LINES:
+                break
+    rest = chain(head, lines)
     
-    for line in lines[start_idx:]:
+    if any('\t' in line.strip() for line in head):
+        return iter_table_items(rest)
+    return iter_weee_items(rest)
+
+
+def parse_table_format(text: str) -> List[Dict[str, any]]:
+    """Parse tab-separated table format."""
+    return list(iter_table_items(text.strip().split('\n')))
+
+
+def iter_table_items(lines: Iterable[str]) -> Iterator[Dict[str, any]]:
+    """Yield items from tab-separated table lines, skipping a leading header row."""
+    first = True
+    for line in lines:
         line = line.strip()
         if not line:
             continue
         
+        # Skip header if present
+        if first:
+            first = False
+            if any(marker in line for marker in TABLE_HEADER_MARKERS):
+                continue
+        
         # Split by tab or multiple spaces
-        parts = re.split(r'\t+|\s{2,}', line)
+        parts = TABLE_SPLIT_PATTERN.split(line)
         if len(parts) < 3:
             # Try single space split
             parts = line.split()
@@ -89,47 +176,51 @@ def parse_table_format(text: str) -> List[Dict[str, any]]:
             except ValueError:
                 quantity = 1
             
-            inventory.append({
+            yield {
                 "item": item_name,
                 "quantity": quantity,
                 "unit": unit,
                 "category": category
-            })
-    
-    return inventory
+            }
 
 
 def parse_weee_format(text: str) -> List[Dict[str, any]]:
     """Parse Weee text format."""
-    inventory = []
-    lines = text.strip().split('\n')
+    return list(iter_weee_items(text.strip().split('\n')))
+
+
+def iter_weee_items(lines: Iterable[str]) -> Iterator[Dict[str, any]]:
+    """
+    Yield items from Weee text lines. Each "weee_" line is completed by the
+    line right after it, which carries the quantity; an item on the last
+    non-blank line has no quantity line and is dropped.
+    """
+    pending = None
+    pending_blank = False
     
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    for line in lines:
+        line = line.strip()
+        
+        if pending is not None:
+            if not line:
+                # A blank quantity line only counts if more text follows
+                pending_blank = True
+                continue
+            pending.update(parse_quantity_line('' if pending_blank else line))
+            # Add category
+            if pending.get("item"):
+                pending["category"] = categorize_ingredient(pending["item"])
+            yield pending
+            consumed = not pending_blank
+            pending = None
+            pending_blank = False
+            if consumed:
+                continue
         
         # Look for lines starting with "weee_"
         if line.startswith('weee_'):
-            # Extract item information
-            item_info = parse_item_line(line)
-            
-            # Look for quantity in next line
-            if i + 1 < len(lines):
-                next_line = lines[i + 1].strip()
-                quantity_info = parse_quantity_line(next_line)
-                
-                if item_info:
-                    item_info.update(quantity_info)
-                    # Add category
-                    if item_info.get("item"):
-                        item_info["category"] = categorize_ingredient(item_info["item"])
-                    inventory.append(item_info)
-                    i += 2
-                    continue
-        
-        i += 1
-    
-    return inventory
+            # Extract item information; the next line holds its quantity
+            pending = parse_item_line(line)
 
 
 def parse_item_line(line: str) -> Optional[Dict[str, any]]:
@@ -139,7 +230,7 @@ def parse_item_line(line: str) -> Optional[Dict[str, any]]:
     
     # Pattern: brand name(s) + item name + optional flavor/spec + optional weight/unit
     # Try to extract weight/unit first (pattern: number + 克/斤/两/磅/盎司)
-    weight_unit_match = re.search(r'(\d+(?:\.\d+)?)\s*(克|斤|两|磅|盎司|kg|g|oz|lb)', content)
+    weight_unit_match = WEIGHT_UNIT_PATTERN.search(content)
     weight = None
     unit = None
     if weight_unit_match:
@@ -154,25 +245,10 @@ def parse_item_line(line: str) -> Optional[Dict[str, any]]:
         content = content[:weight_unit_match.start()].strip()
     
     # Check for explicit unit mentions (个, 把, 包, etc.)
-    unit_keywords = {
-        '个': ['个'],
-        '把': ['把'],
-        '包': ['包', '袋'],
-        '盒': ['盒'],
-        '瓶': ['瓶'],
-        '磅': ['磅'],
-        '盎司': ['盎司'],
-        '克': ['克'],
-        '斤': ['斤']
-    }
-    
     if not unit:
-        for u, keywords in unit_keywords.items():
-            for keyword in keywords:
-                if keyword in content:
-                    unit = u
-                    break
-            if unit:
+        for keyword, keyword_unit in UNIT_KEYWORDS:
+            if keyword in content:
+                unit = keyword_unit
                 break
     
     # Split by spaces to get parts
@@ -190,23 +266,17 @@ def parse_item_line(line: str) -> Optional[Dict[str, any]]:
     item_name = None
     
     # Strategy: Look for common ingredient keywords
-    ingredient_patterns = [
-        r'(排骨|鸡胸肉|鸡翅|牛肉|咸肉|青江菜|菠菜|莴笋|白菜|香菇|毛豆|大白菜|青葱|韭菜|空心菜|面筋|百叶|蚝油|酸菜|淀粉|地瓜粉|红薯淀粉)',
-        r'([^\\s]+(?:肉|菜|豆|菇|葱|蒜|姜|鱼|虾|蟹|贝|蛋|米|面|粉|油|盐|酱|醋|糖|调料))',
-    ]
-    
-    for pattern in ingredient_patterns:
-        match = re.search(pattern, content)
+    for pattern in INGREDIENT_PATTERNS:
+        match = pattern.search(content)
         if match:
             item_name = match.group(1)
             break
     
     # Fallback: use the last meaningful part (skip common specifiers)
     if not item_name:
-        specifiers = ['原味', '日式', '台湾', '新鲜', '嫩', '大', '小', '1', '2', '3', '4', '5']
         for j in range(len(parts) - 1, -1, -1):
             part = parts[j]
-            if part not in specifiers and len(part) > 1:
+            if part not in NAME_SPECIFIERS and len(part) > 1:
                 item_name = part
                 break
     
@@ -234,7 +304,7 @@ def parse_quantity_line(line: str) -> Dict[str, any]:
     quantity = 1  # default
     
     # Look for "数量: X" pattern (supports decimals)
-    quantity_match = re.search(r'数量:\s*(\d+(?:\.\d+)?)', line)
+    quantity_match = QUANTITY_PATTERN.search(line)
     if quantity_match:
         quantity = float(quantity_match.group(1))
     
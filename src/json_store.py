@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from instrumentation import record_io, timed
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class StaleVersionError(RuntimeError):
+    """Raised when a save is based on a version of the file that is no longer current."""
+
+
+def write_json_atomic(path: str, data: Any, source: Optional[str] = None):
+    """
+    Write data to a temp file next to path, fsync it, then swap it in with
+    os.replace. I/O is counted under source (default: the file name).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    prefix="." + os.path.basename(path) + "-",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+        os.replace(tmp_path, path)
+        record_io(source or os.path.basename(path), bytes_written=size, opens=1)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class JsonFileStore:
+    """
+    Crash-safe, concurrency-safe JSON file persistence shared by the managers.
+    
+    - Writes go to a temp file in the same directory, are fsynced, then
+      swapped in with os.replace, so readers never see a partial file.
+    - lock() takes an exclusive fcntl lock on a sidecar "<file>.lock" (plus a
+      thread lock), so read-modify-write cycles from different threads and
+      processes never interleave.
+    - Every load returns a version token; save(expected_version=...) refuses
+      to overwrite a file that changed since that version was read.
+    """
+    
+    def __init__(self, path: str, default_factory: Callable[[], Any] = list,
+                 source: Optional[str] = None):
+        """source: name the file's I/O is counted under (default: the file name)."""
+        self.path = path
+        self.source = source or os.path.basename(path)
+        self.lock_path = path + ".lock"
+        self.default_factory = default_factory
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+    
+    def ensure_exists(self):
+        """Create the file with the default value if it does not exist."""
+        if not os.path.exists(self.path):
+            with self.lock():
+                if not os.path.exists(self.path):
+                    self.save(self.default_factory())
+    
+    @staticmethod
+    def _version_from_stat(stat: os.stat_result) -> tuple:
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    
+    def get_version(self) -> Optional[tuple]:
+        """Return the current version token of the file, or None if it is missing."""
+        try:
+            return self._version_from_stat(os.stat(self.path))
+        except OSError:
+            return None
+    
+    @contextmanager
+    def lock(self):
+        """
+        Hold an exclusive lock on the file for a read-modify-write cycle.
+        Reentrant within a thread.
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a')
+                record_io(self.source, opens=1)
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+    
+    @timed
+    def load(self) -> tuple:
+        """
+        Load the file. Returns (data, version); data is the default value if
+        the file is missing or not valid JSON.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                # fstat the open file so the version matches what was read
+                version = self._version_from_stat(os.fstat(f.fileno()))
+                record_io(self.source, bytes_read=version[2], opens=1)
+                return json.load(f), version
+        except FileNotFoundError:
+            return self.default_factory(), None
+        except json.JSONDecodeError:
+            return self.default_factory(), self.get_version()
+    
+    @timed
+    def save(self, data: Any, expected_version: Optional[tuple] = None) -> tuple:
+        """
+        Atomically replace the file with data. Returns the new version.
+        If expected_version is given and the file has changed since, raises
+        StaleVersionError instead of overwriting.
+        """
+        with self.lock():
+            if expected_version is not None and self.get_version() != expected_version:
+                raise StaleVersionError(f"{os.path.basename(self.path)} was modified concurrently")
+            
+            write_json_atomic(self.path, data, self.source)
+            return self.get_version()
+
+
+class JsonCollection(JsonFileStore):
+    """
+    A JSON file holding a list of records, addressed by key_func(record).
+    
+    This is the default storage backend for the managers. The optional
+    change hints taken by save() let row-based backends (see
+    sqlite_store.SqliteCollection) write only the changed records; a JSON
+    file can only be rewritten whole, so they are ignored here.
+    """
+    
+    # get() reads the whole file, so managers prefer their resident copies
+    POINT_LOOKUPS = False
+    
+    def __init__(self, path: str, key_func: Callable[[dict], str]):
+        super().__init__(path, default_factory=list)
+        self.key_func = key_func
+    
+    def get(self, key: str) -> Optional[dict]:
+        """Return the first record with the given key, or None."""
+        records, _ = self.load()
+        for record in records:
+            if self.key_func(record) == key:
+                return record
+        return None
+    
+    def save(self, data: Any, expected_version: Optional[tuple] = None,
+             upserted: Optional[list] = None, deleted_keys: Optional[list] = None) -> tuple:
+        """Atomically replace the file with the full record list."""
+        return super().save(data, expected_version=expected_version)
+
+
+class JsonRecordDirectory:
+    """
+    A directory holding one JSON file per record, addressed by key_func(record).
+    
+    Used for large records that are read one at a time (e.g. saved plan
+    bodies): get() opens a single file and save() with change hints writes
+    only the changed files. Each file is replaced atomically; lock() guards
+    the whole directory. Every save also bumps a counter in a manifest file
+    (".manifest.json"), which the version token includes.
+    """
+    
+    def __init__(self, directory: str, key_func: Callable[[dict], str]):
+        self.directory = directory
+        self.key_func = key_func
+        self.source = os.path.basename(directory)
+        self._lock_store = JsonFileStore(os.path.join(directory, ".records"), source=self.source)
+        self._manifest = JsonFileStore(os.path.join(directory, ".manifest.json"), dict, self.source)
+    
+    def _path(self, key: str) -> str:
+        # Keys may hold any characters; hash them into a safe file name
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".json")
+    
+    def _record_files(self) -> list:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.endswith(".json") and not name.startswith("."))
+    
+    def ensure_exists(self):
+        """Create the directory if it does not exist."""
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def get_version(self) -> Optional[tuple]:
+        """
+        Version token: the manifest's save counter plus the directory's stat.
+        The counter changes on every save, even one that replaces the same
+        file within one mtime tick; the stat catches files added or removed
+        by hand.
+        """
+        try:
+            stat = os.stat(self.directory)
+        except OSError:
+            return None
+        manifest, _ = self._manifest.load()
+        return (manifest.get("saves", 0),) + JsonFileStore._version_from_stat(stat)
+    
+    def lock(self):
+        """Hold an exclusive lock on the directory for a read-modify-write cycle."""
+        return self._lock_store.lock()
+    
+    def load(self) -> tuple:
+        """Load every record (in file name order). Returns (records, version)."""
+        self.ensure_exists()
+        version = self.get_version()
+        records = []
+        for name in self._record_files():
+            record, _ = JsonFileStore(os.path.join(self.directory, name), dict, self.source).load()
+            if record:
+                records.append(record)
+        return records, version
+    
+    @timed
+    def get(self, key: str) -> Optional[dict]:
+        """Return the record with the given key, or None."""
+        record, _ = JsonFileStore(self._path(key), dict, self.source).load()
+        if record and self.key_func(record) == key:
+            return record
+        return None
+    
+    @timed
+    def save(self, data: Any, expected_version: Optional[tuple] = None,
+             upserted: Optional[list] = None, deleted_keys: Optional[list] = None) -> tuple:
+        """
+        Write records and return the new version.
+        With upserted/deleted_keys only those files are written or removed;
+        without them, data is taken as the complete new set of records.
+        """
+        with self.lock():
+            self.ensure_exists()
+            if expected_version is not None and self.get_version() != expected_version:
+                raise StaleVersionError(f"{os.path.basename(self.directory)} was modified concurrently")
+            
+            if upserted is None and deleted_keys is None:
+                upserted = []
+                keep = set()
+                for record in data:
+                    path = self._path(self.key_func(record))
+                    if path not in keep:
+                        keep.add(path)
+                        upserted.append(record)
+                deleted_paths = [os.path.join(self.directory, name) for name in self._record_files()
+                                 if os.path.join(self.directory, name) not in keep]
+            else:
+                deleted_paths = [self._path(key) for key in deleted_keys or []]
+            
+            for path in deleted_paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            for record in upserted or []:
+                write_json_atomic(self._path(self.key_func(record)), record, self.source)
+            
+            manifest, _ = self._manifest.load()
+            write_json_atomic(self._manifest.path, {"saves": manifest.get("saves", 0) + 1}, self.source)
+            return self.get_version()
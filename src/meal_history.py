@@ -0,0 +1,175 @@
+import csv
+import io
+import math
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from instrumentation import record_io, timed
+
+# Position of a dated meal in history order: (meal date, row sequence).
+# Rows with the same date keep the order they were recorded in.
+MealKey = Tuple[datetime, int]
+
+
+def format_cursor(key: MealKey) -> str:
+    """Page cursor for a meal key, e.g. "2024-05-01.42"."""
+    return f"{key[0].strftime(MealHistory.DATE_FORMAT)}.{key[1]}"
+
+
+def parse_cursor(cursor: str) -> MealKey:
+    """Meal key of a page cursor; raises ValueError if it is malformed."""
+    date_str, _, seq = cursor.rpartition('.')
+    return datetime.strptime(date_str, MealHistory.DATE_FORMAT), int(seq)
+
+
+class MealHistory:
+    """
+    Incremental, indexed view of past_meals.csv.
+    
+    Rows are read once and kept in memory. Later refreshes read only the
+    bytes appended since the last read (tracked by file offset); the file is
+    re-read from the start only if it was replaced or truncated. Valid rows
+    are also kept in an index sorted by (date, row number) so windowed
+    queries and pages use bisection.
+    """
+    
+    DATE_FORMAT = '%Y-%m-%d'
+    
+    def __init__(self, past_meals_file: str):
+        self.past_meals_file = past_meals_file
+        self._lock = threading.Lock()
+        self._reset(None)
+    
+    def _reset(self, inode: Optional[int]):
+        """Forget everything read so far."""
+        self._inode = inode
+        self._offset = 0
+        self._fieldnames: Optional[List[str]] = None
+        self._rows: List[Dict] = []             # file order, as csv.DictReader yields them
+        self._keys: List[MealKey] = []          # sorted (meal date, row number)
+        self._dated_rows: List[Dict] = []       # rows parallel to _keys
+    
+    def _index_row(self, row: Dict, seq: int):
+        """Add a row to the date-sorted index if it has a valid date and dish name."""
+        date_str = row.get('date') or ''
+        if not date_str or not row.get('dish_name'):
+            return
+        try:
+            meal_date = datetime.strptime(date_str, self.DATE_FORMAT)
+        except ValueError:
+            return
+        # History is normally appended in date order, so this is usually a push
+        key = (meal_date, seq)
+        position = bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._dated_rows.insert(position, row)
+    
+    @timed
+    def refresh(self):
+        """Read any complete lines appended to the file since the last refresh."""
+        with self._lock:
+            try:
+                stat = os.stat(self.past_meals_file)
+            except OSError:
+                self._reset(None)
+                return
+            
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._reset(stat.st_ino)
+            if stat.st_size == self._offset:
+                return
+            
+            with open(self.past_meals_file, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read(stat.st_size - self._offset)
+            record_io(os.path.basename(self.past_meals_file), bytes_read=len(chunk), opens=1)
+            
+            # Leave a trailing partial line for the next refresh
+            end = chunk.rfind(b'\n') + 1
+            if end == 0:
+                return
+            self._offset += end
+            
+            stream = io.StringIO(chunk[:end].decode('utf-8'), newline='')
+            if self._fieldnames is None:
+                for header in csv.reader(stream):
+                    if header:
+                        self._fieldnames = header
+                        break
+                if self._fieldnames is None:
+                    return
+            
+            for row in csv.DictReader(stream, fieldnames=self._fieldnames):
+                self._index_row(row, len(self._rows))
+                self._rows.append(row)
+    
+    @timed
+    def append(self, date: str, dish_name: str):
+        """Append a meal to the CSV, writing the header if the file is new."""
+        file_exists = os.path.exists(self.past_meals_file)
+        
+        os.makedirs(os.path.dirname(self.past_meals_file), exist_ok=True)
+        
+        mode = 'a' if file_exists else 'w'
+        size = os.path.getsize(self.past_meals_file) if file_exists else 0
+        with open(self.past_meals_file, mode, encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if not file_exists:
+                writer.writerow(['date', 'dish_name'])
+            writer.writerow([date, dish_name])
+            written = f.tell()
+        record_io(os.path.basename(self.past_meals_file), bytes_written=written - size, opens=1)
+    
+    def get_version(self) -> tuple:
+        """Return a token that changes whenever new history is read."""
+        self.refresh()
+        return (self._inode, self._offset)
+    
+    def get_all_meals(self) -> List[Dict]:
+        """Get all recorded rows in file order."""
+        self.refresh()
+        with self._lock:
+            return [dict(row) for row in self._rows]
+    
+    def get_dishes_between(self, start: datetime, end: Optional[datetime] = None) -> List[str]:
+        """Get dish names with start <= date (and date <= end if given), oldest first."""
+        self.refresh()
+        with self._lock:
+            lo, hi = self._find_range(start, end)
+            return [row['dish_name'] for row in self._dated_rows[lo:hi]]
+    
+    def _find_range(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    before: Optional[MealKey] = None) -> tuple:
+        """
+        Return (lo, hi) positions in the date index covering
+        since <= date <= until and key < before; caller holds the lock.
+        """
+        lo = bisect_left(self._keys, (since,)) if since is not None else 0
+        hi = bisect_right(self._keys, (until, math.inf)) if until is not None else len(self._keys)
+        if before is not None:
+            hi = min(hi, bisect_left(self._keys, before))
+        return lo, max(lo, hi)
+    
+    def get_dated_page(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       before: Optional[MealKey] = None, limit: Optional[int] = None) -> tuple:
+        """
+        Get dated meals with since <= date <= until, newest first, at most
+        limit of them. before: the next key of an earlier page; only older
+        meals are returned, so rows recorded in between never shift a page.
+        Returns (meals, next_key), next_key being None on the last page.
+        Rows without a valid date are not in the date index.
+        """
+        self.refresh()
+        with self._lock:
+            lo, hi = self._find_range(since, until, before)
+            start = lo if limit is None else max(lo, hi - limit)
+            next_key = self._keys[start] if start > lo else None
+            return [dict(row) for row in reversed(self._dated_rows[start:hi])], next_key
+    
+    def get_recent_dishes(self, days: int = 7) -> Set[str]:
+        """Get the set of dishes prepared in the last N days."""
+        cutoff_date = datetime.now() - timedelta(days=days)
+        return set(self.get_dishes_between(cutoff_date))
@@ -1,109 +1,249 @@
-import json
 import os
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from events import EventBus
+from instrumentation import timed
+from json_store import JsonCollection, JsonRecordDirectory
+from plan_format import DAY_NAMES, compact_plan_days, format_plan_text, parse_plan_text
+
 
 class MealPlanManager:
-    """Manage saved meal plans with CRUD operations."""
+    """
+    Manage saved meal plans with CRUD operations.
+    
+    Each plan is stored in two parts: a lightweight summary (name, dates,
+    start day index as in structured plans, dish count) in the main
+    collection, and its body (text and days) in a body store keyed the
+    same way. The summaries are kept resident with a lowercased-name
+    index; bodies are only read when a single plan is fetched, so listing
+    never loads them.
+    """
     
-    def __init__(self, meal_plans_file: str = "data/meal_plans.json"):
+    SUMMARY_FIELDS = ["name", "date", "updated_date", "start_day", "dish_count"]
+    
+    def __init__(self, meal_plans_file: str = "data/meal_plans.json", store=None,
+                 events: Optional[EventBus] = None, body_store=None):
+        """
+        store: optional storage backend for the summaries (e.g.
+        sqlite_store.SqliteCollection); defaults to a JsonCollection on
+        meal_plans_file.
+        body_store: optional storage backend for the bodies; defaults to a
+        JsonRecordDirectory next to meal_plans_file (data/meal_plans/).
+        events: optional shared EventBus; a "meal_plans" event is published
+        after every save.
+        """
         # Make path relative to project root
         if not os.path.isabs(meal_plans_file):
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.meal_plans_file = os.path.join(project_root, meal_plans_file)
         else:
             self.meal_plans_file = meal_plans_file
+        self.store = store if store is not None else JsonCollection(self.meal_plans_file, self.record_key)
+        self.body_store = body_store if body_store is not None else JsonRecordDirectory(
+            os.path.splitext(self.meal_plans_file)[0], self.record_key)
+        self.events = events if events is not None else EventBus()
         self._ensure_file_exists()
+        
+        # Resident summaries (in saved order) and their index by lowercased
+        # name. Reloaded only when the store's version changes.
+        self._summaries: List[Dict] = []
+        self._by_key: Dict[str, Dict] = {}
+        self._version = None
+        # Bodies of plans saved before summaries and bodies were split; they
+        # move to the body store on the next save
+        self._inline_bodies: Dict[str, Dict] = {}
+    
+    @staticmethod
+    def record_key(plan: Dict) -> str:
+        """Storage key of a plan: its lowercased name."""
+        return plan.get("name", "").lower()
     
     def _ensure_file_exists(self):
-        """Ensure meal_plans.json file exists, create if not."""
-        if not os.path.exists(self.meal_plans_file):
-            os.makedirs(os.path.dirname(self.meal_plans_file), exist_ok=True)
-            with open(self.meal_plans_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
+        """Ensure meal_plans.json and the body store exist, create if not."""
+        self.store.ensure_exists()
+        self.body_store.ensure_exists()
     
+    @timed
     def load_meal_plans(self) -> List[Dict]:
-        """Load all meal plans from JSON file."""
+        """Load all stored plan summaries from JSON file."""
+        meal_plans, _ = self.store.load()
+        return meal_plans
+    
+    def get_version(self) -> Optional[tuple]:
+        """Return a version token that changes whenever a plan is saved or deleted."""
+        return self.store.get_version()
+    
+    @staticmethod
+    def _start_day(day_name) -> Optional[int]:
+        """Index of a day name (0 = Sunday), like a structured plan's start_day."""
+        return DAY_NAMES.index(day_name) if day_name in DAY_NAMES else None
+    
+    @classmethod
+    def _summarize(cls, name: str, days: List[Dict], date: str,
+                   updated_date: Optional[str] = None) -> Dict:
+        summary = {
+            "name": name,
+            "date": date,
+            "start_day": cls._start_day(days[0]["day"]) if days else None,
+            "dish_count": sum(len(day.get("dishes") or []) for day in days)
+        }
+        if updated_date:
+            summary["updated_date"] = updated_date
+        return summary
+    
+    def _set_summaries(self, records: List[Dict], version):
+        """Replace the resident summaries and rebuild the index."""
+        self._summaries = []
+        self._by_key = {}
+        self._inline_bodies = {}
+        for record in records:
+            key = self.record_key(record)
+            if key in self._by_key:
+                continue  # Lookups always found the first plan with a name
+            if "plan" in record:
+                # Legacy record: text (and maybe days) stored inline
+                days = record.get("days")
+                if days is None:
+                    days = parse_plan_text(record.get("plan") or "")["days"]
+                self._inline_bodies[key] = {"name": record.get("name", ""),
+                                            "plan": record.get("plan"), "days": days}
+                record = self._summarize(record.get("name", ""), days, record.get("date"),
+                                         record.get("updated_date"))
+            else:
+                record = {field: record[field] for field in self.SUMMARY_FIELDS if field in record}
+                if isinstance(record.get("start_day"), str):
+                    # Summaries saved with the day name
+                    record["start_day"] = self._start_day(record["start_day"])
+            self._summaries.append(record)
+            self._by_key[key] = record
+        self._version = version
+    
+    def _ensure_loaded(self) -> List[Dict]:
+        """Return the resident summaries, reloading only if the store changed."""
+        if self._version is None or self.store.get_version() != self._version:
+            records, version = self.store.load()
+            self._set_summaries(records, version)
+        return self._summaries
+    
+    @timed
+    def save_meal_plans(self, summaries: List[Dict], upserted: Optional[List[Dict]] = None,
+                        deleted_keys: Optional[List[str]] = None):
+        """Atomically save plan summaries to JSON file and refresh the resident index."""
         try:
-            with open(self.meal_plans_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            version = self.store.save(summaries, expected_version=self._version,
+                                      upserted=upserted, deleted_keys=deleted_keys)
+        except Exception:
+            self._version = None
+            raise
+        self._set_summaries(summaries, version)
+        self.events.publish("meal_plans", version=version,
+                            upserted=[self.record_key(p) for p in upserted] if upserted is not None else None,
+                            deleted=deleted_keys)
+    
+    def _get_body(self, key: str) -> Dict:
+        body = self._inline_bodies.get(key) or self.body_store.get(key) or {}
+        return {"plan": body.get("plan", ""), "days": body.get("days") or []}
     
-    def save_meal_plans(self, meal_plans: List[Dict]):
-        """Save meal plans to JSON file."""
-        os.makedirs(os.path.dirname(self.meal_plans_file), exist_ok=True)
-        with open(self.meal_plans_file, 'w', encoding='utf-8') as f:
-            json.dump(meal_plans, f, ensure_ascii=False, indent=2)
+    def list_meal_plans(self, offset: int = 0, limit: Optional[int] = None) -> tuple:
+        """
+        Plan summaries, most recently saved first, without bodies.
+        Returns (summaries, total).
+        """
+        summaries = self._ensure_loaded()
+        newest_first = sorted(summaries, key=lambda s: s.get("updated_date") or s.get("date") or "",
+                              reverse=True)
+        end = None if limit is None else offset + limit
+        return [dict(summary) for summary in newest_first[offset:end]], len(summaries)
     
     def get_all_meal_plans(self) -> List[Dict]:
-        """Get all saved meal plans."""
-        return self.load_meal_plans()
+        """Get all saved meal plans with their bodies (reads every body)."""
+        return [dict(summary, **self._get_body(self.record_key(summary)))
+                for summary in self._ensure_loaded()]
     
     def get_meal_plan_by_name(self, plan_name: str) -> Optional[Dict]:
-        """Get a meal plan by name."""
-        meal_plans = self.load_meal_plans()
-        for plan in meal_plans:
-            if plan.get("name", "").lower() == plan_name.lower():
-                return plan
-        return None
-    
-    def save_meal_plan(self, plan_name: str, plan_text: str) -> tuple:
+        """Get a meal plan (summary and body) by name."""
+        self._ensure_loaded()
+        key = plan_name.lower()
+        summary = self._by_key.get(key)
+        if summary is None:
+            return None
+        return dict(summary, **self._get_body(key))
+    
+    def save_meal_plan(self, plan_name: str, plan) -> tuple:
         """
         Save a new meal plan or update existing one.
+        plan: a structured plan (see RecipePlanner.generate_plan) or plan text.
+        Both the text and the days (dish ids and names) are stored.
         Returns (success, error_message, saved_plan).
         """
         if not plan_name or not plan_name.strip():
             return False, "Plan name is required", None
         
-        if not plan_text or not plan_text.strip():
+        if isinstance(plan, dict):
+            if not plan.get("days"):
+                return False, "Plan content is required", None
+            plan_text = format_plan_text(plan)
+            days = compact_plan_days(plan)
+        elif isinstance(plan, str):
+            if not plan.strip():
+                return False, "Plan content is required", None
+            plan_text = plan
+            days = parse_plan_text(plan)["days"]
+        else:
             return False, "Plan content is required", None
         
-        meal_plans = self.load_meal_plans()
-        plan_name = plan_name.strip()
-        
-        # Check if plan with same name already exists
-        existing_plan = None
-        existing_index = None
-        for i, plan in enumerate(meal_plans):
-            if plan.get("name", "").lower() == plan_name.lower():
-                existing_plan = plan
-                existing_index = i
-                break
-        
-        new_plan = {
-            "name": plan_name,
-            "plan": plan_text.strip(),
-            "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        with self.store.lock():
+            return self._save_meal_plan(plan_name.strip(), plan_text.strip(), days)
+    
+    def _save_meal_plan(self, plan_name: str, plan_text: str, days: List[Dict]) -> tuple:
+        """Insert or replace a plan; caller holds the store lock."""
+        summaries = list(self._ensure_loaded())
+        key = plan_name.lower()
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        if existing_plan:
-            # Update existing plan
-            new_plan["date"] = existing_plan.get("date", new_plan["date"])  # Keep original date
-            new_plan["updated_date"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            meal_plans[existing_index] = new_plan
+        existing = self._by_key.get(key)
+        if existing:
+            # Update existing plan, keeping its original date and position
+            summary = self._summarize(plan_name, days, existing.get("date", now), now)
+            summaries[summaries.index(existing)] = summary
         else:
-            # Add new plan
-            meal_plans.append(new_plan)
+            summary = self._summarize(plan_name, days, now)
+            summaries.append(summary)
         
-        self.save_meal_plans(meal_plans)
-        return True, None, new_plan
+        # Bodies first, so a summary never points at a missing body
+        migrated = self._move_inline_bodies(summaries, skip_key=key)
+        body = {"name": plan_name, "plan": plan_text, "days": days}
+        self.body_store.save([], upserted=[body])
+        self.save_meal_plans(summaries, upserted=migrated + [summary])
+        return True, None, dict(summary, **body)
+    
+    def _move_inline_bodies(self, summaries: List[Dict], skip_key: Optional[str] = None) -> List[Dict]:
+        """
+        Write legacy inline bodies to the body store before their records are
+        rewritten as summaries. Returns the summaries that need rewriting.
+        """
+        bodies = [dict(body, name=self._by_key[key]["name"])
+                  for key, body in self._inline_bodies.items() if key != skip_key]
+        if bodies:
+            self.body_store.save([], upserted=bodies)
+        return [summary for summary in summaries
+                if self.record_key(summary) in self._inline_bodies and self.record_key(summary) != skip_key]
     
     def delete_meal_plan(self, plan_name: str) -> tuple:
         """
         Delete a meal plan by name.
         Returns (success, error_message).
         """
-        meal_plans = self.load_meal_plans()
-        original_count = len(meal_plans)
-        
-        meal_plans = [plan for plan in meal_plans 
-                     if plan.get("name", "").lower() != plan_name.lower()]
-        
-        if len(meal_plans) == original_count:
-            return False, f"Meal plan '{plan_name}' not found"
-        
-        self.save_meal_plans(meal_plans)
-        return True, None
-
+        with self.store.lock():
+            self._ensure_loaded()
+            key = plan_name.lower()
+            existing = self._by_key.get(key)
+            if existing is None:
+                return False, f"Meal plan '{plan_name}' not found"
+            
+            summaries = [summary for summary in self._summaries if summary is not existing]
+            migrated = self._move_inline_bodies(summaries)
+            self.save_meal_plans(summaries, upserted=migrated, deleted_keys=[key])
+            self.body_store.save([], deleted_keys=[key])
+            return True, None
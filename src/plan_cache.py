@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional
+
+
+def fingerprint_names(names: Iterable[str]) -> str:
+    """
+    Content hash of a collection of names.
+    Order and duplicates are ignored, since ingredient matching is set-based.
+    """
+    digest = hashlib.sha1()
+    for name in sorted(set(names)):
+        digest.update(name.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def fingerprint_stock(items: Iterable[Dict]) -> str:
+    """
+    Content hash of inventory items' names and quantities.
+    Order is kept: an ingredient draws from the first matching item.
+    """
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(f"{item.get('item', '')}\0{item.get('quantity', 0)}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PlanCache:
+    """Bounded, thread-safe LRU cache of generated meal plans with hit/miss stats."""
+    
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable) -> Optional[object]:
+        """Return the cached value for key (marking it recently used), or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: Hashable, value: object):
+        """Store value under key, evicting the least recently used entry if full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop all cached plans."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Return hit/miss statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
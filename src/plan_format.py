@@ -0,0 +1,59 @@
+from typing import Dict, List, Optional
+
+DAY_NAMES = ["周日", "周一", "周二", "周三", "周四", "周五", "周六"]
+PLACEHOLDER = "(待定)"
+NO_MATCH_MESSAGE = "无法生成餐单：没有找到匹配的菜品。"
+
+
+def format_plan_text(plan: Dict) -> str:
+    """
+    Render a structured plan as the classic text form: each day name on its
+    own line followed by its dishes ("(待定)" for an empty day), with a
+    blank line between days. A plan without days renders as the no-match
+    message.
+    """
+    days = plan.get("days") or []
+    if not days:
+        return NO_MATCH_MESSAGE
+    
+    plan_lines = []
+    for day_offset, day in enumerate(days):
+        plan_lines.append(day["day"])
+        dishes = day.get("dishes") or []
+        for dish in dishes:
+            plan_lines.append(dish["name"])
+        if not dishes:
+            plan_lines.append(PLACEHOLDER)
+        # Add empty line between days (except after last day)
+        if day_offset < len(days) - 1:
+            plan_lines.append("")
+    return "\n".join(plan_lines)
+
+
+def parse_plan_text(plan_text: str) -> Dict:
+    """
+    Read a text plan (generated or hand-edited) back into the structured
+    form. Dishes only carry their names; placeholders are dropped.
+    """
+    days: List[Dict] = []
+    current: Optional[Dict] = None
+    for line in plan_text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line in DAY_NAMES:
+            current = {"day": line, "dishes": []}
+            days.append(current)
+        elif current is not None and line != PLACEHOLDER:
+            current["dishes"].append({"name": line})
+    
+    start_day = DAY_NAMES.index(days[0]["day"]) if days else 0
+    return {"start_day": start_day, "days": days}
+
+
+def compact_plan_days(plan: Dict) -> List[Dict]:
+    """Days of a structured plan with dishes reduced to id and name, for storage."""
+    return [{"day": day["day"],
+             "dishes": [{key: dish[key] for key in ("id", "name") if dish.get(key) is not None}
+                        for dish in day.get("dishes") or []]}
+            for day in plan.get("days") or []]
@@ -0,0 +1,251 @@
+import time
+from typing import Dict, List, Optional, Sequence, Set
+
+from inventory_parser import categorize_ingredient
+
+
+class WeeklyPlanSolver:
+    """
+    Chooses the dishes of a 7-day plan by branch-and-bound over how many
+    times (0..max_repeats) each candidate dish is cooked, then schedules
+    them onto the days.
+    
+    The plan keeps the shape of a reference (greedy) plan: the same number
+    of dishes per day, a vegetable dish on every day that had one and a
+    meat/seafood dish on every day that had one. Within that shape it
+    maximizes
+        
+        W_COVERAGE * distinct matched ingredients used in the week
+      + W_SCORE    * sum of dish scores (ingredient availability)
+      + W_VARIETY  * distinct dishes
+      + W_EXPIRY   * sum of perishability x day weight (earlier days weigh more)
+    
+    Inventory items carry no dates, so perishability comes from the category
+    of each matched ingredient (seafood and meat first, then vegetables...).
+    The search stops at the time budget with the best plan found so far (so
+    a budget-limited result can vary between runs); the reference plan is the
+    starting incumbent, so the result never scores below it.
+    """
+    
+    W_COVERAGE = 1.0
+    W_SCORE = 2.0
+    W_VARIETY = 1.0
+    W_EXPIRY = 0.5
+    
+    # Shelf-life weight of an ingredient by inventory_parser category
+    PERISHABILITY = {"海鲜": 1.0, "肉类": 0.8, "蔬菜": 0.6, "豆制品": 0.5, "蛋类": 0.3}
+    
+    # Candidates kept per kind (best standalone value first) for the search
+    MAX_CANDIDATES = {"veg": 16, "meat": 16, "other": 8}
+    
+    def __init__(self, candidates: Sequence[Dict], reference_days: List[List[str]],
+                 max_repeats: int = 2, time_budget: float = 0.25):
+        """
+        candidates: feasible dishes in planner order, each a dict with
+        "name", "kind" ("veg" / "meat" / "other"), "score" and "matched"
+        (set of matched lowercased ingredients).
+        reference_days: the reference plan as 7 lists of dish names.
+        """
+        self.max_repeats = max_repeats
+        self.time_budget = time_budget
+        self.reference_days = reference_days
+        
+        self._by_name: Dict[str, Dict] = {}
+        for order, candidate in enumerate(candidates):
+            if candidate["name"] not in self._by_name:
+                self._by_name[candidate["name"]] = dict(candidate, order=order,
+                                                        perishability=self._perishability(candidate["matched"]))
+        
+        # Reference dishes that are not candidates; solve() gives up on them
+        self.unknown_dishes = {name for day in reference_days for name in day if name not in self._by_name}
+        
+        # Slot structure of the reference plan
+        self.day_sizes = [len(day) for day in reference_days]
+        self.veg_days = [d for d, day in enumerate(reference_days)
+                         if any(self._kind(name) == "veg" for name in day)]
+        self.meat_days = [d for d, day in enumerate(reference_days)
+                          if any(self._kind(name) == "meat" for name in day)]
+        
+        self.timed_out = False
+        self.nodes = 0
+    
+    def _kind(self, name: str) -> Optional[str]:
+        candidate = self._by_name.get(name)
+        return candidate["kind"] if candidate else None
+    
+    def _perishability(self, matched: Set[str]) -> float:
+        return sum(self.PERISHABILITY.get(categorize_ingredient(ingredient), 0.0) for ingredient in matched)
+    
+    @staticmethod
+    def _day_weight(day_offset: int) -> float:
+        return (7 - day_offset) / 7
+    
+    def evaluate(self, days: List[List[str]]) -> float:
+        """Objective value of a complete plan."""
+        covered = set()
+        total = 0.0
+        for day_offset, day in enumerate(days):
+            for name in day:
+                candidate = self._by_name[name]
+                covered |= candidate["matched"]
+                total += self.W_SCORE * candidate["score"]
+                total += self.W_EXPIRY * candidate["perishability"] * self._day_weight(day_offset)
+        distinct = {name for day in days for name in day}
+        return total + self.W_COVERAGE * len(covered) + self.W_VARIETY * len(distinct)
+    
+    def schedule(self, counts: Dict[str, int]) -> Optional[List[List[str]]]:
+        """
+        Place the chosen dish copies onto the days: most perishable first,
+        vegetable and meat slots filled before the free ones, never the same
+        dish twice in a day. Returns None if the copies do not fit.
+        """
+        def ordered(names):
+            copies = [name for name in names for _ in range(counts[name])]
+            return sorted(copies, key=lambda n: (-self._by_name[n]["perishability"], self._by_name[n]["order"]))
+        
+        days: List[List[str]] = [[] for _ in self.day_sizes]
+        leftovers = []
+        for kind, slot_days in (("veg", self.veg_days), ("meat", self.meat_days)):
+            copies = ordered(n for n in counts if self._by_name[n]["kind"] == kind)
+            if len(copies) < len(slot_days):
+                return None
+            for day_offset, name in zip(slot_days, copies):
+                if name in days[day_offset]:
+                    return None
+                days[day_offset].append(name)
+            leftovers.extend(copies[len(slot_days):])
+        leftovers.extend(ordered(n for n in counts if self._by_name[n]["kind"] == "other"))
+        
+        leftovers.sort(key=lambda n: (-self._by_name[n]["perishability"], self._by_name[n]["order"]))
+        for name in leftovers:
+            for day_offset, size in enumerate(self.day_sizes):
+                if len(days[day_offset]) < size and name not in days[day_offset]:
+                    days[day_offset].append(name)
+                    break
+            else:
+                return None
+        return days
+    
+    def _select_candidates(self) -> List[Dict]:
+        """Best candidates per kind by standalone value, always including the reference dishes."""
+        reference_names = {name for day in self.reference_days for name in day}
+        by_kind: Dict[str, List[Dict]] = {}
+        for candidate in self._by_name.values():
+            by_kind.setdefault(candidate["kind"], []).append(candidate)
+        
+        selected = []
+        for kind, candidates in by_kind.items():
+            candidates.sort(key=lambda c: (-self._first_copy_value(c), c["order"]))
+            limit = self.MAX_CANDIDATES.get(kind, 8)
+            selected.extend(c for i, c in enumerate(candidates) if i < limit or c["name"] in reference_names)
+        selected.sort(key=lambda c: (-self._first_copy_value(c), c["order"]))
+        return selected
+    
+    def _copy_value(self, candidate: Dict) -> float:
+        # Upper bound of one copy's value: the expiry term at the first day's weight
+        return self.W_SCORE * candidate["score"] + self.W_EXPIRY * candidate["perishability"] * self._day_weight(0)
+    
+    def _first_copy_value(self, candidate: Dict) -> float:
+        return self._copy_value(candidate) + self.W_VARIETY + self.W_COVERAGE * len(candidate["matched"])
+    
+    def solve(self) -> Optional[List[List[str]]]:
+        """
+        Return the best plan found as 7 lists of dish names (the reference
+        plan if nothing better was found), or None if the reference plan
+        uses dishes the solver does not know.
+        """
+        if self.unknown_dishes:
+            return None
+        
+        deadline = time.perf_counter() + self.time_budget
+        candidates = self._select_candidates()
+        total_slots = sum(self.day_sizes)
+        n = len(candidates)
+        
+        # Optimistic values of the remaining copies, for the bound:
+        # suffix_best[i][r] = sum of the r largest copy values among candidates[i:],
+        # with (suffix_best) and without (suffix_best_base) standalone coverage
+        def best_sums(candidates_left, with_coverage):
+            values = []
+            for candidate in candidates_left:
+                first = self._first_copy_value(candidate)
+                if not with_coverage:
+                    first -= self.W_COVERAGE * len(candidate["matched"])
+                values.append(first)
+                values.extend([self._copy_value(candidate)] * (self.max_repeats - 1))
+            values.sort(reverse=True)
+            sums = [0.0]
+            for value in values[:total_slots]:
+                sums.append(sums[-1] + value)
+            return sums
+        
+        suffix_best = [best_sums(candidates[i:], True) for i in range(n + 1)]
+        suffix_best_base = [best_sums(candidates[i:], False) for i in range(n + 1)]
+        # Coverage can also never exceed the ingredients still reachable
+        suffix_union = [frozenset()] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            suffix_union[i] = suffix_union[i + 1] | candidates[i]["matched"]
+        
+        kinds_left = {kind: [0] * (n + 1) for kind in ("veg", "meat")}
+        for i in range(n - 1, -1, -1):
+            for kind in kinds_left:
+                kinds_left[kind][i] = kinds_left[kind][i + 1] + (candidates[i]["kind"] == kind)
+        
+        best_days = self.reference_days
+        best_value = self.evaluate(self.reference_days)
+        counts: Dict[str, int] = {}
+        
+        def search(i: int, remaining: int, veg_needed: int, meat_needed: int,
+                   covered: frozenset, value: float):
+            nonlocal best_days, best_value
+            self.nodes += 1
+            if self.timed_out or time.perf_counter() > deadline:
+                self.timed_out = True
+                return
+            
+            if remaining == 0:
+                if veg_needed <= 0 and meat_needed <= 0:
+                    days = self.schedule(counts)
+                    if days is not None:
+                        actual = self.evaluate(days)
+                        if actual > best_value + 1e-9:
+                            best_days, best_value = days, actual
+                return
+            if i == n:
+                return
+            
+            # Infeasible: not enough copies left for the slots or the required kinds
+            if self.max_repeats * (n - i) < remaining:
+                return
+            if (self.max_repeats * kinds_left["veg"][i] < veg_needed
+                    or self.max_repeats * kinds_left["meat"][i] < meat_needed):
+                return
+            
+            r = min(remaining, len(suffix_best[i]) - 1)
+            bound = value + min(suffix_best[i][r], suffix_best_base[i][r]
+                                + self.W_COVERAGE * len(suffix_union[i] - covered))
+            if bound <= best_value + 1e-9:
+                return
+            
+            candidate = candidates[i]
+            name = candidate["name"]
+            new_covered = covered | candidate["matched"]
+            first_value = (self._copy_value(candidate) + self.W_VARIETY
+                           + self.W_COVERAGE * (len(new_covered) - len(covered)))
+            
+            # Try one copy first (variety), then more, then skipping the dish
+            for copies in list(range(1, self.max_repeats + 1)) + [0]:
+                if copies > remaining:
+                    continue
+                if copies:
+                    counts[name] = copies
+                    search(i + 1, remaining - copies,
+                           veg_needed - copies * (candidate["kind"] == "veg"),
+                           meat_needed - copies * (candidate["kind"] == "meat"),
+                           new_covered, value + first_value + (copies - 1) * self._copy_value(candidate))
+                    del counts[name]
+                else:
+                    search(i + 1, remaining, veg_needed, meat_needed, covered, value)
+        
+        search(0, total_slots, len(self.veg_days), len(self.meat_days), frozenset(), 0.0)
+        return best_days
@@ -1,31 +1,113 @@
-import json
-import csv
+import bisect
+import copy
+import logging
 import os
 import sys
-from datetime import datetime, timedelta
-from typing import List, Dict, Set, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, NamedTuple, Set, Optional
 
 # Add src directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from dish_manager import DishManager
+from events import EventBus
+from ingredient_index import IngredientMatchIndex
+from instrumentation import timed
+from plan_cache import PlanCache, fingerprint_names, fingerprint_stock
+from plan_format import DAY_NAMES, format_plan_text
+from plan_solver import WeeklyPlanSolver
+from meal_history import MealHistory
+from stock_ledger import StockLedger
+import vector_scoring
+from vector_scoring import VectorScoringEngine
+
+logger = logging.getLogger(__name__)
+
+
+class PlanInputs(NamedTuple):
+    """Everything a plan reads besides the inventory, loaded once and shared by many plans."""
+    dishes: List[Dict]
+    version: Optional[tuple]
+    recent_dishes: Set[str]
+    index: IngredientMatchIndex
+    vector_engine: Optional[VectorScoringEngine]
 
 
 class RecipePlanner:
     """Plan recipes based on available ingredients and past meal prep."""
     
-    CHINESE_DAYS = ["周日", "周一", "周二", "周三", "周四", "周五", "周六"]
+    CHINESE_DAYS = DAY_NAMES
     VEGETABLE_CATEGORY = "蔬菜"
     MEAT_CATEGORIES = ["肉类", "海鲜"]
+    SCORING_ENGINES = ["python", "numpy"]
+    PLANNING_ENGINES = ["greedy", "optimal"]
+    MAX_REPEATS = 2  # Maximum times a dish can appear in a week
+    MAX_BATCH_JOBS = 100
+    MAX_PLAN_WEEKS = 12
     
     def __init__(self, dishes_file: str = "data/dishes.json", 
-                 past_meals_file: str = "data/past_meals.csv"):
-        self.dish_manager = DishManager(dishes_file)
+                 past_meals_file: str = "data/past_meals.csv",
+                 plan_cache_size: int = 64, dish_manager: Optional[DishManager] = None,
+                 history=None, scoring_engine: str = "python", events: Optional[EventBus] = None,
+                 planning_engine: str = "greedy", plan_time_budget: float = 0.25):
+        """
+        dish_manager: optional DishManager to use instead of one on dishes_file.
+        history: optional meal history backend (e.g. sqlite_store.SqliteMealHistory);
+        defaults to a MealHistory on past_meals_file.
+        scoring_engine: "python" scores dishes one by one; "numpy" scores the
+        whole library with one sparse matrix-vector product (needs numpy).
+        events: EventBus to follow for "dishes" and "past_meals" changes;
+        defaults to the dish manager's.
+        planning_engine: default engine for generate_meal_plan: "greedy" picks
+        the best dish per slot day by day; "optimal" searches the whole week
+        with plan_solver.WeeklyPlanSolver for at most plan_time_budget seconds
+        and keeps the greedy plan if nothing better is found.
+        """
+        self.dish_manager = dish_manager if dish_manager is not None else DishManager(dishes_file)
         # Make path relative to project root
         if not os.path.isabs(past_meals_file):
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.past_meals_file = os.path.join(project_root, past_meals_file)
         else:
             self.past_meals_file = past_meals_file
+        self.history = history if history is not None else MealHistory(self.past_meals_file)
+        
+        if scoring_engine not in self.SCORING_ENGINES:
+            raise ValueError(f"scoring_engine must be one of: {', '.join(self.SCORING_ENGINES)}")
+        if scoring_engine == "numpy" and vector_scoring.np is None:
+            raise ImportError("numpy is required for the numpy scoring engine")
+        self.scoring_engine = scoring_engine
+        
+        self.planning_engine = self._check_planning_engine(planning_engine)
+        self.plan_time_budget = plan_time_budget
+        
+        # Ingredient match index and vector engine, rebuilt when the dish library version changes
+        self._ingredient_index = None
+        self._ingredient_index_version = None
+        self._vector_engine = None
+        
+        # Generated plans keyed by fingerprints of every input that affects them
+        self.plan_cache = PlanCache(plan_cache_size)
+        
+        # Drop derived state as soon as a change is saved in this process;
+        # the version checks above still catch changes made elsewhere
+        self.events = events if events is not None else self.dish_manager.events
+        self.events.subscribe("dishes", self._on_dishes_changed)
+        self.events.subscribe("past_meals", self._on_past_meals_changed)
+    
+    def _check_planning_engine(self, engine: str) -> str:
+        if engine not in self.PLANNING_ENGINES:
+            raise ValueError(f"planning_engine must be one of: {', '.join(self.PLANNING_ENGINES)}")
+        return engine
+    
+    def _on_dishes_changed(self, event: Dict):
+        self._ingredient_index = None
+        self._ingredient_index_version = None
+        self._vector_engine = None
+        self.plan_cache.clear()
+    
+    def _on_past_meals_changed(self, event: Dict):
+        self.plan_cache.clear()
     
     def match_ingredient(self, inventory_item: str, dish_ingredient: str) -> bool:
         """
@@ -52,68 +134,102 @@ class RecipePlanner:
         
         return False
     
-    def score_dish(self, dish: Dict, inventory_items: List[str]) -> tuple:
+    def get_ingredient_index(self, dishes: List[Dict], version=None) -> IngredientMatchIndex:
+        """
+        Get the ingredient match index for the dish library.
+        The index is reused until the library version changes.
+        """
+        if self._ingredient_index is None or version is None or version != self._ingredient_index_version:
+            self._ingredient_index = IngredientMatchIndex(
+                ingredient for dish in dishes for ingredient in dish.get("ingredients", [])
+            )
+            self._ingredient_index_version = version
+            self._vector_engine = None
+        return self._ingredient_index
+    
+    def get_vector_engine(self, dishes: List[Dict], version=None) -> VectorScoringEngine:
+        """Get the numpy scoring engine for the dish library, rebuilt with the index."""
+        index = self.get_ingredient_index(dishes, version)
+        if self._vector_engine is None or self._vector_engine.index is not index:
+            self._vector_engine = VectorScoringEngine(dishes, index)
+        return self._vector_engine
+    
+    def score_dish(self, dish: Dict, inventory_items: List[str],
+                   matched_vocabulary: Optional[Set[str]] = None) -> tuple:
         """
         Score a dish based on ingredient availability.
         Returns (score, matched_ingredients_set).
         Score is ratio of matched ingredients to total ingredients.
+        
+        matched_vocabulary: optional precomputed result of
+        IngredientMatchIndex.match_inventory(inventory_items); when given,
+        each ingredient is a set lookup instead of a scan of the inventory.
         """
         dish_ingredients = dish.get("ingredients", [])
         if not dish_ingredients:
             return 0.0, set()
         
         matched = set()
-        for ingredient in dish_ingredients:
-            for inv_item in inventory_items:
-                if self.match_ingredient(inv_item, ingredient):
+        if matched_vocabulary is not None:
+            for ingredient in dish_ingredients:
+                if ingredient.lower() in matched_vocabulary:
                     matched.add(ingredient)
-                    break
+        else:
+            for ingredient in dish_ingredients:
+                for inv_item in inventory_items:
+                    if self.match_ingredient(inv_item, ingredient):
+                        matched.add(ingredient)
+                        break
         
         score = len(matched) / len(dish_ingredients) if dish_ingredients else 0.0
         return score, matched
     
     def load_past_meals(self, days: int = 7) -> Set[str]:
         """Load dishes prepared in the last N days."""
-        if not os.path.exists(self.past_meals_file):
-            return set()
-        
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            recent_dishes = set()
-            
-            with open(self.past_meals_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    date_str = row.get('date', '')
-                    dish_name = row.get('dish_name', '')
-                    
-                    if date_str and dish_name:
-                        try:
-                            meal_date = datetime.strptime(date_str, '%Y-%m-%d')
-                            if meal_date >= cutoff_date:
-                                recent_dishes.add(dish_name)
-                        except ValueError:
-                            continue
-            
-            return recent_dishes
+            return self.history.get_recent_dishes(days)
         except Exception:
             return set()
     
-    def get_feasible_dishes(self, inventory_items: List[str]) -> List:
+    def load_plan_inputs(self) -> PlanInputs:
+        """Load the dish library, its match index and the recent-meal window."""
+        version = self.dish_manager.get_version()
+        dishes = self.dish_manager.get_all_dishes()
+        index = self.get_ingredient_index(dishes, version)
+        vector_engine = self.get_vector_engine(dishes, version) if self.scoring_engine == "numpy" else None
+        return PlanInputs(dishes, version, self.load_past_meals(7), index, vector_engine)
+    
+    def get_feasible_dishes(self, inventory_items: List[str], inputs: Optional[PlanInputs] = None,
+                            matched_vocabulary: Optional[Set[str]] = None,
+                            categories: Optional[List[str]] = None) -> List:
         """
         Get all feasible dishes scored by ingredient availability.
         Returns list of (dish, score) tuples sorted by score descending.
+        inputs: preloaded PlanInputs to share between plans (default: load now).
+        matched_vocabulary: optional precomputed inputs.index.match_inventory(inventory_items).
+        categories: optional dish categories to keep (default: all).
         """
-        dishes = self.dish_manager.get_all_dishes()
-        recent_dishes = self.load_past_meals(7)
+        if inputs is None:
+            inputs = self.load_plan_inputs()
+        dishes = inputs.dishes
+        recent_dishes = inputs.recent_dishes
+        
+        # Resolve inventory against the whole ingredient vocabulary once
+        if matched_vocabulary is None:
+            matched_vocabulary = inputs.index.match_inventory(inventory_items)
+        
+        if inputs.vector_engine is not None:
+            return inputs.vector_engine.get_feasible_dishes(matched_vocabulary, recent_dishes, categories)
         
         scored_dishes = []
         for dish in dishes:
             # Skip recent dishes
             if dish.get("name") in recent_dishes:
                 continue
+            if categories is not None and dish.get("category") not in categories:
+                continue
             
-            score, matched = self.score_dish(dish, inventory_items)
+            score, matched = self.score_dish(dish, inventory_items, matched_vocabulary)
             # Only include dishes with at least one matched ingredient
             if score > 0:
                 scored_dishes.append((dish, score))
@@ -122,17 +238,396 @@ class RecipePlanner:
         scored_dishes.sort(key=lambda x: x[1], reverse=True)
         return scored_dishes
     
-    def generate_meal_plan(self, inventory_items: List[str], start_day: int = 0) -> str:
+    def get_past_meals_version(self) -> tuple:
+        """Return a version token for the past meals history."""
+        return self.history.get_version()
+    
+    def get_plan_cache_key(self, inventory_items: List[str], start_day: int,
+                           engine: Optional[str] = None, stock: Optional[List[Dict]] = None) -> tuple:
+        """
+        Build the plan cache key. A plan depends only on the inventory names
+        (or stock quantities), the dish library, the recent-meal window,
+        start_day and the planning engine, so any mutation of those yields a
+        new key and stale plans are never served. The current date is
+        included because the 7-day window moves with it.
         """
-        Generate a 7-day meal plan.
+        return (
+            fingerprint_names(inventory_items) if stock is None else fingerprint_stock(stock),
+            self.dish_manager.get_version(),
+            self.get_past_meals_version(),
+            datetime.now().strftime('%Y-%m-%d'),
+            start_day,
+            engine or self.planning_engine,
+        )
+    
+    @timed
+    def generate_plan(self, inventory_items: List[str], start_day: int = 0,
+                      engine: Optional[str] = None, stock: Optional[List[Dict]] = None) -> Dict:
+        """
+        Generate a 7-day meal plan as structured data, reusing a cached
+        result when the inputs are unchanged.
         start_day: 0 = Sunday, 1 = Monday, etc.
+        engine: planning engine for this plan (default: self.planning_engine).
+        stock: optional inventory items with quantities; when given, the plan
+        draws down a working copy of the stock as dishes are assigned (see
+        StockLedger) and inventory_items is ignored.
+        
+        Returns {"start_day": int, "days": [{"day": "周一", "dishes": [{"id",
+        "name", "category", "score", "matched_ingredients"}, ...]}, ...]};
+        "days" is empty if no dish matches. Render it with
+        plan_format.format_plan_text.
+        """
+        engine = self._check_planning_engine(engine or self.planning_engine)
+        key = self.get_plan_cache_key(inventory_items, start_day, engine, stock)
+        plan = self.plan_cache.get(key)
+        if plan is None:
+            plan = self._build_plan(inventory_items, start_day, engine, stock)
+            self.plan_cache.put(key, plan)
+        # Cached plans are shared; hand out copies
+        return copy.deepcopy(plan)
+    
+    @timed
+    def generate_meal_plan(self, inventory_items: List[str], start_day: int = 0,
+                           engine: Optional[str] = None, stock: Optional[List[Dict]] = None) -> str:
+        """
+        Generate a 7-day meal plan (see generate_plan).
         Returns formatted text string.
         """
-        feasible_dishes = self.get_feasible_dishes(inventory_items)
+        return format_plan_text(self.generate_plan(inventory_items, start_day, engine, stock))
+    
+    def _build_plan(self, inventory_items: List[str], start_day: int = 0,
+                    engine: str = "greedy", stock: Optional[List[Dict]] = None) -> Dict:
+        """Generate a structured 7-day meal plan without consulting the cache."""
+        inputs = self.load_plan_inputs()
+        ledger = StockLedger(stock) if stock is not None else None
+        matched_vocabulary = inputs.index.match_inventory(inventory_items) if ledger is None else None
+        days = self._plan_days(inventory_items, engine, ledger, inputs, matched_vocabulary)
+        return self._describe_plan(days, start_day, inputs, inventory_items, ledger, matched_vocabulary)
+    
+    def _plan_days(self, inventory_items: List[str], engine: str, ledger: Optional[StockLedger],
+                   inputs: PlanInputs, matched_vocabulary: Optional[Set[str]] = None) -> Optional[List[List[str]]]:
+        """
+        Plan one week as 7 lists of dish names, or None if no dish matches.
+        ledger: stock at the start of the week for quantity-aware planning (not modified).
+        matched_vocabulary: optional precomputed inputs.index.match_inventory(inventory_items).
+        """
+        if ledger is not None:
+            days, candidates = self._plan_greedy_stock(inputs.dishes, inputs.recent_dishes, ledger.fork())
+            if not candidates:
+                return None
+            if engine == "optimal":
+                days = self._plan_optimal(candidates, days, lambda plan: self._replay_stock(
+                    plan, inputs.dishes, ledger.fork()) is not None)
+            return days
         
+        if matched_vocabulary is None:
+            matched_vocabulary = inputs.index.match_inventory(inventory_items)
+        feasible_dishes = self.get_feasible_dishes(inventory_items, inputs, matched_vocabulary)
         if not feasible_dishes:
-            return "无法生成餐单：没有找到匹配的菜品。"
+            return None
+        
+        days = self._plan_greedy(feasible_dishes)
+        if engine == "optimal":
+            candidates = [self._plan_candidate(dish, score, lambda ingredient: ingredient.lower() in matched_vocabulary)
+                          for dish, score in feasible_dishes]
+            days = self._plan_optimal(candidates, days)
+        return days
+    
+    def _describe_plan(self, days: Optional[List[List[str]]], start_day: int, inputs: PlanInputs,
+                       inventory_items: List[str], ledger: Optional[StockLedger],
+                       matched_vocabulary: Optional[Set[str]] = None) -> Dict:
+        """
+        Structured plan for 7 lists of dish names. Scores and matched
+        ingredients are against the inventory names, or with stock, against
+        what is left when each dish's turn comes.
+        """
+        if days is None:
+            return {"start_day": start_day, "days": []}
+        
+        dishes_by_name = {}
+        for dish in inputs.dishes:
+            dishes_by_name.setdefault(dish.get("name"), dish)
         
+        if ledger is not None:
+            matches = self._replay_stock(days, inputs.dishes, ledger.fork())
+        else:
+            if matched_vocabulary is None:
+                matched_vocabulary = inputs.index.match_inventory(inventory_items)
+            matches = [[self.score_dish(dishes_by_name.get(name, {}), inventory_items, matched_vocabulary)
+                        for name in day_dishes] for day_dishes in days]
+        
+        plan_days = []
+        for day_offset, day_dishes in enumerate(days):
+            entries = []
+            for dish_name, (score, matched) in zip(day_dishes, matches[day_offset]):
+                dish = dishes_by_name.get(dish_name, {})
+                ingredients = dish.get("ingredients", [])
+                entries.append({
+                    "id": dish.get("id"),
+                    "name": dish_name,
+                    "category": dish.get("category"),
+                    "score": score,
+                    "matched_ingredients": [ingredient for ingredient in dict.fromkeys(ingredients)
+                                            if ingredient in matched],
+                })
+            plan_days.append({"day": self.CHINESE_DAYS[(start_day + day_offset) % 7], "dishes": entries})
+        return {"start_day": start_day, "days": plan_days}
+    
+    def plan_weeks(self, inventory_items: List[str], start_day: int = 0, weeks: int = 1,
+                   engine: Optional[str] = None, stock: Optional[List[Dict]] = None,
+                   inputs: Optional[PlanInputs] = None) -> List[Dict]:
+        """
+        Plan consecutive weeks, each as a structured plan (see generate_plan).
+        Each week treats the previous week's dishes as its recent meals, and
+        with stock, starts from what the previous weeks left.
+        """
+        engine = self._check_planning_engine(engine or self.planning_engine)
+        if inputs is None:
+            inputs = self.load_plan_inputs()
+        
+        plans = []
+        week_inputs = inputs
+        ledger = StockLedger(stock) if stock is not None else None
+        matched_vocabulary = inputs.index.match_inventory(inventory_items) if ledger is None else None
+        for _ in range(weeks):
+            days = self._plan_days(inventory_items, engine, ledger, week_inputs, matched_vocabulary)
+            plans.append(self._describe_plan(days, start_day, week_inputs, inventory_items, ledger,
+                                             matched_vocabulary))
+            week_inputs = week_inputs._replace(recent_dishes={name for day in days or [] for name in day})
+            if days is not None and ledger is not None:
+                ledger = ledger.fork()
+                self._replay_stock(days, inputs.dishes, ledger)
+        return plans
+    
+    def generate_meal_plans(self, jobs: List[Dict], concurrency: Optional[int] = None) -> List[Dict]:
+        """
+        Plan many jobs at once, e.g. several kitchens and weeks. Each job is
+        a dict with "inventory" (item names, or inventory items when
+        "track_quantities" is set) and optional "start_day", "weeks" and
+        "engine". The dish library, match index and recent meals are loaded
+        once and shared by all jobs.
+        
+        Up to concurrency jobs (default: one per job, at most the CPU count)
+        run at a time on a thread pool. Planning is pure Python and holds the
+        GIL, so this overlaps jobs rather than running them in parallel: a
+        batch takes about as long as planning its jobs one after another, and
+        the saving over separate calls is the shared load.
+        
+        Returns one dict per job, in order: {"start_day", "weeks": [{"week",
+        "days", "meal_plan"}]} with "days" as in generate_plan and
+        "meal_plan" its text, or {"error": message}.
+        """
+        if len(jobs) > self.MAX_BATCH_JOBS:
+            raise ValueError(f"At most {self.MAX_BATCH_JOBS} jobs per batch")
+        inputs = self.load_plan_inputs()
+        
+        def run(job) -> Dict:
+            try:
+                if not isinstance(job, dict):
+                    return {"error": "Job must be a dictionary"}
+                start_day = job.get("start_day", 0)
+                weeks = job.get("weeks", 1)
+                if not isinstance(start_day, int) or not 0 <= start_day <= 6:
+                    return {"error": "start_day must be an integer from 0 to 6"}
+                if not isinstance(weeks, int) or not 1 <= weeks <= self.MAX_PLAN_WEEKS:
+                    return {"error": f"weeks must be an integer from 1 to {self.MAX_PLAN_WEEKS}"}
+                
+                # Inventory items may be given as names or as inventory item dicts
+                items = [{"item": item, "quantity": 1} if isinstance(item, str) else item
+                         for item in job.get("inventory") or [] if isinstance(item, (str, dict))]
+                names = [item.get("item", "") for item in items if item.get("item")]
+                stock = items if job.get("track_quantities") else None
+                
+                plans = self.plan_weeks(names, start_day, weeks, job.get("engine"), stock, inputs)
+                return {
+                    "start_day": start_day,
+                    "weeks": [{"week": week, "days": plan["days"], "meal_plan": format_plan_text(plan)}
+                              for week, plan in enumerate(plans)],
+                }
+            except Exception as e:
+                return {"error": str(e)}
+        
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=concurrency or min(len(jobs), os.cpu_count() or 1)) as executor:
+            return list(executor.map(run, jobs))
+    
+    def _dish_kind(self, dish: Dict) -> str:
+        """Slot kind of a dish for the planners: "veg", "meat" or "other"."""
+        category = dish.get("category")
+        if category == self.VEGETABLE_CATEGORY:
+            return "veg"
+        if category in self.MEAT_CATEGORIES:
+            return "meat"
+        return "other"
+    
+    def _plan_candidate(self, dish: Dict, score: float, available) -> Dict:
+        """WeeklyPlanSolver candidate for a dish; available(ingredient) tells matched ingredients."""
+        matched = {ingredient.lower() for ingredient in dish.get("ingredients", []) if available(ingredient)}
+        return {"name": dish.get("name"), "kind": self._dish_kind(dish), "score": score, "matched": matched}
+    
+    def _plan_optimal(self, candidates: List[Dict], greedy_days: List[List[str]],
+                      validate=None) -> List[List[str]]:
+        """
+        Improve on the greedy plan with WeeklyPlanSolver within the time
+        budget. Falls back to the greedy plan if the solver fails or the
+        result does not pass validate(days).
+        """
+        try:
+            solver = WeeklyPlanSolver(candidates, greedy_days, max_repeats=self.MAX_REPEATS,
+                                      time_budget=self.plan_time_budget)
+            days = solver.solve()
+            if days is None or (validate is not None and days is not greedy_days and not validate(days)):
+                return greedy_days
+        except Exception:
+            logger.warning("Optimal planner failed, using greedy plan", exc_info=True)
+            return greedy_days
+        return days
+    
+    @staticmethod
+    def _stock_score(ingredients: List[str], ledger: StockLedger) -> float:
+        """Share of a dish's ingredients whose inventory item still has stock."""
+        if not ingredients:
+            return 0.0
+        return len({ingredient for ingredient in ingredients if ledger.in_stock(ingredient)}) / len(ingredients)
+    
+    def _replay_stock(self, days: List[List[str]], dishes: List[Dict],
+                      ledger: StockLedger) -> Optional[List[List[tuple]]]:
+        """
+        Cook the plan against the ledger, in order. Returns (score,
+        in-stock ingredients) per dish as in score_dish, or None if some dish
+        has nothing left in stock when its turn comes.
+        """
+        ingredients_by_name = {}
+        for dish in dishes:
+            ingredients_by_name.setdefault(dish.get("name"), dish.get("ingredients", []))
+        
+        matches = []
+        for day_dishes in days:
+            day_matches = []
+            for dish_name in day_dishes:
+                ingredients = ingredients_by_name.get(dish_name, [])
+                matched = {ingredient for ingredient in ingredients if ledger.in_stock(ingredient)}
+                if not matched:
+                    return None
+                day_matches.append((len(matched) / len(ingredients), matched))
+                ledger.consume([ingredient for ingredient in ingredients if ingredient in matched])
+            matches.append(day_matches)
+        return matches
+    
+    def _plan_greedy_stock(self, dishes: List[Dict], recent_dishes: Set[str],
+                           ledger: StockLedger) -> tuple:
+        """
+        Greedy weekly plan against stock quantities. Same slots as
+        _plan_greedy, but every assigned dish draws its in-stock ingredients
+        from the ledger, so later picks only count what is left.
+        
+        Dishes are kept in score-ordered lists; when an item runs out, only
+        the dishes drawing from it are rescored and moved.
+        Returns (days, candidates): 7 lists of dish names, and the
+        WeeklyPlanSolver candidates scored against the initial stock.
+        """
+        names = {}
+        ingredients_of = {}
+        dependents: Dict[int, List[int]] = {}  # item position -> dish orders drawing from it
+        scores = {}
+        candidates = []
+        for order, dish in enumerate(dishes):
+            # Skip recent dishes
+            if dish.get("name") in recent_dishes:
+                continue
+            ingredients = dish.get("ingredients", [])
+            score = self._stock_score(ingredients, ledger)
+            if score <= 0:
+                continue
+            names[order] = dish.get("name")
+            ingredients_of[order] = ingredients
+            scores[order] = score
+            for ingredient in set(ingredients):
+                position = ledger.item_for(ingredient)
+                if position is not None:
+                    dependents.setdefault(position, []).append(order)
+            candidates.append(self._plan_candidate(dish, score, ledger.in_stock))
+        
+        # Sorted (-score, order) keys: ties keep library order, like the stable sort in get_feasible_dishes
+        rankings = {"all": [], "veg": [], "meat": []}
+        kinds = {order: self._dish_kind(dishes[order]) for order in scores}
+        
+        def rankings_of(order):
+            yield rankings["all"]
+            if kinds[order] in rankings:
+                yield rankings[kinds[order]]
+        
+        for order, score in scores.items():
+            for ranking in rankings_of(order):
+                ranking.append((-score, order))
+        for ranking in rankings.values():
+            ranking.sort()
+        
+        def unrank(order):
+            for ranking in rankings_of(order):
+                position = bisect.bisect_left(ranking, (-scores[order], order))
+                del ranking[position]
+        
+        used_dishes = {}  # Track usage count: dish_name -> count
+        
+        def pick(ranking, day_dishes) -> Optional[int]:
+            for _, order in ranking:
+                dish_name = names[order]
+                if used_dishes.get(dish_name, 0) < self.MAX_REPEATS and dish_name not in day_dishes:
+                    return order
+            return None
+        
+        def assign(order, day_dishes):
+            dish_name = names[order]
+            day_dishes.append(dish_name)
+            used_dishes[dish_name] = used_dishes.get(dish_name, 0) + 1
+            if used_dishes[dish_name] >= self.MAX_REPEATS:
+                unrank(order)
+                del scores[order]
+            
+            depleted = ledger.consume([ingredient for ingredient in ingredients_of[order]
+                                       if ledger.in_stock(ingredient)])
+            # Rescore only the dishes that drew from an item that ran out
+            affected = {dependent for position in depleted for dependent in dependents.get(position, ())}
+            for dependent in affected:
+                if dependent not in scores:
+                    continue
+                unrank(dependent)
+                score = self._stock_score(ingredients_of[dependent], ledger)
+                if score > 0:
+                    scores[dependent] = score
+                    for ranking in rankings_of(dependent):
+                        bisect.insort(ranking, (-score, dependent))
+                else:
+                    del scores[dependent]
+        
+        days = []
+        for day_offset in range(7):
+            day_dishes = []
+            
+            # At least one vegetable and one meat/seafood dish
+            for kind in ("veg", "meat"):
+                order = pick(rankings[kind], day_dishes)
+                if order is not None:
+                    assign(order, day_dishes)
+            
+            # Up to 2 more dishes from any category
+            for _ in range(2):
+                order = pick(rankings["all"], day_dishes)
+                if order is None:
+                    break
+                assign(order, day_dishes)
+            
+            days.append(day_dishes)
+        
+        return days, candidates
+    
+    def _plan_greedy(self, feasible_dishes: List) -> List[List[str]]:
+        """
+        Greedy weekly plan: day by day, the best vegetable and meat dish still
+        under MAX_REPEATS plus up to two more. Returns 7 lists of dish names.
+        """
         # Separate dishes by category
         vegetable_dishes = [(d, s) for d, s in feasible_dishes 
                            if d.get("category") == self.VEGETABLE_CATEGORY]
@@ -142,9 +637,9 @@ class RecipePlanner:
                        if d.get("category") not in [self.VEGETABLE_CATEGORY] + self.MEAT_CATEGORIES]
         
         # Plan for 7 days
-        plan_lines = []
+        days = []
         used_dishes = {}  # Track usage count: dish_name -> count
-        MAX_REPEATS = 2  # Maximum times a dish can appear in a week
+        MAX_REPEATS = self.MAX_REPEATS
         
         def can_use_dish(dish_name: str) -> bool:
             """Check if a dish can still be used (hasn't exceeded max repeats)."""
@@ -166,11 +661,6 @@ class RecipePlanner:
             return min(available, key=lambda x: used_dishes.get(x[0].get("name"), 0))
         
         for day_offset in range(7):
-            day_index = (start_day + day_offset) % 7
-            day_name = self.CHINESE_DAYS[day_index]
-            
-            plan_lines.append(day_name)
-            
             day_dishes = []
             
             # Ensure at least one vegetable dish
@@ -242,30 +732,15 @@ class RecipePlanner:
                     day_dishes.append(dish_name)
                     used_dishes[dish_name] = used_dishes.get(dish_name, 0) + 1
             
-            # Add dish names to plan
-            for dish_name in day_dishes:
-                plan_lines.append(dish_name)
-            
-            # If no dishes were added, add a placeholder
-            if not day_dishes:
-                plan_lines.append("(待定)")
-            
-            # Add empty line between days (except after last day)
-            if day_offset < 6:
-                plan_lines.append("")
+            days.append(day_dishes)
         
-        return "\n".join(plan_lines)
+        return days
     
     def record_meal(self, date: str, dish_name: str):
-        """Record a meal prep in the past meals CSV."""
-        file_exists = os.path.exists(self.past_meals_file)
-        
-        os.makedirs(os.path.dirname(self.past_meals_file), exist_ok=True)
+        """Record a meal prep in the past meals history."""
+        self.history.append(date, dish_name)
         
-        mode = 'a' if file_exists else 'w'
-        with open(self.past_meals_file, mode, encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(['date', 'dish_name'])
-            writer.writerow([date, dish_name])
+        # Recent meals feed every plan, so subscribers drop all cached plans
+        self.events.publish("past_meals", version=self.get_past_meals_version(),
+                            date=date, dish_name=dish_name)
 
@@ -0,0 +1,376 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from instrumentation import record_io, timed
+from json_store import JsonCollection, StaleVersionError
+from meal_history import MealHistory
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+);
+CREATE INDEX IF NOT EXISTS records_by_name ON records (collection, name);
+CREATE INDEX IF NOT EXISTS records_by_seq ON records (collection, seq);
+
+CREATE TABLE IF NOT EXISTS past_meals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT,
+    dish_name TEXT,
+    meal_date TEXT
+);
+CREATE INDEX IF NOT EXISTS past_meals_by_date ON past_meals (meal_date, id);
+
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SqliteDatabase:
+    """
+    SQLite database (WAL mode) backing the managers.
+    
+    Each thread gets its own connection. transaction() opens a
+    BEGIN IMMEDIATE transaction, reentrant within a thread, which serializes
+    writers across threads and processes the way JsonFileStore.lock() does.
+    Every write bumps a per-collection counter in the versions table, which
+    serves as the collection's version token.
+    """
+    
+    def __init__(self, db_path: str):
+        if not os.path.isabs(db_path):
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            db_path = os.path.join(project_root, db_path)
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.connection.executescript(SCHEMA)
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.depth = 0
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """Run a write transaction; commits on success, rolls back on error."""
+        conn = self.connection
+        if self._local.depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            conn.execute("COMMIT")
+    
+    @contextmanager
+    def snapshot(self):
+        """
+        Run several reads against one consistent snapshot (a deferred read
+        transaction). Inside an open transaction the reads already share it.
+        """
+        conn = self.connection
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+    
+    def get_version(self, name: str) -> Optional[int]:
+        """Return the write counter for a collection, or None if never written."""
+        row = self.connection.execute(
+            "SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    def bump_version(self, name: str) -> int:
+        """Increment a collection's write counter; call inside a transaction."""
+        conn = self.connection
+        conn.execute(
+            "INSERT INTO versions (name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,))
+        return conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()[0]
+    
+    def collection(self, name: str, key_func: Callable[[Dict], str],
+                   name_func: Optional[Callable[[Dict], str]] = None) -> 'SqliteCollection':
+        """Return a collection backed by this database."""
+        return SqliteCollection(self, name, key_func, name_func)
+
+
+class SqliteCollection:
+    """
+    A list of JSON records stored as rows of the records table.
+    Drop-in replacement for json_store.JsonCollection.
+    """
+    
+    # get() and get_by_name() are indexed single-row queries
+    POINT_LOOKUPS = True
+    
+    def __init__(self, database: SqliteDatabase, name: str,
+                 key_func: Callable[[Dict], str],
+                 name_func: Optional[Callable[[Dict], str]] = None):
+        self.database = database
+        self.name = name
+        self.key_func = key_func
+        self.name_func = name_func
+        # I/O is counted (as JSON payload bytes) under this source
+        self.source = f"sqlite:{name}"
+    
+    def ensure_exists(self):
+        """Tables are created with the database; nothing to do."""
+    
+    def get_version(self) -> Optional[int]:
+        """Return the collection's version token."""
+        return self.database.get_version(self.name)
+    
+    def lock(self):
+        """Hold a write transaction for a read-modify-write cycle."""
+        return self.database.transaction()
+    
+    @timed
+    def load(self) -> tuple:
+        """Load all records in insertion order. Returns (records, version)."""
+        # One snapshot, so a write committed in between cannot pair old rows with a new version
+        with self.database.snapshot() as conn:
+            version = self.get_version()
+            rows = conn.execute(
+                "SELECT data FROM records WHERE collection = ? ORDER BY seq", (self.name,)).fetchall()
+        record_io(self.source, bytes_read=sum(len(row[0]) for row in rows))
+        return [json.loads(row[0]) for row in rows], version
+    
+    @timed
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the record with the given key, or None."""
+        row = self.database.connection.execute(
+            "SELECT data FROM records WHERE collection = ? AND key = ?", (self.name, key)).fetchone()
+        record_io(self.source, bytes_read=len(row[0]) if row else 0)
+        return json.loads(row[0]) if row else None
+    
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Return the first record whose name column equals name, or None."""
+        row = self.database.connection.execute(
+            "SELECT data FROM records WHERE collection = ? AND name = ? ORDER BY seq LIMIT 1",
+            (self.name, name)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _upsert(self, conn: sqlite3.Connection, records: List[Dict], seq_start: Optional[int] = None):
+        """Insert or update records; new rows go after existing ones."""
+        if seq_start is None:
+            seq_start = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM records WHERE collection = ?",
+                (self.name,)).fetchone()[0]
+        for offset, record in enumerate(records):
+            data = json.dumps(record, ensure_ascii=False)
+            record_io(self.source, bytes_written=len(data))
+            conn.execute(
+                "INSERT INTO records (collection, key, name, seq, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(collection, key) DO UPDATE SET name = excluded.name, data = excluded.data",
+                (self.name, self.key_func(record),
+                 self.name_func(record) if self.name_func else None,
+                 seq_start + offset,
+                 data))
+    
+    @timed
+    def save(self, data: List[Dict], expected_version: Optional[int] = None,
+             upserted: Optional[List[Dict]] = None, deleted_keys: Optional[List[str]] = None) -> int:
+        """
+        Persist changes and return the new version.
+        
+        With upserted/deleted_keys only those rows are written. Without
+        them, data is taken as the complete new contents of the collection.
+        Raises StaleVersionError if expected_version is given and stale.
+        """
+        with self.database.transaction() as conn:
+            if expected_version is not None and self.get_version() != expected_version:
+                raise StaleVersionError(f"{self.name} was modified concurrently")
+            
+            if upserted is None and deleted_keys is None:
+                conn.execute("DELETE FROM records WHERE collection = ?", (self.name,))
+                # Keep only the first record per key, like the JSON lookups do
+                unique = {}
+                for record in data:
+                    unique.setdefault(self.key_func(record), record)
+                self._upsert(conn, list(unique.values()), seq_start=0)
+            else:
+                for key in deleted_keys or []:
+                    conn.execute("DELETE FROM records WHERE collection = ? AND key = ?",
+                                 (self.name, key))
+                self._upsert(conn, upserted or [])
+            
+            return self.database.bump_version(self.name)
+
+
+class SqliteMealHistory:
+    """
+    Past meals stored in the past_meals table.
+    Drop-in replacement for meal_history.MealHistory.
+    """
+    
+    DATE_FORMAT = MealHistory.DATE_FORMAT
+    VERSION_NAME = "past_meals"
+    
+    def __init__(self, database: SqliteDatabase):
+        self.database = database
+    
+    def refresh(self):
+        """Rows are always read from the database; nothing to do."""
+    
+    def _normalize_date(self, date_str: str, dish_name: str) -> Optional[str]:
+        """Return the sortable meal_date for a row, or None if it is not dated."""
+        if not date_str or not dish_name:
+            return None
+        try:
+            return datetime.strptime(date_str, self.DATE_FORMAT).isoformat(sep=' ')
+        except ValueError:
+            return None
+    
+    def append(self, date: str, dish_name: str):
+        """Record a meal."""
+        self.append_many([(date, dish_name)])
+    
+    def append_many(self, meals: List[tuple]):
+        """Record several (date, dish_name) meals in one transaction."""
+        with self.database.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO past_meals (date, dish_name, meal_date) VALUES (?, ?, ?)",
+                [(date, dish_name, self._normalize_date(date, dish_name))
+                 for date, dish_name in meals])
+            self.database.bump_version(self.VERSION_NAME)
+    
+    def get_version(self) -> Optional[int]:
+        """Return a token that changes whenever a meal is recorded."""
+        return self.database.get_version(self.VERSION_NAME)
+    
+    def get_all_meals(self) -> List[Dict]:
+        """Get all recorded rows in insertion order."""
+        rows = self.database.connection.execute(
+            "SELECT date, dish_name FROM past_meals ORDER BY id").fetchall()
+        return [{"date": date, "dish_name": dish_name} for date, dish_name in rows]
+    
+    def get_dishes_between(self, start: datetime, end: Optional[datetime] = None) -> List[str]:
+        """Get dish names with start <= date (and date <= end if given), oldest first."""
+        query = "SELECT dish_name FROM past_meals WHERE meal_date >= ?"
+        params = [start.isoformat(sep=' ')]
+        if end is not None:
+            query += " AND meal_date <= ?"
+            params.append(end.isoformat(sep=' '))
+        rows = self.database.connection.execute(query + " ORDER BY meal_date, id", params).fetchall()
+        return [row[0] for row in rows]
+    
+    def get_dated_page(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       before: Optional[tuple] = None, limit: Optional[int] = None) -> tuple:
+        """
+        Get dated meals with since <= date <= until, newest first, at most
+        limit of them. before: the (date, id) next key of an earlier page.
+        Returns (meals, next_key), next_key being None on the last page.
+        """
+        query = "SELECT date, dish_name, meal_date, id FROM past_meals WHERE meal_date IS NOT NULL"
+        params = []
+        if since is not None:
+            query += " AND meal_date >= ?"
+            params.append(since.isoformat(sep=' '))
+        if until is not None:
+            query += " AND meal_date <= ?"
+            params.append(until.isoformat(sep=' '))
+        if before is not None:
+            query += " AND (meal_date, id) < (?, ?)"
+            params.extend([before[0].isoformat(sep=' '), before[1]])
+        query += " ORDER BY meal_date DESC, id DESC"
+        if limit is not None:
+            # One extra row tells whether there is another page
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        rows = self.database.connection.execute(query, params).fetchall()
+        
+        next_key = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (datetime.fromisoformat(rows[-1][2]), rows[-1][3])
+        return [{"date": date, "dish_name": dish_name} for date, dish_name, _, _ in rows], next_key
+    
+    def get_recent_dishes(self, days: int = 7) -> Set[str]:
+        """Get the set of dishes prepared in the last N days."""
+        cutoff_date = datetime.now() - timedelta(days=days)
+        return set(self.get_dishes_between(cutoff_date))
+
+
+def migrate_from_files(database: SqliteDatabase, data_dir: str = "data") -> Dict[str, int]:
+    """
+    One-shot import of the JSON/CSV data files into the database.
+    A collection is imported only if it has never been written in the
+    database, so running this again is a no-op.
+    Returns the number of records imported per collection.
+    """
+    # Imported here to avoid a circular import; the managers own the key rules
+    from dish_manager import DishManager
+    from inventory_manager import InventoryManager
+    from meal_plan_manager import MealPlanManager
+    
+    if not os.path.isabs(data_dir):
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        data_dir = os.path.join(project_root, data_dir)
+    
+    sources = [
+        ("dishes", "dishes.json", DishManager.record_key, DishManager.record_name),
+        ("inventory", "inventory.json", InventoryManager.record_key, None),
+        ("meal_plans", "meal_plans.json", MealPlanManager.record_key, None),
+    ]
+    
+    imported = {}
+    for name, filename, key_func, name_func in sources:
+        collection = database.collection(name, key_func, name_func)
+        path = os.path.join(data_dir, filename)
+        if collection.get_version() is not None or not os.path.exists(path):
+            continue
+        records, _ = JsonCollection(path, key_func).load()
+        collection.save(records)
+        imported[name] = len(records)
+    
+    history = SqliteMealHistory(database)
+    csv_path = os.path.join(data_dir, "past_meals.csv")
+    if history.get_version() is None and os.path.exists(csv_path):
+        meals = MealHistory(csv_path).get_all_meals()
+        history.append_many([(meal.get('date') or '', meal.get('dish_name') or '') for meal in meals])
+        imported["past_meals"] = len(meals)
+    
+    return imported
+
+
+if __name__ == "__main__":
+    # Usage: python src/sqlite_store.py [db_path] [data_dir]
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "data/weekly_recipes.db"
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else "data"
+    
+    result = migrate_from_files(SqliteDatabase(db_path), data_dir)
+    if not result:
+        print("Nothing to migrate: database already populated")
+    for name, count in result.items():
+        print(f"Imported {count} {name} records")
@@ -0,0 +1,63 @@
+from typing import Dict, Iterable, List, Optional
+
+from ingredient_index import ItemNameIndex
+
+
+class StockLedger:
+    """
+    Working copy of inventory quantities for planning.
+    
+    Ingredients draw from items with the same matching as
+    InventoryManager.consume_ingredients, and cooking a dish takes `amount`
+    from the item of each ingredient, never going below 0. Nothing is saved:
+    the ledger only projects what the week's cooking would leave.
+    
+    Only the ingredients a plan asks about are matched, each once: the
+    ingredient -> item position map is shared by every fork of the ledger,
+    so later weeks of the same plan reuse it.
+    """
+    
+    def __init__(self, items: List[Dict], amount: float = 1.0):
+        self.amount = amount
+        self.names = [item.get("item", "") for item in items]
+        self.quantities = [item.get("quantity", 0) or 0 for item in items]
+        self._index = ItemNameIndex(self.names)
+        # Lowercased ingredient -> item position (None if no item matches)
+        self._positions: Dict[str, Optional[int]] = {}
+    
+    def fork(self) -> "StockLedger":
+        """Independent copy of the current quantities, sharing the name index."""
+        ledger = StockLedger.__new__(StockLedger)
+        ledger.amount = self.amount
+        ledger.names = self.names
+        ledger.quantities = list(self.quantities)
+        ledger._index = self._index
+        ledger._positions = self._positions
+        return ledger
+    
+    def item_for(self, ingredient: str) -> Optional[int]:
+        """Position of the item the ingredient draws from, or None."""
+        key = ingredient.lower()
+        if key not in self._positions:
+            self._positions[key] = self._index.match(key)
+        return self._positions[key]
+    
+    def in_stock(self, ingredient: str) -> bool:
+        """True if the ingredient's item has any quantity left."""
+        position = self.item_for(ingredient)
+        return position is not None and self.quantities[position] > 0
+    
+    def consume(self, ingredients: Iterable[str]) -> List[int]:
+        """
+        Take `amount` for each ingredient from its item.
+        Returns the positions of items that ran out.
+        """
+        depleted = []
+        for ingredient in ingredients:
+            position = self.item_for(ingredient)
+            if position is None or self.quantities[position] <= 0:
+                continue
+            self.quantities[position] = max(0, self.quantities[position] - self.amount)
+            if self.quantities[position] <= 0:
+                depleted.append(position)
+        return depleted
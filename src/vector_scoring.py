@@ -0,0 +1,111 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only the "numpy" scoring engine needs it
+    np = None
+
+from ingredient_index import IngredientMatchIndex
+
+
+class VectorScoringEngine:
+    """
+    Scores every dish at once with a sparse dish x ingredient incidence matrix.
+    
+    The matrix is stored in coordinate form (rows/cols/counts) over the
+    lowercased ingredient vocabulary of an IngredientMatchIndex. A cell holds
+    the number of distinct ingredient spellings in the dish that lowercase to
+    that vocabulary word, so
+        
+        scores = (incidence @ inventory_vector) / ingredient_counts
+    
+    reproduces RecipePlanner.score_dish exactly. Recent-dish and category
+    filters are boolean masks over the dish rows.
+    """
+    
+    def __init__(self, dishes: List[Dict], index: IngredientMatchIndex):
+        if np is None:
+            raise ImportError("numpy is required for the numpy scoring engine")
+        
+        self.dishes = dishes
+        self.index = index
+        self._columns = {word: col for col, word in enumerate(index.vocabulary)}
+        
+        rows, cols, counts = [], [], []
+        ingredient_counts = []
+        self._rows_by_name: Dict[str, List[int]] = {}
+        for row, dish in enumerate(dishes):
+            ingredients = dish.get("ingredients", [])
+            ingredient_counts.append(len(ingredients))
+            self._rows_by_name.setdefault(dish.get("name"), []).append(row)
+            
+            per_column: Dict[int, int] = {}
+            for ingredient in set(ingredients):
+                col = self._columns[ingredient.lower()]
+                per_column[col] = per_column.get(col, 0) + 1
+            for col, count in per_column.items():
+                rows.append(row)
+                cols.append(col)
+                counts.append(count)
+        
+        self._rows = np.asarray(rows, dtype=np.int64)
+        self._cols = np.asarray(cols, dtype=np.int64)
+        self._counts = np.asarray(counts, dtype=np.float64)
+        self._ingredient_counts = np.asarray(ingredient_counts, dtype=np.float64)
+        
+        # category -> rows of the dishes in it, as a boolean mask
+        self._category_masks: Dict[str, np.ndarray] = {}
+        for row, dish in enumerate(dishes):
+            mask = self._category_masks.get(dish.get("category"))
+            if mask is None:
+                mask = self._category_masks[dish.get("category")] = np.zeros(len(dishes), dtype=bool)
+            mask[row] = True
+    
+    def inventory_vector(self, matched_vocabulary: Set[str]):
+        """Encode a matched vocabulary set as a 0/1 vector over the columns."""
+        vector = np.zeros(len(self._columns), dtype=np.float64)
+        cols = [self._columns[word] for word in matched_vocabulary if word in self._columns]
+        vector[cols] = 1.0
+        return vector
+    
+    def score_all(self, matched_vocabulary: Set[str]):
+        """Return the score of every dish as an array aligned with self.dishes."""
+        vector = self.inventory_vector(matched_vocabulary)
+        matched_counts = np.bincount(self._rows, weights=self._counts * vector[self._cols],
+                                     minlength=len(self.dishes))
+        scores = np.zeros(len(self.dishes), dtype=np.float64)
+        np.divide(matched_counts, self._ingredient_counts, out=scores,
+                  where=self._ingredient_counts > 0)
+        return scores
+    
+    def exclusion_mask(self, dish_names: Iterable[str]):
+        """Boolean mask that is False for dishes whose name is in dish_names."""
+        mask = np.ones(len(self.dishes), dtype=bool)
+        for name in dish_names:
+            mask[self._rows_by_name.get(name, [])] = False
+        return mask
+    
+    def category_mask(self, categories: Iterable[str]):
+        """Boolean mask that is True for dishes in any of the categories."""
+        mask = np.zeros(len(self.dishes), dtype=bool)
+        for category in categories:
+            if category in self._category_masks:
+                mask |= self._category_masks[category]
+        return mask
+    
+    def get_feasible_dishes(self, matched_vocabulary: Set[str], recent_dishes: Set[str],
+                            categories: Optional[Iterable[str]] = None) -> List:
+        """
+        Same result as RecipePlanner.get_feasible_dishes: (dish, score) for
+        every non-recent dish with a positive score (only those in
+        categories, if given), sorted by score descending with ties kept in
+        library order.
+        """
+        scores = self.score_all(matched_vocabulary)
+        mask = (scores > 0) & self.exclusion_mask(recent_dishes)
+        if categories is not None:
+            mask &= self.category_mask(categories)
+        
+        rows = np.flatnonzero(mask)
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return [(self.dishes[row], float(scores[row])) for row in rows]
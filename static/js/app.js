@@ -1,10 +1,13 @@
 // Global state
 let currentInventory = [];
+let inventoryVersion = null; // Change-log version of currentInventory (see syncInventory)
 let currentDishes = [];
 let currentMealPlan = '';
 let mealPlanData = {}; // Structured meal plan data: {day: [dishes]}
 let isEditingMealPlan = false;
 let cookedDishes = new Set(); // Track which dishes are marked as cooked
+let pastMealsCursor = null; // next_cursor of the last loaded past-meals page
+const PAST_MEALS_PAGE_SIZE = 50;
 
 // DOM Elements
 const generatePlanBtn = document.getElementById('generate-plan-btn');
@@ -20,6 +23,7 @@ const modalTitle = document.getElementById('modal-title');
 const cancelBtn = document.getElementById('cancel-btn');
 const closeModal = document.querySelector('.close');
 const pastMealsTbody = document.getElementById('past-meals-tbody');
+const loadMorePastMealsBtn = document.getElementById('load-more-past-meals-btn');
 
 // Inventory management elements
 const currentInventoryTbody = document.getElementById('current-inventory-tbody');
@@ -133,8 +137,34 @@ document.addEventListener('DOMContentLoaded', () => {
     loadPastMeals();
     loadCurrentInventory();
     initTabs();
+    connectEventStream();
 });
 
+// Live updates: changes made by other clients arrive as Server-Sent Events
+function connectEventStream() {
+    if (!window.EventSource) {
+        return;
+    }
+    const reloadAll = () => {
+        loadCurrentInventory();
+        loadDishes();
+        loadPastMeals();
+    };
+    const source = new EventSource('/api/events');
+    let connected = false;
+    source.addEventListener('open', () => {
+        // Events sent while reconnecting were missed
+        if (connected) {
+            reloadAll();
+        }
+        connected = true;
+    });
+    source.addEventListener('inventory', () => syncInventory());
+    source.addEventListener('dishes', () => loadDishes());
+    source.addEventListener('past_meals', () => loadPastMeals());
+    source.addEventListener('resync', reloadAll);
+}
+
 // Load current inventory
 async function loadCurrentInventory() {
     try {
@@ -142,6 +172,7 @@ async function loadCurrentInventory() {
         const data = await response.json();
         if (response.ok) {
             currentInventory = data.inventory;
+            inventoryVersion = data.version;
             displayCurrentInventory(data.inventory);
         }
     } catch (error) {
@@ -149,6 +180,59 @@ async function loadCurrentInventory() {
     }
 }
 
+// Apply only the inventory changes since the last load or sync
+async function syncInventory() {
+    if (inventoryVersion === null) {
+        return loadCurrentInventory();
+    }
+    try {
+        const response = await fetch(`/api/inventory/changes?since=${inventoryVersion}`);
+        const data = await response.json();
+        if (!response.ok || data.reset) {
+            return loadCurrentInventory();
+        }
+        
+        data.changes.forEach(change => {
+            const index = currentInventory.findIndex(item => (item.item || '').toLowerCase() === change.key);
+            const row = currentInventoryTbody.querySelector(`tr[data-key="${CSS.escape(change.key)}"]`);
+            if (change.op === 'delete') {
+                if (index !== -1) currentInventory.splice(index, 1);
+                if (row) row.remove();
+            } else if (index !== -1) {
+                currentInventory[index] = change.item;
+                if (row) row.replaceWith(createInventoryRow(change.item));
+            } else {
+                if (currentInventory.length === 0) currentInventoryTbody.innerHTML = '';
+                currentInventory.push(change.item);
+                currentInventoryTbody.appendChild(createInventoryRow(change.item));
+            }
+        });
+        if (currentInventory.length === 0) {
+            displayCurrentInventory(currentInventory);
+        }
+        inventoryVersion = data.version;
+    } catch (error) {
+        console.error('同步库存失败:', error);
+    }
+}
+
+// Build the table row of one inventory item
+function createInventoryRow(item) {
+    const row = document.createElement('tr');
+    row.dataset.key = (item.item || '').toLowerCase();
+    row.innerHTML = `
+        <td>${item.item || ''}</td>
+        <td>${item.quantity || 0}</td>
+        <td>${item.unit || ''}</td>
+        <td>${item.category || '其他'}</td>
+        <td>
+            <button class="btn btn-edit" onclick="editInventoryItem('${item.item}')">编辑</button>
+            <button class="btn btn-danger" onclick="deleteInventoryItem('${item.item}')">删除</button>
+        </td>
+    `;
+    return row;
+}
+
 // Display current inventory
 function displayCurrentInventory(inventory) {
     currentInventoryTbody.innerHTML = '';
@@ -160,18 +244,7 @@ function displayCurrentInventory(inventory) {
     }
 
     inventory.forEach(item => {
-        const row = document.createElement('tr');
-        row.innerHTML = `
-            <td>${item.item || ''}</td>
-            <td>${item.quantity || 0}</td>
-            <td>${item.unit || ''}</td>
-            <td>${item.category || '其他'}</td>
-            <td>
-                <button class="btn btn-edit" onclick="editInventoryItem('${item.item}')">编辑</button>
-                <button class="btn btn-danger" onclick="deleteInventoryItem('${item.item}')">删除</button>
-            </td>
-        `;
-        currentInventoryTbody.appendChild(row);
+        currentInventoryTbody.appendChild(createInventoryRow(item));
     });
 }
 
@@ -234,16 +307,18 @@ inventoryForm.addEventListener('submit', async (e) => {
         if (originalName) {
             // Update - need to delete old and add new if name changed
             if (originalName.toLowerCase() !== itemData.item.toLowerCase()) {
-                // Name changed, delete old and add new
-                await fetch(`/api/inventory/${encodeURIComponent(originalName)}`, {
-                    method: 'DELETE',
-                });
-                response = await fetch('/api/inventory', {
+                // Name changed, delete old and add new in one batch
+                response = await fetch('/api/inventory/batch', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify(itemData),
+                    body: JSON.stringify({
+                        operations: [
+                            { op: 'delete', name: originalName },
+                            { op: 'add', item: itemData },
+                        ],
+                    }),
                 });
             } else {
                 // Just update
@@ -269,7 +344,7 @@ inventoryForm.addEventListener('submit', async (e) => {
         const data = await response.json();
         if (response.ok) {
             inventoryModal.style.display = 'none';
-            loadCurrentInventory();
+            syncInventory();
         } else {
             alert('保存失败: ' + data.error);
         }
@@ -299,7 +374,7 @@ async function deleteInventoryItem(itemName) {
 
         const data = await response.json();
         if (response.ok) {
-            loadCurrentInventory();
+            syncInventory();
         } else {
             alert('删除失败: ' + data.error);
         }
@@ -333,7 +408,7 @@ async function generateMealPlan() {
         const data = await response.json();
         if (response.ok) {
             currentMealPlan = data.meal_plan;
-            parseMealPlan(data.meal_plan);
+            loadMealPlanDays(data.plan.days);
             // Reset cooked dishes when generating new plan
             cookedDishes.clear();
             // Ensure dishes are loaded before displaying
@@ -356,6 +431,20 @@ async function generateMealPlan() {
     }
 }
 
+// Load the structured plan returned by the API into mealPlanData
+function loadMealPlanDays(planDays) {
+    mealPlanData = {};
+    ['周日', '周一', '周二', '周三', '周四', '周五', '周六'].forEach(day => {
+        mealPlanData[day] = [];
+    });
+    
+    planDays.forEach(planDay => {
+        const names = planDay.dishes.map(dish => dish.name);
+        // Empty days keep the "(待定)" placeholder, as in the text form
+        mealPlanData[planDay.day] = names.length > 0 ? names : ['(待定)'];
+    });
+}
+
 // Parse meal plan text into structured data
 function parseMealPlan(planText) {
     const lines = planText.split('\n');
@@ -859,7 +948,7 @@ document.getElementById('cancel-edit-btn').addEventListener('click', () => {
 });
 
 // Save meal plan
-document.getElementById('save-plan-btn').addEventListener('click', () => {
+document.getElementById('save-plan-btn').addEventListener('click', async () => {
     const planName = document.getElementById('meal-plan-name').value.trim();
     
     if (!planName) {
@@ -890,14 +979,23 @@ document.getElementById('save-plan-btn').addEventListener('click', () => {
     
     currentMealPlan = planText.trim();
     
-    // Save to localStorage for now (you can implement backend saving later)
-    const savedPlans = JSON.parse(localStorage.getItem('savedMealPlans') || '[]');
-    savedPlans.push({
-        name: planName,
-        plan: currentMealPlan,
-        date: new Date().toISOString()
-    });
-    localStorage.setItem('savedMealPlans', JSON.stringify(savedPlans));
+    try {
+        const response = await fetch('/api/meal-plans', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ name: planName, plan: currentMealPlan }),
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            alert('保存失败: ' + data.error);
+            return;
+        }
+    } catch (error) {
+        alert('错误: ' + error.message);
+        return;
+    }
     
     alert(`餐单"${planName}"已保存！`);
     
@@ -924,24 +1022,45 @@ async function openMarkCookedModal(dishName, day) {
         return;
     }
     
-    // Load current inventory
-    await loadCurrentInventory();
+    // Bring the current inventory up to date
+    await syncInventory();
+    
+    // Ask the server which inventory items the ingredients draw from and
+    // what is left afterwards (dry run: nothing is recorded or consumed)
+    let projections = {};
+    try {
+        const response = await fetch('/api/past-meals', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                dish_name: dishName,
+                dry_run: true,
+            }),
+        });
+        const data = await response.json();
+        if (response.ok) {
+            projections = data.ingredients_consumed || {};
+        }
+    } catch (error) {
+        console.error('Error projecting consumption:', error);
+    }
     
     // Prepare ingredient data with current inventory info
     const ingredientData = [];
     for (const ingredient of ingredients) {
-        // Find matching inventory item
-        const inventoryItem = currentInventory.find(item => {
-            const itemName = (item.item || '').toLowerCase();
-            const ingName = ingredient.toLowerCase();
-            return itemName === ingName || itemName.includes(ingName) || ingName.includes(itemName);
-        });
+        const [matched, , projectedItem] = projections[ingredient] || [false, null, null];
+        const inventoryItem = matched
+            ? currentInventory.find(item => item.item === projectedItem.item)
+            : undefined;
         
         ingredientData.push({
             name: ingredient,
             inventoryItem: inventoryItem,
             defaultAmount: 1.0,
-            adjustedAmount: 1.0
+            adjustedAmount: 1.0,
+            afterQuantity: matched ? projectedItem.quantity : undefined
         });
     }
     
@@ -976,7 +1095,9 @@ function displayMarkCookedModal(dishName, day, ingredientData) {
         const invItem = item.inventoryItem;
         const currentQty = invItem ? (invItem.quantity || 0) : 0;
         const unit = invItem ? (invItem.unit || '') : '';
-        const afterQty = Math.max(0, currentQty - item.adjustedAmount);
+        const afterQty = item.afterQuantity !== undefined
+            ? item.afterQuantity
+            : Math.max(0, currentQty - item.adjustedAmount);
         
         tableHTML += `
             <tr>
@@ -1032,6 +1153,7 @@ function updateIngredientAmount(index, maxQty) {
         const currentQty = invItem ? (invItem.quantity || 0) : 0;
         const unit = invItem ? (invItem.unit || '') : '';
         const afterQty = Math.max(0, currentQty - adjustedAmount);
+        ingredientData[index].afterQuantity = afterQty;
         afterQtyCell.innerHTML = afterQty >= 0 ? `${afterQty} ${unit}` : '<span style="color: #dc3545;">不足</span>';
         
         // Update stored data
@@ -1078,7 +1200,7 @@ async function confirmMarkCooked() {
             modal.style.display = 'none';
             
             // Refresh display
-            loadCurrentInventory();
+            syncInventory();
             loadPastMeals();
             displayMealPlan(false);
             
@@ -1243,38 +1365,66 @@ async function deleteDish(dishId) {
     }
 }
 
-// Load past meals
+// Load past meals (streamed newest first, so the latest rows render immediately)
 async function loadPastMeals() {
     try {
-        const response = await fetch('/api/past-meals');
+        const response = await fetch(`/api/past-meals?limit=${PAST_MEALS_PAGE_SIZE}`);
         const data = await response.json();
-        if (response.ok) {
-            displayPastMeals(data.past_meals);
+        if (!response.ok) {
+            return;
+        }
+
+        pastMealsTbody.innerHTML = '';
+        data.past_meals.forEach(appendPastMealRow);
+        setPastMealsCursor(data.next_cursor);
+
+        if (data.past_meals.length === 0) {
+            const row = document.createElement('tr');
+            row.innerHTML = '<td colspan="2" style="text-align: center; color: #999;">暂无记录</td>';
+            pastMealsTbody.appendChild(row);
         }
     } catch (error) {
         console.error('加载历史记录失败:', error);
     }
 }
 
-// Display past meals
-function displayPastMeals(meals) {
-    pastMealsTbody.innerHTML = '';
-    if (meals.length === 0) {
-        const row = document.createElement('tr');
-        row.innerHTML = '<td colspan="2" style="text-align: center; color: #999;">暂无记录</td>';
-        pastMealsTbody.appendChild(row);
+// Load the next (older) page of past meals
+async function loadMorePastMeals() {
+    if (!pastMealsCursor) {
         return;
     }
+    loadMorePastMealsBtn.disabled = true;
+    try {
+        const params = new URLSearchParams({ limit: PAST_MEALS_PAGE_SIZE, cursor: pastMealsCursor });
+        const response = await fetch(`/api/past-meals?${params}`);
+        const data = await response.json();
+        if (response.ok) {
+            data.past_meals.forEach(appendPastMealRow);
+            setPastMealsCursor(data.next_cursor);
+        }
+    } catch (error) {
+        console.error('加载历史记录失败:', error);
+    } finally {
+        loadMorePastMealsBtn.disabled = false;
+    }
+}
 
-    // Show most recent first
-    meals.reverse().forEach(meal => {
-        const row = document.createElement('tr');
-        row.innerHTML = `
-            <td>${meal.date || ''}</td>
-            <td>${meal.dish_name || ''}</td>
-        `;
-        pastMealsTbody.appendChild(row);
-    });
+// Remember where the next page starts; the button shows only if there is one
+function setPastMealsCursor(cursor) {
+    pastMealsCursor = cursor;
+    loadMorePastMealsBtn.style.display = cursor ? '' : 'none';
+}
+
+loadMorePastMealsBtn.addEventListener('click', loadMorePastMeals);
+
+// Append a past meal row
+function appendPastMealRow(meal) {
+    const row = document.createElement('tr');
+    row.innerHTML = `
+        <td>${meal.date || ''}</td>
+        <td>${meal.dish_name || ''}</td>
+    `;
+    pastMealsTbody.appendChild(row);
 }
 
 // Tab switching functionality
@@ -1481,34 +1631,37 @@ weeeConfirmBtn.addEventListener('click', async () => {
     }
 
     try {
-        // Add each item to inventory
+        // Add all items to inventory in a single batch request
         let successCount = 0;
         let errorCount = 0;
         
-        for (const item of previewInventory) {
-            try {
-                const response = await fetch('/api/inventory', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify(item),
-                });
-                
-                if (response.ok) {
+        const response = await fetch('/api/inventory/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                operations: previewInventory.map(item => ({ op: 'add', item })),
+            }),
+        });
+        
+        const data = await response.json();
+        if (response.ok) {
+            data.results.forEach(result => {
+                if (result.success) {
                     successCount++;
                 } else {
                     errorCount++;
                 }
-            } catch (error) {
-                errorCount++;
-            }
+            });
+        } else {
+            errorCount = previewInventory.length;
         }
 
         if (successCount > 0) {
             alert(`成功添加 ${successCount} 个库存项目${errorCount > 0 ? `，${errorCount} 个项目添加失败` : ''}`);
             closeWeeeModalFunc();
-            loadCurrentInventory();
+            syncInventory();
             switchToTab('inventory');
         } else {
             alert('添加失败，请重试');
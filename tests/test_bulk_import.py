@@ -0,0 +1,16 @@
+from bulk_import import import_receipts, parse_receipt
+
+
+def test_stats_count_items_before_compaction(tmp_path):
+    # Twice the same item in each file: the workers fold each pair into one
+    receipt = "weee_好菜 番茄 原味\n单价: $1.99 |数量: 2\n" * 2
+    paths = []
+    for n in range(3):
+        path = tmp_path / f"receipt-{n}.txt"
+        path.write_text(receipt, encoding="utf-8")
+        paths.append(str(path))
+    
+    _, item_count, items = parse_receipt(paths[0])
+    reducer, stats = import_receipts(paths, workers=2)
+    assert stats["items"] == 3 * item_count
+    assert len(reducer.items()) < stats["items"]
@@ -0,0 +1,27 @@
+from event_stream import EventBroadcaster
+from events import EventBus
+from instrumentation import Metrics
+
+
+def test_subscriber_count_follows_subscriptions():
+    broadcaster = EventBroadcaster(EventBus(), max_subscribers=2)
+    first = broadcaster.subscribe()
+    second = broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+    assert broadcaster.subscriber_count() == 2
+    
+    broadcaster.unsubscribe(first)
+    broadcaster.unsubscribe(first)
+    assert broadcaster.subscriber_count() == 1
+    broadcaster.unsubscribe(second)
+    assert broadcaster.subscriber_count() == 0
+
+
+def test_gauge_renders_latest_value():
+    metrics = Metrics(prefix="test")
+    metrics.describe("event_stream_subscribers", "gauge", "Open subscriptions.")
+    metrics.set("event_stream_subscribers", 3)
+    metrics.set("event_stream_subscribers", 1)
+    lines = metrics.render().splitlines()
+    assert "# TYPE test_event_stream_subscribers gauge" in lines
+    assert "test_event_stream_subscribers 1" in lines
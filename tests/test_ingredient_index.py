@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from ingredient_index import IngredientMatchIndex
+from recipe_planner import RecipePlanner
+
+# A small alphabet so random names often share prefixes and substrings
+ALPHABET = "鸡翅根中蛋番茄牛肉aAbB"
+
+
+def linear_matches(inventory_items, ingredients):
+    """The pre-index behavior: every (ingredient, inventory item) pair through match_ingredient."""
+    return {ingredient.lower() for ingredient in ingredients
+            if any(RecipePlanner.match_ingredient(None, item, ingredient) for item in inventory_items)}
+
+
+def random_name(rng, min_length=1):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_length, 5)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_match_inventory_equals_linear_matcher(seed):
+    rng = random.Random(seed)
+    ingredients = [random_name(rng) for _ in range(rng.randint(1, 40))]
+    index = IngredientMatchIndex(ingredients)
+    
+    for _ in range(50):
+        inventory = [random_name(rng) for _ in range(rng.randint(0, 8))]
+        assert index.match_inventory(inventory) == linear_matches(inventory, ingredients)
+
+
+def test_empty_names_match_like_linear_matcher():
+    ingredients = ["鸡翅", "番茄", ""]
+    index = IngredientMatchIndex(ingredients)
+    for inventory in ([], [""], ["鸡翅根"], ["牛", ""]):
+        assert index.match_inventory(inventory) == linear_matches(inventory, ingredients)
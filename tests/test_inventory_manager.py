@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from inventory_manager import InventoryManager
+
+
+def write_inventory(path, items):
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+
+def stored_names(path):
+    return [item["item"] for item in json.loads(path.read_text(encoding="utf-8"))]
+
+
+def test_batch_delete_removes_every_case_variant(tmp_path):
+    path = tmp_path / "inventory.json"
+    write_inventory(path, [{"item": "Egg", "quantity": 1}, {"item": "番茄", "quantity": 2},
+                           {"item": "egg", "quantity": 3}, {"item": "EGG", "quantity": 4}])
+    manager = InventoryManager(str(path))
+    
+    results = manager.apply_batch([{"op": "delete", "name": "eGg"},
+                                   {"op": "add", "item": {"item": "egg", "quantity": 5}}])
+    assert [success for success, _, _ in results] == [True, True]
+    assert stored_names(path) == ["番茄", "egg"]
+    assert manager.get_item_by_name("EGG")["quantity"] == 5
+
+
+def test_failed_batch_leaves_memory_matching_disk(tmp_path):
+    path = tmp_path / "inventory.json"
+    write_inventory(path, [{"item": "番茄", "quantity": 2, "unit": "个"}])
+    manager = InventoryManager(str(path))
+    
+    # A non-numeric quantity fails inside the merge, after the earlier ops changed resident items
+    with pytest.raises(TypeError):
+        manager.apply_batch([{"op": "update", "name": "番茄", "updates": {"quantity": 9}},
+                             {"op": "add", "item": {"item": "番茄", "quantity": "many", "unit": "个"}}])
+    
+    assert manager.get_item_by_name("番茄")["quantity"] == 2
+    assert manager.get_all_items() == json.loads(path.read_text(encoding="utf-8"))
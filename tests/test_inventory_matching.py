@@ -0,0 +1,87 @@
+import json
+import random
+import time
+
+import pytest
+
+from ingredient_index import ItemNameIndex
+from inventory_manager import InventoryManager
+
+# A small alphabet so random names often contain one another
+ALPHABET = "鸡翅根蛋番茄牛肉aAbB"
+
+
+def linear_match(names, ingredient):
+    """The pre-index behavior: the first item whose name equals, contains or is in the ingredient."""
+    ingredient_lower = ingredient.lower()
+    for position, name in enumerate(names):
+        name = name.lower()
+        if name == ingredient_lower or ingredient_lower in name or name in ingredient_lower:
+            return position
+    return None
+
+
+def random_name(rng, min_length=1):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(min_length, 4)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_match_all_equals_linear_scan(seed):
+    rng = random.Random(seed)
+    names = [random_name(rng, 0 if seed % 5 == 0 else 1) for _ in range(rng.randint(0, 30))]
+    ingredients = [random_name(rng, 0) for _ in range(40)]
+    matches = ItemNameIndex(names).match_all(ingredients)
+    for ingredient in ingredients:
+        assert matches[ingredient.lower()] == linear_match(names, ingredient)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_remembered_matches_follow_adds_and_deletes(seed, tmp_path):
+    rng = random.Random(seed)
+    manager = InventoryManager(str(tmp_path / "inventory.json"))
+    ingredients = [random_name(rng) for _ in range(30)]
+    
+    for _ in range(60):
+        names = [item["item"] for item in manager.get_all_items()]
+        if names and rng.random() < 0.4:
+            manager.delete_item(rng.choice(names))
+        else:
+            manager.add_item({"item": random_name(rng), "quantity": 1})
+        
+        names = [item["item"] for item in manager.get_all_items()]
+        for ingredient in rng.sample(ingredients, 10):
+            item = manager.find_item_for_ingredient(ingredient)
+            expected = linear_match(names, ingredient)
+            assert (item and item["item"]) == (names[expected] if expected is not None else None)
+
+
+def test_consume_after_adding_an_item_is_not_slower_than_a_scan(tmp_path):
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    names = list(dict.fromkeys("".join(rng.choice(letters) for _ in range(rng.randint(6, 16)))
+                               for _ in range(5000)))
+    path = tmp_path / "inventory.json"
+    path.write_text(json.dumps([{"item": name, "quantity": 100, "unit": "包", "category": "其他"}
+                                for name in names]), encoding="utf-8")
+    manager = InventoryManager(str(path))
+    ingredients = [names[n][2:7] for n in range(0, 5000, 500)] + ["番茄", "鸡蛋"]
+    manager.consume_ingredients(ingredients, dry_run=True)
+    
+    def consume_after(mutate):
+        # The add or delete writes the whole file either way; only the match after it is timed
+        mutate()
+        start = time.perf_counter()
+        manager.consume_ingredients(ingredients, dry_run=True)
+        return time.perf_counter() - start
+    
+    def scan():
+        current = [item["item"] for item in manager.get_all_items()]
+        start = time.perf_counter()
+        for ingredient in ingredients:
+            linear_match(current, ingredient)
+        return time.perf_counter() - start
+    
+    after_add = min(consume_after(lambda: manager.add_item({"item": f"新品{n}", "quantity": 1}))
+                    for n in range(3))
+    after_delete = min(consume_after(lambda: manager.delete_item(f"新品{n}")) for n in range(3))
+    assert max(after_add, after_delete) <= min(scan() for _ in range(3))
@@ -0,0 +1,48 @@
+import itertools
+
+import pytest
+
+from inventory_parser import CATEGORY_KEYWORDS, categorize_ingredient
+
+ALL_KEYWORDS = sorted({keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords})
+
+
+def first_match_category(ingredient_name):
+    """The original first-match loop over CATEGORY_KEYWORDS."""
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in ingredient_name:
+                # Names with a seafood keyword are never meat
+                if category == "肉类" and any(k in ingredient_name for k in ["鱼", "虾", "蟹", "贝"]):
+                    continue
+                return category
+    return "其他"
+
+
+@pytest.mark.parametrize("keyword", ALL_KEYWORDS)
+def test_every_keyword_matches_first_match_loop(keyword):
+    for name in (keyword, f"新鲜{keyword}", f"{keyword}片", f"台湾{keyword}1包"):
+        assert categorize_ingredient(name) == first_match_category(name)
+
+
+def test_keyword_pairs_match_first_match_loop():
+    for first, second in itertools.permutations(ALL_KEYWORDS, 2):
+        name = first + second
+        assert categorize_ingredient(name) == first_match_category(name), name
+
+
+@pytest.mark.parametrize("name, category", [
+    ("牛肉", "肉类"),
+    ("鸡翅", "肉类"),
+    ("鱼", "海鲜"),
+    ("鱼肉", "海鲜"),
+    ("虾仁猪肉", "海鲜"),
+    ("蟹腿", "海鲜"),
+    ("三文鱼", "海鲜"),
+    ("鸡蛋", "肉类"),
+    ("鹌鹑蛋", "蛋类"),
+    ("花菜", "蔬菜"),
+    ("苹果", "其他"),
+])
+def test_meat_before_seafood_priority(name, category):
+    assert categorize_ingredient(name) == category == first_match_category(name)
@@ -0,0 +1,74 @@
+import json
+import multiprocessing
+
+from dish_manager import DishManager
+from inventory_manager import InventoryManager
+
+PROCESSES = 6
+WRITES_PER_PROCESS = 15
+
+
+def _add_dishes(path, worker):
+    manager = DishManager(path)
+    for n in range(WRITES_PER_PROCESS):
+        success, error, _ = manager.add_dish({"name": f"dish-{worker}-{n}", "category": "蔬菜",
+                                              "ingredients": ["白菜"]})
+        assert success, error
+
+
+def _add_items(path, worker):
+    manager = InventoryManager(path)
+    for n in range(WRITES_PER_PROCESS):
+        success, error, _ = manager.add_item({"item": f"item-{worker}-{n}", "quantity": 1})
+        assert success, error
+
+
+def _run_workers(target, path):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=target, args=(path, worker)) for worker in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+    assert all(worker.exitcode == 0 for worker in workers)
+
+
+def test_concurrent_add_dish_loses_no_updates(tmp_path):
+    path = str(tmp_path / "dishes.json")
+    DishManager(path)
+    _run_workers(_add_dishes, path)
+    
+    with open(path, encoding="utf-8") as f:
+        dishes = json.load(f)
+    assert len(dishes) == PROCESSES * WRITES_PER_PROCESS
+    ids = [dish["id"] for dish in dishes]
+    assert len(set(ids)) == len(ids)
+    assert {dish["name"] for dish in dishes} == {f"dish-{w}-{n}" for w in range(PROCESSES)
+                                                 for n in range(WRITES_PER_PROCESS)}
+
+
+def test_concurrent_add_item_loses_no_updates(tmp_path):
+    path = str(tmp_path / "inventory.json")
+    InventoryManager(path)
+    _run_workers(_add_items, path)
+    
+    with open(path, encoding="utf-8") as f:
+        inventory = json.load(f)
+    assert len(inventory) == PROCESSES * WRITES_PER_PROCESS
+    names = [item["item"] for item in inventory]
+    assert len(set(names)) == len(names)
+
+
+def test_record_directory_version_changes_on_every_save(tmp_path):
+    from json_store import JsonRecordDirectory
+    
+    directory = JsonRecordDirectory(str(tmp_path / "bodies"), lambda record: record["name"])
+    directory.ensure_exists()
+    versions = [directory.get_version()]
+    for n in range(5):
+        # Same file, same size: only the manifest tells these saves apart
+        versions.append(directory.save([], upserted=[{"name": "plan", "text": str(n)}]))
+        assert directory.get_version() == versions[-1]
+    assert len(set(versions)) == len(versions)
+    assert directory.get("plan")["text"] == "4"
+    assert [record["name"] for record in directory.load()[0]] == ["plan"]
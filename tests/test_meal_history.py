@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from meal_history import MealHistory, format_cursor, parse_cursor
+from sqlite_store import SqliteDatabase, SqliteMealHistory
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def history(request, tmp_path):
+    if request.param == "csv":
+        return MealHistory(str(tmp_path / "past_meals.csv"))
+    return SqliteMealHistory(SqliteDatabase(str(tmp_path / "test.db")))
+
+
+def read_pages(history, limit, before=None, between=None, **bounds):
+    """Follow next keys to the last page; between(page_number) runs before each later page."""
+    meals = []
+    page_number = 0
+    while True:
+        page, before = history.get_dated_page(before=before, limit=limit, **bounds)
+        meals.extend(page)
+        if before is None:
+            return meals
+        page_number += 1
+        if between is not None:
+            between(page_number)
+        before = parse_cursor(format_cursor(before))
+
+
+def test_pages_cover_history_newest_first(history):
+    for day in range(1, 11):
+        history.append(f"2024-05-{day:02d}", f"dish {day}")
+        history.append(f"2024-05-{day:02d}", f"side {day}")
+    history.append("", "undated")
+    
+    meals = read_pages(history, limit=3)
+    expected, _ = history.get_dated_page()
+    assert meals == expected
+    assert len(meals) == 20
+    assert [meal["date"] for meal in meals] == sorted((meal["date"] for meal in meals), reverse=True)
+    # Same-day rows: the later one first
+    assert meals[:2] == [{"date": "2024-05-10", "dish_name": "side 10"},
+                         {"date": "2024-05-10", "dish_name": "dish 10"}]
+
+
+def test_bounds_and_limits(history):
+    for day in range(1, 11):
+        history.append(f"2024-05-{day:02d}", f"dish {day}")
+    meals = read_pages(history, limit=2, since=datetime(2024, 5, 3), until=datetime(2024, 5, 7))
+    assert [meal["dish_name"] for meal in meals] == [f"dish {day}" for day in range(7, 2, -1)]
+    
+    page, next_key = history.get_dated_page(limit=10)
+    assert len(page) == 10 and next_key is None
+
+
+def test_back_dated_rows_do_not_shift_later_pages(history):
+    for day in range(1, 21):
+        history.append(f"2024-05-{day:02d}", f"dish {day}")
+    
+    def insert_back_dated(page_number):
+        # Rows older than the next page and at the current boundary date
+        history.append("2024-04-01", f"back dated {page_number}")
+        history.append("2024-05-15", f"same day {page_number}")
+    
+    meals = read_pages(history, limit=5, between=insert_back_dated)
+    names = [meal["dish_name"] for meal in meals]
+    # Every original row exactly once, in order
+    assert [name for name in names if name.startswith("dish")] == [f"dish {day}" for day in range(20, 0, -1)]
+    # Rows recorded after paging began are never served twice
+    assert len(names) == len(set(names))
+
+
+def test_parse_cursor_rejects_malformed_values():
+    assert parse_cursor(format_cursor((datetime(2024, 5, 1), 42))) == (datetime(2024, 5, 1), 42)
+    for cursor in ("42", "2024-05-01", "2024-05-01.x", "yesterday.3"):
+        with pytest.raises(ValueError):
+            parse_cursor(cursor)
@@ -0,0 +1,30 @@
+import json
+
+from meal_plan_manager import MealPlanManager
+from plan_format import format_plan_text
+
+
+PLAN = {"start_day": 1, "days": [
+    {"day": "周一", "dishes": [{"id": 1, "name": "番茄炒蛋"}]},
+    {"day": "周二", "dishes": [{"id": 2, "name": "红烧肉"}, {"id": 3, "name": "清炒白菜"}]},
+]}
+
+
+def test_summary_start_day_matches_structured_plans(tmp_path):
+    manager = MealPlanManager(str(tmp_path / "meal_plans.json"))
+    success, _, saved = manager.save_meal_plan("结构化", PLAN)
+    assert success and saved["start_day"] == PLAN["start_day"]
+    manager.save_meal_plan("文本", format_plan_text(PLAN))
+    
+    summaries, total = manager.list_meal_plans()
+    assert total == 2
+    assert [summary["start_day"] for summary in summaries] == [1, 1]
+    assert manager.get_meal_plan_by_name("结构化")["dish_count"] == 3
+
+
+def test_summaries_saved_with_day_names_are_read_as_indexes(tmp_path):
+    path = tmp_path / "meal_plans.json"
+    path.write_text(json.dumps([{"name": "旧", "date": "2024-05-01 10:00:00",
+                                 "start_day": "周三", "dish_count": 0}]), encoding="utf-8")
+    summaries, _ = MealPlanManager(str(path)).list_meal_plans()
+    assert summaries[0]["start_day"] == 3
@@ -0,0 +1,34 @@
+from plan_solver import WeeklyPlanSolver
+
+
+def candidate(name, kind, score=1.0, matched=()):
+    return {"name": name, "kind": kind, "score": score, "matched": set(matched)}
+
+
+CANDIDATES = [
+    candidate("番茄炒蛋", "veg", 2.0, ["番茄", "鸡蛋"]),
+    candidate("清炒白菜", "veg", 1.0, ["白菜"]),
+    candidate("红烧肉", "meat", 1.5, ["五花肉"]),
+    candidate("清蒸鱼", "meat", 1.0, ["鲈鱼"]),
+    candidate("米饭", "other", 0.5, ["大米"]),
+]
+
+
+def test_unknown_reference_dish_returns_none():
+    reference = [["番茄炒蛋", "不存在的菜"]] + [["清炒白菜", "红烧肉"]] * 6
+    solver = WeeklyPlanSolver(CANDIDATES, reference)
+    assert solver.unknown_dishes == {"不存在的菜"}
+    assert solver.solve() is None
+
+
+def test_solution_keeps_reference_shape():
+    reference = [["番茄炒蛋", "红烧肉"], ["清炒白菜", "清蒸鱼"], ["米饭"]] + [["番茄炒蛋", "清蒸鱼"]] * 4
+    solver = WeeklyPlanSolver(CANDIDATES, reference)
+    days = solver.solve()
+    assert [len(day) for day in days] == [len(day) for day in reference]
+    assert solver.evaluate(days) >= solver.evaluate(reference)
+    kinds = {c["name"]: c["kind"] for c in CANDIDATES}
+    for d in solver.veg_days:
+        assert any(kinds[name] == "veg" for name in days[d])
+    for d in solver.meat_days:
+        assert any(kinds[name] == "meat" for name in days[d])
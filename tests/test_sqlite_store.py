@@ -0,0 +1,55 @@
+import threading
+
+from sqlite_store import SqliteDatabase
+
+
+def key(record):
+    return str(record["id"])
+
+
+def test_load_pairs_rows_with_their_version(tmp_path):
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    collection = database.collection("dishes", key)
+    collection.save([], upserted=[{"id": 1}])
+    
+    # Commit a write from another connection while load() is running
+    read_version = collection.get_version
+    
+    def write_then_get_version():
+        writer = threading.Thread(target=lambda: database.collection("dishes", key).save([], upserted=[{"id": 2}]))
+        writer.start()
+        writer.join()
+        return read_version()
+    
+    collection.get_version = write_then_get_version
+    records, version = collection.load()
+    collection.get_version = read_version
+    
+    # The version must describe exactly the rows returned
+    latest = collection.get_version()
+    assert (records == [{"id": 1}, {"id": 2}]) == (version == latest)
+    assert records in ([{"id": 1}], [{"id": 1}, {"id": 2}])
+
+
+def test_stale_managers_look_up_single_rows(tmp_path):
+    from dish_manager import DishManager
+    from inventory_manager import InventoryManager
+    
+    database = SqliteDatabase(str(tmp_path / "test.db"))
+    dishes = database.collection("dishes", DishManager.record_key, DishManager.record_name)
+    inventory = database.collection("inventory", InventoryManager.record_key)
+    writer = DishManager(store=dishes)
+    writer.add_dish({"name": "番茄炒蛋", "category": "蔬菜", "ingredients": ["番茄", "鸡蛋"]})
+    InventoryManager(store=inventory).add_item({"item": "番茄", "quantity": 2})
+    
+    reader = DishManager(store=dishes)
+    reader_inventory = InventoryManager(store=inventory)
+    # A lookup on a stale manager must not load the whole collection
+    dishes.load = inventory.load = None
+    
+    assert reader.get_dish_by_name("番茄炒蛋")["ingredients"] == ["番茄", "鸡蛋"]
+    assert reader.get_dish_by_name("红烧肉") is None
+    assert reader.get_dish_by_id(1)["name"] == "番茄炒蛋"
+    assert reader.get_dish_by_id(2) is None
+    assert reader_inventory.get_item_by_name("番茄")["quantity"] == 2
+    assert reader_inventory.get_item_by_name("牛肉") is None
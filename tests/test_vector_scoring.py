@@ -0,0 +1,34 @@
+import json
+import random
+
+import pytest
+
+from recipe_planner import RecipePlanner
+
+pytest.importorskip("numpy")
+
+CATEGORIES = ["蔬菜", "肉类", "海鲜", "豆制品", "主食"]
+INGREDIENTS = ["番茄", "鸡蛋", "牛肉", "鸡翅", "虾", "豆腐", "白菜", "土豆", "米饭", "面条"]
+
+
+def make_planner(tmp_path, seed, scoring_engine):
+    rng = random.Random(seed)
+    dishes = [{"id": n, "name": f"菜{n}", "category": rng.choice(CATEGORIES),
+               "ingredients": rng.sample(INGREDIENTS, rng.randint(1, 4))} for n in range(60)]
+    dishes_file = tmp_path / f"dishes-{scoring_engine}.json"
+    dishes_file.write_text(json.dumps(dishes, ensure_ascii=False), encoding="utf-8")
+    return RecipePlanner(str(dishes_file), str(tmp_path / "past_meals.csv"), scoring_engine=scoring_engine)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("categories", [None, [], ["蔬菜"], ["肉类", "海鲜"], ["不存在"]])
+def test_numpy_engine_filters_categories_like_python(tmp_path, seed, categories):
+    inventory = random.Random(seed).sample(INGREDIENTS, 4)
+    results = []
+    for engine in ("python", "numpy"):
+        planner = make_planner(tmp_path, seed, engine)
+        feasible = planner.get_feasible_dishes(inventory, categories=categories)
+        results.append([(dish["id"], score) for dish, score in feasible])
+        if categories is not None:
+            assert all(dish["category"] in categories for dish, _ in feasible)
+    assert results[0] == results[1]